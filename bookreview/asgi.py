@@ -3,6 +3,10 @@ ASGI config for bookreview project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Long-lived streams (social.streams: notifications/stream/) are async views
+and need this entry point, e.g. `uvicorn bookreview.asgi:application`;
+under WSGI they degrade to one event per request.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -14,3 +18,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookreview.settings')
 
 application = get_asgi_application()
+
+from bookreview import content_types  # noqa: E402  (needs the app registry)
+
+content_types.warm()
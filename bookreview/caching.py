@@ -0,0 +1,186 @@
+"""
+Versioned, tag-invalidated cache for shared API payloads.
+
+A cached entry records the version of every tag it depends on ("book:12",
+"author:3", "genre:list", ...). A read compares them with the current
+versions (one get_many) and treats any difference as a miss, so
+invalidating a tag is a single cache.set of a new version token however
+many entries depend on it. Model signals (books.signals, reviews.signals,
+reviews.like_counts) call `invalidate` after commit.
+
+Entries are fresh for `timeout` seconds and kept STALE_GRACE seconds longer.
+Version keys expire after VERSION_TIMEOUT, longer than any entry lives; an
+entry whose tag version has expired reads as invalidated.
+Only one request recomputes an entry (a cache.add lock): meanwhile the
+others get the expired copy, or, when the copy was invalidated, wait up to
+LOCK_WAIT for the new one rather than serve data known to be outdated.
+Hits, misses, stale reads and waits are counted per namespace in Redis
+(`cache_stats`).
+
+Only data that is the same for every user belongs here; views overlay the
+per-user fields after the lookup.
+"""
+import hashlib
+import logging
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from redis.exceptions import RedisError
+from rest_framework.response import Response
+
+from .redis_utils import get_redis, redis_key
+
+logger = logging.getLogger('bookreview')
+
+STALE_GRACE = 60
+VERSION_TIMEOUT = 24 * 60 * 60  # > timeout + STALE_GRACE of every entry
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+
+EVENTS = ('hit', 'miss', 'stale', 'wait')
+
+
+def _version_key(tag):
+    return f'cachever:{tag}'
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def tag_versions(tags):
+    """{tag: current version}, giving a version to the tags that have none yet"""
+    keys = {_version_key(tag): tag for tag in set(tags)}
+    found = cache.get_many(list(keys))
+    for key in keys.keys() - found.keys():
+        version = _new_version()
+        # Another process may create it first: keep whichever won
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key, version)
+        found[key] = version
+    return {tag: found[key] for key, tag in keys.items()}
+
+
+def invalidate(*tags):
+    """Give `tags` new versions once the current transaction commits"""
+    tags = {tag for tag in tags if tag}
+    if tags:
+        transaction.on_commit(
+            lambda: cache.set_many({_version_key(tag): _new_version() for tag in tags}, VERSION_TIMEOUT)
+        )
+
+
+def _record(namespace, event):
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        redis.hincrby(redis_key(f'cachestats:{namespace}'), event, 1)
+    except RedisError:
+        pass
+
+
+def cache_stats(namespace):
+    """{event: count} of a namespace, plus its hit ratio"""
+    redis = get_redis()
+    stats = dict.fromkeys(EVENTS, 0)
+    if redis is not None:
+        try:
+            for event, count in redis.hgetall(redis_key(f'cachestats:{namespace}')).items():
+                stats[event.decode()] = int(count)
+        except RedisError as exc:
+            logger.warning('Reading cache stats of %s failed: %s', namespace, exc)
+    served = stats['hit'] + stats['stale'] + stats['wait']
+    total = served + stats['miss']
+    stats['hit_ratio'] = round(served / total, 3) if total else None
+    return stats
+
+
+def _state(entry):
+    """'fresh', 'expired' (past its timeout) or 'invalid' (a tag changed); None when missing"""
+    if entry is None:
+        return None
+    versions = entry['versions']
+    current = cache.get_many([_version_key(tag) for tag in versions])
+    if any(current.get(_version_key(tag)) != version for tag, version in versions.items()):
+        return 'invalid'
+    return 'fresh' if time.time() < entry['fresh_until'] else 'expired'
+
+
+def _wait_for(cache_key):
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = cache.get(cache_key)
+        if _state(entry) == 'fresh':
+            return entry
+    return None
+
+
+def get_or_compute(namespace, key, compute, tags, timeout=300):
+    """
+    Cached `compute()` under namespace/key.
+
+    `tags` lists the tags the value depends on, or is a callable taking the
+    computed value for tags only known afterwards (ids of related rows).
+    Versions of a tag list are read before computing, so an invalidation
+    racing the computation is never lost; callable tags are read after it,
+    which leaves a window of at most `timeout` seconds. `timeout` +
+    STALE_GRACE must stay below VERSION_TIMEOUT.
+    """
+    cache_key = f'cached:{namespace}:{key}'
+    entry = cache.get(cache_key)
+    state = _state(entry)
+    if state == 'fresh':
+        _record(namespace, 'hit')
+        return entry['value']
+
+    lock_key = f'{cache_key}:lock'
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    # None: the cache is down (django-redis IGNORE_EXCEPTIONS), nobody holds a lock to wait for
+    if locked is False:
+        if state == 'expired':
+            _record(namespace, 'stale')
+            return entry['value']
+        entry = _wait_for(cache_key)
+        if entry is not None:
+            _record(namespace, 'wait')
+            return entry['value']
+
+    _record(namespace, 'miss')
+    try:
+        versions = None if callable(tags) else tag_versions(tags)
+        value = compute()
+        if versions is None:
+            versions = tag_versions(tags(value))
+        cache.set(cache_key, {
+            'value': value,
+            'versions': versions,
+            'fresh_until': time.time() + timeout,
+        }, timeout + STALE_GRACE)
+        return value
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+class CachedListMixin:
+    """
+    list() of a generic view served from the versioned cache, one entry per
+    query string. Set `cache_namespace` and `cache_tags`.
+    """
+    cache_namespace = None
+    cache_tags = ()
+    cache_timeout = 300
+
+    def list(self, request, *args, **kwargs):
+        key = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        data = get_or_compute(
+            self.cache_namespace, key,
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs).data,
+            self.cache_tags, self.cache_timeout,
+        )
+        return Response(data)
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookreview.settings')
@@ -14,6 +15,13 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@worker_process_init.connect
+def warm_content_types(**kwargs):
+    # Load the content type ids once per worker process (bookreview.content_types)
+    from bookreview import content_types
+    content_types.warm()
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
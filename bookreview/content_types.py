@@ -0,0 +1,65 @@
+"""
+Content types of the models this app follows, likes, reports and notifies on.
+
+`ContentType.objects.get(model=...)` skips Django's ContentType cache (one
+query per call) and is ambiguous across apps; `obj.content_type.model`
+loads the FK row by row; `content_type__model=` filters join
+django_content_type. The registry names the models once (TARGETS) and
+hands out their integer ids through the ContentType cache, so filters
+become `content_type_id=<int>` on the indexed column. `warm()` loads all
+of them with one query when a process starts (bookreview.wsgi/asgi, Celery
+workers); before that the first lookup fills the cache.
+"""
+import logging
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError
+
+logger = logging.getLogger('bookreview')
+
+# API name -> model label
+TARGETS = {
+    'user': 'users.User',
+    'author': 'books.Author',
+    'book': 'books.Book',
+    'review': 'reviews.Review',
+    'comment': 'reviews.Comment',
+}
+FOLLOW_TARGETS = ('user', 'author', 'book')
+
+
+def model_for(name):
+    """Model registered under `name`, or None"""
+    label = TARGETS.get(name)
+    return apps.get_model(label) if label else None
+
+
+def content_type(model_or_name):
+    if isinstance(model_or_name, str):
+        model_or_name = model_for(model_or_name)
+    return ContentType.objects.get_for_model(model_or_name)
+
+
+def content_type_id(model_or_name):
+    """Integer id of a registered name or of a model"""
+    return content_type(model_or_name).pk
+
+
+def name_of(content_type_id):
+    """Registered name of a content type id ('review', 'user', ...), or None"""
+    if content_type_id is None:
+        return None
+    model = ContentType.objects.get_for_id(content_type_id).model_class()
+    if model is None:
+        return None
+    return {label: name for name, label in TARGETS.items()}.get(model._meta.label)
+
+
+def warm():
+    """Load every registered content type into the ContentType cache with one query"""
+    try:
+        ContentType.objects.get_for_models(*[apps.get_model(label) for label in TARGETS.values()])
+    except DatabaseError as exc:
+        # Database not migrated/reachable yet: lookups fill the cache later
+        logger.warning('Warming content types failed: %s', exc)
@@ -0,0 +1,246 @@
+"""
+Keyset (cursor) pagination.
+
+Offset pagination reads and throws away every row before the page, and
+PageNumberPagination adds a COUNT(*) on each request, so deep pages get
+linearly slower. A keyset page instead continues from the ordering values
+of the last row seen:
+
+    ORDER BY created_at DESC, id DESC
+    WHERE created_at <= :c AND (created_at < :c OR (created_at = :c AND id < :id))
+
+which the (-created_at) indexes answer directly, at the same cost for page
+1 and page 5000. The queryset ordering is tie-broken by the primary key so
+the position is unique, and the position travels in an opaque cursor.
+Ordering fields must be non-null concrete fields of the model.
+
+`KeysetPagination` is the API default: ?page= behaves as before (the
+templates rely on it) and ?cursor= (empty for the first page) switches to
+keyset pages; ?count=approximate adds an estimated total that costs no
+COUNT(*). `KeysetDefaultPagination` (reviews, books, notifications) serves
+keyset pages unless the request has ?page=, kept for links and clients
+that page by number. `KeysetOnlyPagination` serves keyset pages only, for
+lists that can grow without bound (the contents of a shelf).
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import uuid
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _json_value(value):
+    # Full precision: DjangoJSONEncoder would cut datetimes to milliseconds
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} cannot be part of a cursor')
+
+
+def encode_cursor(position, backwards=False):
+    """Opaque cursor for a position (list of ordering values)"""
+    raw = json.dumps([position, backwards], default=_json_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(position, backwards) of a cursor made by encode_cursor"""
+    try:
+        position, backwards = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(position, list):
+        raise InvalidCursor(cursor)
+    return position, bool(backwards)
+
+
+def keyset_ordering(queryset):
+    """[(field, descending)] of the queryset ordering, tie-broken by the primary key"""
+    opts = queryset.model._meta
+    terms = queryset.query.order_by or opts.ordering
+    ordering = []
+    for term in terms:
+        if not isinstance(term, str) or term == '?':
+            raise ValueError(f'Keyset pagination needs field orderings, got {term!r}')
+        descending = term.startswith('-')
+        name = term.lstrip('-+')
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            raise ValueError(f'Keyset pagination cannot order by {name!r}')
+        if field.null or field.is_relation or not field.concrete:
+            raise ValueError(f'Keyset pagination cannot order by {name!r}')
+        ordering.append((field, descending))
+        if field.primary_key:
+            return ordering
+    descending = ordering[0][1] if ordering else False
+    return ordering + [(opts.pk, descending)]
+
+
+def _position_of(obj, ordering):
+    return [getattr(obj, field.attname) for field, _ in ordering]
+
+
+def _after(ordering, position, backwards):
+    """Rows strictly after `position` in the ordering (before it if backwards)"""
+    def lookup(field, descending, strict=True):
+        op = 'lt' if descending != backwards else 'gt'
+        return f'{field.attname}__{op}' if strict else f'{field.attname}__{op}e'
+
+    condition = Q()
+    for i, (field, descending) in enumerate(ordering):
+        equal = {f.attname: value for (f, _), value in zip(ordering[:i], position)}
+        condition |= Q(**equal, **{lookup(field, descending): position[i]})
+    # Redundant bound on the leading column: lets the planner use its index range
+    first, descending = ordering[0]
+    return Q(**{lookup(first, descending, strict=False): position[0]}) & condition
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def paginate_keyset(queryset, cursor=None, page_size=20):
+    """One KeysetPage of an ordered queryset; raises InvalidCursor for a bad cursor"""
+    ordering = keyset_ordering(queryset)
+    position, backwards = None, False
+    if cursor:
+        position, backwards = decode_cursor(cursor)
+        if len(position) != len(ordering):
+            raise InvalidCursor(cursor)
+        try:
+            position = [field.to_python(value) for (field, _), value in zip(ordering, position)]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+
+    queryset = queryset.order_by(*[
+        f"{'-' if descending != backwards else ''}{field.attname}" for field, descending in ordering
+    ])
+    if position is not None:
+        queryset = queryset.filter(_after(ordering, position, backwards))
+    items = list(queryset[:page_size + 1])
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if backwards:
+        items.reverse()
+
+    next_cursor = previous_cursor = None
+    if items:
+        first, last = _position_of(items[0], ordering), _position_of(items[-1], ordering)
+        # Coming back from a later page there is always a next one
+        if has_more or backwards:
+            next_cursor = encode_cursor(last)
+        if has_more if backwards else position is not None:
+            previous_cursor = encode_cursor(first, backwards=True)
+    return KeysetPage(items, next_cursor, previous_cursor)
+
+
+def approximate_count(queryset):
+    """
+    Estimated row count without COUNT(*): pg_class.reltuples for a whole
+    table, the planner's row estimate for a filtered queryset.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    queryset = queryset.order_by()
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:  # -1: never vacuumed/analyzed
+            return int(row[0])
+    plan = json.loads(queryset.explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    PageNumberPagination, plus keyset pages when the request has ?cursor=
+    (empty for the first page): {next, previous, [approximate_count], results}
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def use_keyset(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_page = None
+        if not self.use_keyset(request):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        try:
+            self.keyset_page = paginate_keyset(
+                queryset, request.query_params.get(self.cursor_query_param), self.get_page_size(request)
+            )
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        except ValueError as exc:
+            raise NotFound(str(exc))
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) == 'approximate':
+            self.approximate_count = approximate_count(queryset)
+        return self.keyset_page.object_list
+
+    def get_paginated_response(self, data):
+        if self.keyset_page is None:
+            return super().get_paginated_response(data)
+        response = OrderedDict([
+            ('next', self._cursor_link(self.keyset_page.next_cursor)),
+            ('previous', self._cursor_link(self.keyset_page.previous_cursor)),
+        ])
+        if self.approximate_count is not None:
+            response['approximate_count'] = self.approximate_count
+        response['results'] = data
+        return Response(response)
+
+    def _cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+
+class KeysetDefaultPagination(KeysetPagination):
+    """Keyset pages unless the request has ?page= (legacy page-number links)"""
+
+    def use_keyset(self, request):
+        return self.page_query_param not in request.query_params
+
+
+class KeysetOnlyPagination(KeysetPagination):
+    """Keyset pages without ?cursor= on the first page; ?page= is ignored"""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def use_keyset(self, request):
+        return True
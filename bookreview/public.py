@@ -0,0 +1,53 @@
+"""
+Public payload mode for read endpoints.
+
+With ?public=1 a read (GET/HEAD) answers as for an anonymous visitor: it skips
+authentication (so the session is not read and no Vary: Cookie is added),
+serializers drop their VIEWER_FIELDS, and a successful GET is marked
+`Cache-Control: public, max-age=<public_max_age>`. The response is the same
+for every user, so a CDN or the Redis cache (bookreview.caching) can keep
+it. Clients fetch the per-user part for the ids on screen from
+/api/viewer-state/ (bookreview.viewer_state).
+"""
+from django.utils.cache import patch_cache_control
+
+PUBLIC_PARAM = 'public'
+
+
+def is_public_request(request):
+    """True for a GET/HEAD with ?public=1 (works on Django and DRF requests)"""
+    # Writes keep their authentication whatever the query string says
+    return request.method in ('GET', 'HEAD') and request.GET.get(PUBLIC_PARAM) in ('1', 'true')
+
+
+class PublicPayloadMixin:
+    """Generic view mixin adding the ?public=1 mode"""
+    public_max_age = 60
+
+    def get_authenticators(self):
+        if is_public_request(self.request):
+            return []
+        return super().get_authenticators()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['public'] = is_public_request(self.request)
+        return context
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if is_public_request(request) and response.status_code == 200:
+            patch_cache_control(response, public=True, max_age=self.public_max_age)
+        return response
+
+
+class ViewerFieldsMixin:
+    """Serializer mixin: leaves out VIEWER_FIELDS when the context asks for the public payload"""
+    VIEWER_FIELDS = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('public'):
+            for name in self.VIEWER_FIELDS:
+                fields.pop(name, None)
+        return fields
@@ -0,0 +1,37 @@
+"""
+Access to the raw Redis client behind the default cache.
+
+Features that need Redis data structures (hashes, sorted sets, ...) go
+through `get_redis()` and fall back to a database path when it returns None,
+the same way the cache itself degrades when Redis is unavailable.
+"""
+from django.core.cache import cache
+
+
+def get_redis():
+    """Redis client of the default cache, or None if the cache is not django-redis"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def redis_key(name):
+    """Namespace a raw Redis key with the cache KEY_PREFIX/version"""
+    return cache.make_key(name)
+
+
+def get_async_redis():
+    """
+    New asyncio Redis client on the default cache's server (for pub/sub in
+    async views), or None if the cache is not django-redis
+    """
+    from django.conf import settings
+
+    config = settings.CACHES['default']
+    if not config['BACKEND'].startswith('django_redis.'):
+        return None
+    import redis.asyncio
+    location = config['LOCATION']
+    return redis.asyncio.from_url(location[0] if isinstance(location, (list, tuple)) else location)
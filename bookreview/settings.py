@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.sites',
     'django.contrib.sitemaps',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -184,6 +185,38 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Periodic tasks
+CELERY_BEAT_SCHEDULE = {
+    'flush-book-views': {
+        'task': 'books.tasks.flush_book_views',
+        'schedule': 60.0,
+    },
+    'flush-like-counts': {
+        'task': 'reviews.tasks.flush_like_counts',
+        'schedule': 15.0,
+    },
+    'reconcile-like-counts': {
+        'task': 'reviews.tasks.reconcile_like_counts',
+        'schedule': 10 * 60.0,
+    },
+    'refresh-trending-books': {
+        'task': 'books.tasks.refresh_trending_books',
+        'schedule': 10 * 60.0,
+    },
+    'rebuild-autocomplete-index': {
+        'task': 'search.tasks.rebuild_autocomplete_index',
+        'schedule': 60 * 60.0,
+    },
+    'reconcile-follow-counts': {
+        'task': 'social.tasks.reconcile_follow_counts',
+        'schedule': 24 * 60 * 60.0,
+    },
+    'cleanup-old-notifications': {
+        'task': 'bookreview.tasks.cleanup_old_notifications',
+        'schedule': 60 * 60.0,
+    },
+}
+
 # WhiteNoise Configuration for static files (default)
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
@@ -224,7 +257,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'bookreview.pagination.KeysetPagination',  # ?page= or ?cursor=
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -315,6 +348,37 @@ LOGGING = {
 REVIEW_MIN_LENGTH = 100
 MAX_REVIEW_IMAGES = 5
 MAX_IMAGE_SIZE = 2 * 1024 * 1024  # 2MB
+COMMENT_REPLY_DEPTH = 2  # Reply levels shown under each top-level comment (?depth= overrides)
+COMMENT_MAX_REPLY_DEPTH = 5
+
+# Book View Settings
+BOOK_VIEW_DEDUP_SECONDS = 30 * 60  # Count a visitor once per book every 30 minutes
+
+# Trending Settings
+TRENDING_WEIGHTS = {'view': 1.0, 'shelf': 6.0, 'review': 10.0}
+TRENDING_HALF_LIFE_DAYS = 3  # Activity loses half its weight every 3 days
+TRENDING_HORIZON_DAYS = 30  # Older activity is worth < 0.1% and is skipped
+TRENDING_SIZE = 10
+TRENDING_CACHE_TIMEOUT = 30 * 60
+
+# Feed Settings
+FEED_PAGE_SIZE = 20
+FEED_CELEBRITY_FOLLOWERS = 10000  # Reviews of bigger accounts are pulled at read time, not fanned out
+FEED_FOLLOW_BACKFILL = 20  # Recent reviews copied into the timeline on follow
+FEED_TIMELINE_SIZE = 500  # Entries kept by a timeline rebuild
+
+# Shelf Settings
+SHELF_PREVIEW_SIZE = 4  # Covers embedded per shelf/collection; the contents are paginated at .../items/
+SHELF_BATCH_SIZE = 500  # Books per batch add/remove/move request
+
+# Notification Settings
+NOTIFICATION_READ_RETENTION_DAYS = 30
+NOTIFICATION_UNREAD_RETENTION_DAYS = 180
+NOTIFICATION_PURGE_BATCH_SIZE = 2000  # Rows per delete transaction
+NOTIFICATION_PURGE_PAUSE = 0.5  # Seconds between batches
+NOTIFICATION_PURGE_MAX_SECONDS = 5 * 60  # Per run; the next run carries on
+LIKE_NOTIFICATION_ACTORS = 3  # Usernames named in a grouped like notification
+LIKE_NOTIFICATION_DEBOUNCE = 10  # Seconds a like waits to be folded with the likes after it
 
 # Rating Settings
 RATING_MIN = 1
@@ -1,74 +1,66 @@
+import logging
+
 from celery import shared_task
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Avg, Count, Sum, Q
+from django.utils.dateparse import parse_date, parse_datetime
 from django.core.cache import cache
-from books.models import Book
-from reviews.models import Review
+from reviews.aggregates import recompute_book_aggregates
+from books.trending import refresh_trending_scores
+
+logger = logging.getLogger('bookreview')
+
+BOOK_RATINGS_WATERMARK_KEY = 'book_ratings:watermark'
 
 
 @shared_task
-def update_book_ratings():
-    """Update book ratings - Run periodically"""
-    books = Book.objects.filter(is_active=True)
-    for book in books:
-        ratings = Review.objects.filter(
-            book=book,
-            status='public',
-            is_active=True,
-            rating__isnull=False
-        )
-        if ratings.exists():
-            book.avg_rating = ratings.aggregate(avg=Avg('rating'))['avg'] or 0
-            book.rating_count = ratings.count()
-        else:
-            book.avg_rating = 0
-            book.rating_count = 0
-        
-        book.review_count = Review.objects.filter(
-            book=book,
-            status='public',
-            is_active=True
-        ).count()
-        
-        book.save(update_fields=['avg_rating', 'rating_count', 'review_count'])
+def update_book_ratings(since=None, incremental=False, batch_size=1000):
+    """
+    Recompute book rating aggregates - Run periodically
+
+    One grouped aggregate over Review plus one bulk UPDATE per batch of
+    books, only rows that actually changed are written.
+    - since: ISO datetime, only books whose reviews changed after it
+    - incremental: use the watermark left by the previous run as `since`
+    """
+    if since:
+        if isinstance(since, str):
+            # parse_datetime also accepts a bare date as midnight: require a time part
+            parsed = None if parse_date(since) else parse_datetime(since)
+            if parsed is None:
+                logger.error('update_book_ratings: invalid since value %r', since)
+                raise ValueError(f'Invalid since value: {since!r} (expected an ISO datetime)')
+            since = parsed
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+    elif incremental:
+        since = cache.get(BOOK_RATINGS_WATERMARK_KEY)
+
+    run_started = timezone.now()
+    stats = recompute_book_aggregates(since=since, batch_size=batch_size)
+    cache.set(BOOK_RATINGS_WATERMARK_KEY, run_started, None)
+
+    logger.info(
+        'update_book_ratings: scanned=%(scanned)s updated=%(updated)s '
+        'seconds=%(seconds)s rows_per_sec=%(rows_per_sec)s', stats
+    )
+    return (
+        f"Scanned {stats['scanned']} books, updated {stats['updated']} "
+        f"in {stats['seconds']}s ({stats['rows_per_sec']} rows/s)"
+    )
 
 
 @shared_task
 def calculate_trending_books():
-    """Calculate trending books based on recent reviews and ratings"""
-    # Get books with reviews in the last 7 days
-    week_ago = timezone.now() - timedelta(days=7)
-    
-    trending_books = Book.objects.filter(
-        reviews__created_at__gte=week_ago,
-        is_active=True
-    ).annotate(
-        recent_reviews=Count('reviews', filter=Q(reviews__created_at__gte=week_ago)),
-        avg_rating=Avg('reviews__rating', filter=Q(
-            reviews__status='public',
-            reviews__is_active=True,
-            reviews__rating__isnull=False
-        ))
-    ).order_by('-recent_reviews', '-avg_rating')[:20]
-    
-    # Cache the results
-    cache.set('trending_books', list(trending_books.values_list('id', flat=True)), 3600 * 6)
-    
-    return f"Calculated trending books: {trending_books.count()}"
+    """Calculate trending books - kept for existing schedules, see books.trending"""
+    scored = refresh_trending_scores()
+    return f"Calculated trending books: {scored}"
 
 
 @shared_task
 def cleanup_old_notifications():
-    """Clean up old read notifications"""
-    from social.models import Notification
-    from datetime import timedelta
-    
-    # Delete read notifications older than 30 days
-    cutoff_date = timezone.now() - timedelta(days=30)
-    deleted = Notification.objects.filter(
-        is_read=True,
-        created_at__lt=cutoff_date
-    ).delete()
-    
-    return f"Deleted {deleted[0]} old notifications"
+    """Delete and archive expired notifications in small, paced batches - Run hourly (see social.retention)"""
+    from social.retention import purge_notifications
+
+    deleted = purge_notifications()
+    logger.info('cleanup_old_notifications: deleted=%s', deleted)
+    return f"Deleted {deleted} old notifications"
@@ -10,6 +10,7 @@ from django.contrib.sitemaps.views import sitemap
 from django.shortcuts import get_object_or_404, render, redirect
 
 from .sitemaps import BookSitemap, AuthorSitemap, ReviewSitemap
+from .viewer_state import ViewerStateView
 from .views import (
     home_view, explore_view, login_view, register_view, password_reset_view,
     user_profile_view, user_shelves_view, settings_view, shelf_detail_view,
@@ -20,6 +21,7 @@ from .views import (
 )
 from books.models import Book
 from reviews.models import Review
+from reviews.like_counts import merge_pending_like_counts
 
 # Frontend views for book and review detail pages
 def book_detail_frontend(request, slug):
@@ -33,6 +35,7 @@ def book_detail_frontend(request, slug):
 def review_detail_frontend(request, pk):
     """Review detail page"""
     review = get_object_or_404(Review, pk=pk, is_active=True)
+    merge_pending_like_counts([review])
     context = {
         'review': review,
     }
@@ -80,6 +83,7 @@ urlpatterns = [
     path('api/social/', include('social.urls')),
     path('api/moderation/', include('moderation.urls')),
     path('api/search/', include('search.urls')),
+    path('api/viewer-state/', ViewerStateView.as_view(), name='viewer_state'),
     
     # Admin and SEO
     path('admin/', admin.site.urls),
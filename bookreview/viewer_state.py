@@ -0,0 +1,84 @@
+"""
+Per-user state of the reviews, comments and books shown on a page.
+
+Companion of the public payload mode (bookreview.public): the page loads
+the shared payloads from a cache/CDN, then asks once for what depends on
+the viewer:
+
+    GET /api/viewer-state/?reviews=1,2&comments=7&books=3,4
+    {
+        "reviews": {"1": {"is_liked": true, "can_edit": false}, ...},
+        "comments": {"7": {"is_liked": false, "can_edit": true}},
+        "books": {"3": {"shelves": [12, 15]}, "4": {"shelves": []}}
+    }
+
+One query per relation: likes and owned rows per model, shelf items for
+all books.
+"""
+from collections import defaultdict
+
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from reviews.likes import LikeResolver
+from reviews.models import Review, Comment
+from shelves.models import ShelfItem
+
+MAX_IDS = 100
+
+
+class InvalidIds(ValueError):
+    pass
+
+
+def parse_ids(value):
+    """'1,2,3' -> [1, 2, 3]"""
+    if not value:
+        return []
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise InvalidIds('ids must be comma separated integers')
+    if len(ids) > MAX_IDS:
+        raise InvalidIds(f'at most {MAX_IDS} ids per type')
+    return ids
+
+
+def viewer_state(user, review_ids=(), comment_ids=(), book_ids=()):
+    likes = LikeResolver(user)
+    state = {}
+    for key, model, ids in (('reviews', Review, review_ids), ('comments', Comment, comment_ids)):
+        if not ids:
+            state[key] = {}
+            continue
+        likes.prime(model, ids)
+        owned = set(model.objects.filter(pk__in=ids, user=user).values_list('pk', flat=True))
+        state[key] = {
+            str(pk): {'is_liked': likes.is_liked_pk(model, pk), 'can_edit': pk in owned}
+            for pk in ids
+        }
+
+    shelves = defaultdict(list)
+    if book_ids:
+        for book_id, shelf_id in ShelfItem.objects.filter(
+            shelf__user=user, book_id__in=book_ids
+        ).values_list('book_id', 'shelf_id'):
+            shelves[book_id].append(shelf_id)
+    state['books'] = {str(pk): {'shelves': shelves[pk]} for pk in book_ids}
+    return state
+
+
+class ViewerStateView(APIView):
+    """Likes, edit rights and shelf membership of the current user for a list of ids"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            ids = {key: parse_ids(request.query_params.get(key)) for key in ('reviews', 'comments', 'books')}
+        except InvalidIds as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        data = viewer_state(request.user, ids['reviews'], ids['comments'], ids['books'])
+        response = Response(data)
+        response['Cache-Control'] = 'private, no-store'
+        return response
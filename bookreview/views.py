@@ -3,7 +3,6 @@ Frontend views for BookReview.vn
 """
 from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.contenttypes.models import ContentType
 from django.views.generic import TemplateView, DetailView
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
@@ -14,7 +13,10 @@ from django.core.paginator import Paginator  # NEW
 from users.models import User
 from books.models import Book, Genre, Publisher
 from reviews.models import Review
+from reviews.like_counts import merge_pending_like_counts
 from social.models import Follow
+from . import content_types
+from .pagination import InvalidCursor, paginate_keyset
 
 
 def home_view(request):
@@ -60,11 +62,9 @@ def user_profile_view(request, username):
 
     is_following = False
     if request.user.is_authenticated and request.user != profile_user:
-        user_content_type = ContentType.objects.get_for_model(User)
-        
         is_following = Follow.objects.filter(
             follower=request.user,
-            content_type=user_content_type,
+            content_type_id=content_types.content_type_id('user'),
             object_id=profile_user.id
         ).exists()
     
@@ -120,13 +120,25 @@ def review_list_frontend(request):
         sort = 'newest'
         qs = qs.order_by('-created_at')
 
-    paginator = Paginator(qs, 10)  # 10 review / trang
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Phân trang keyset (?cursor=): trang sâu không chậm dần, không COUNT(*)
+    # ?page= cũ (link đã lưu) vẫn dùng Paginator; top_rated cũng vậy vì
+    # rating có thể NULL, keyset chỉ nhận cột NOT NULL
+    page_obj = cursor_page = None
+    if 'page' in request.GET or sort == 'top_rated':
+        page_obj = Paginator(qs, 10).get_page(request.GET.get('page'))  # 10 review / trang
+        reviews = page_obj.object_list
+    else:
+        try:
+            cursor_page = paginate_keyset(qs, request.GET.get('cursor'), page_size=10)
+        except InvalidCursor:
+            cursor_page = paginate_keyset(qs, page_size=10)
+        reviews = cursor_page.object_list
+    reviews = merge_pending_like_counts(reviews)
 
     context = {
         'page_obj': page_obj,
-        'reviews': page_obj.object_list,
+        'cursor_page': cursor_page,
+        'reviews': reviews,
         'sort': sort,
         'user': request.user,  # Add user to context
     }
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookreview.settings')
 
 application = get_wsgi_application()
+
+from bookreview import content_types  # noqa: E402  (needs the app registry)
+
+content_types.warm()
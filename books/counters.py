@@ -0,0 +1,55 @@
+"""
+Denormalized Author/Genre/Publisher.book_count (number of active books).
+
+books.signals shifts the counters with F() updates when a book gains or
+loses an author/genre/publisher or is (de)activated. `recompute_book_counts`
+rebuilds them from scratch (bulk imports that bypass signals).
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from bookreview.caching import invalidate
+
+
+def shift_book_counts(model, deltas):
+    """Apply {pk: delta} to model.book_count, one UPDATE per distinct delta"""
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if pk is not None and delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(
+            book_count=Greatest(F('book_count') + delta, 0)
+        )
+    if by_delta:
+        name = model._meta.model_name
+        invalidate(f'{name}:list', *[f'{name}:{pk}' for pks in by_delta.values() for pk in pks])
+
+
+def _count(queryset, group_by):
+    counts = queryset.order_by().values(group_by).annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def recompute_book_counts(Book):
+    """
+    Rewrite book_count of every author, genre and publisher from the books
+    table. Returns {model name: rows updated}.
+    """
+    active = {'book__is_active': True}
+    updated = {}
+    for field in ('authors', 'genres'):
+        through = Book._meta.get_field(field).remote_field.through
+        related = Book._meta.get_field(field).related_model
+        column = f'{related._meta.model_name}_id'
+        updated[related.__name__] = related.objects.update(book_count=_count(
+            through.objects.filter(**{column: OuterRef('pk')}, **active), column
+        ))
+
+    Publisher = Book._meta.get_field('publisher').related_model
+    updated[Publisher.__name__] = Publisher.objects.update(book_count=_count(
+        Book.objects.filter(publisher=OuterRef('pk'), is_active=True), 'publisher'
+    ))
+    return updated
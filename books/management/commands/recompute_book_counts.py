@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from books.counters import recompute_book_counts
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Recompute book_count of every author, genre and publisher from the books table'
+
+    def handle(self, *args, **options):
+        updated = recompute_book_counts(Book)
+        for name, rows in updated.items():
+            self.stdout.write(f'{name}: {rows} row(s) recomputed')
+        self.stdout.write(self.style.SUCCESS('Book counts are up to date'))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:15
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, DecimalField
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_sum(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    Review = apps.get_model('reviews', 'Review')
+    totals = Review.objects.filter(
+        book=OuterRef('pk'), status='public', is_active=True, rating__isnull=False
+    ).order_by().values('book').annotate(total=Sum('rating')).values('total')
+    Book.objects.update(rating_sum=Coalesce(
+        Subquery(totals, output_field=DecimalField(max_digits=12, decimal_places=1)),
+        Decimal('0'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_link_buy'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=12, verbose_name='rating sum'),
+        ),
+        migrations.RunPython(backfill_rating_sum, migrations.RunPython.noop),
+    ]
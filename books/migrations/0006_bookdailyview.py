@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:19
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def backfill_daily_views(apps, schema_editor):
+    """Roll the BookView rows up per (book, local day), as view_tracking flushes them"""
+    BookView = apps.get_model('books', 'BookView')
+    BookDailyView = apps.get_model('books', 'BookDailyView')
+    days = BookView.objects.annotate(
+        date=TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+    ).order_by().values('book_id', 'date').annotate(view_count=Count('pk'))
+    batch = []
+    for row in days.iterator(chunk_size=BATCH_SIZE):
+        batch.append(BookDailyView(**row))
+        if len(batch) >= BATCH_SIZE:
+            BookDailyView.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    BookDailyView.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_rating_sum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookDailyView',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('view_count', models.PositiveIntegerField(default=0, verbose_name='view count')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'book daily view',
+                'verbose_name_plural': 'book daily views',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='books_bookd_date_b12255_idx')],
+                'unique_together': {('book', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_views, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_bookdailyview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookTrendingScore',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending_score', serialize=False, to='books.book')),
+                ('score', models.FloatField(default=0, verbose_name='score')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'book trending score',
+                'verbose_name_plural': 'book trending scores',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['-score'], name='books_bookt_score_c8c544_idx')],
+            },
+        ),
+    ]
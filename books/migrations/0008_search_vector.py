@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:25
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Func, OuterRef, Subquery, TextField
+import search.functions
+
+# unaccent() is only STABLE (it depends on the dictionary search path), so it
+# cannot appear in an index expression. Pin the dictionary and mark it IMMUTABLE.
+CREATE_IMMUTABLE_UNACCENT = """
+CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+"""
+
+
+def backfill_book_vectors(apps, schema_editor):
+    # Same document as search.engine.update_book_vectors at the time of this migration
+    Book = apps.get_model('books', 'Book')
+
+    def document(expression, weight):
+        unaccented = Func(expression, function='immutable_unaccent', output_field=TextField())
+        return SearchVector(unaccented, weight=weight, config='simple')
+
+    def related_names(through, field):
+        names = through.objects.filter(book_id=OuterRef('pk')).order_by().values('book_id').annotate(
+            names=StringAgg(f'{field}__name', ' ')
+        ).values('names')
+        return Subquery(names, output_field=TextField())
+
+    Book.objects.update(search_vector=(
+        document('title', 'A')
+        + document(related_names(Book.authors.through, 'author'), 'B')
+        + document(related_names(Book.tags.through, 'tag'), 'C')
+        + document('description', 'D')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_booktrendingscore'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        TrigramExtension(),
+        migrations.RunSQL(CREATE_IMMUTABLE_UNACCENT, 'DROP FUNCTION IF EXISTS immutable_unaccent(text);'),
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_book_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='book_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(search.functions.ImmutableUnaccent('title'), name='gin_trgm_ops'), name='book_title_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:35
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_book_counts(apps, schema_editor):
+    """book_count of every author, genre and publisher: their active books"""
+    Book = apps.get_model('books', 'Book')
+
+    def count(queryset, group_by):
+        counts = queryset.order_by().values(group_by).annotate(count=Count('*')).values('count')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    for field, model_name in (('authors', 'Author'), ('genres', 'Genre')):
+        through = Book._meta.get_field(field).remote_field.through
+        column = f'{model_name.lower()}_id'
+        apps.get_model('books', model_name).objects.update(book_count=count(
+            through.objects.filter(**{column: OuterRef('pk')}, book__is_active=True), column
+        ))
+    apps.get_model('books', 'Publisher').objects.update(book_count=count(
+        Book.objects.filter(publisher=OuterRef('pk'), is_active=True), 'publisher'
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='book count'),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='book count'),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='book count'),
+        ),
+        migrations.RunPython(backfill_book_counts, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,13 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.urls import reverse
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, RegexValidator
 
+from search.functions import ImmutableUnaccent
+
 
 class Author(models.Model):
     """Author Model"""
@@ -15,6 +19,7 @@ class Author(models.Model):
     death_date = models.DateField(_('death date'), null=True, blank=True)
     nationality = models.CharField(_('nationality'), max_length=100, blank=True)
     website = models.URLField(_('website'), blank=True)
+    book_count = models.PositiveIntegerField(_('book count'), default=0)  # Active books, kept by books.signals
     is_active = models.BooleanField(_('active'), default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -43,6 +48,7 @@ class Genre(models.Model):
     description = models.TextField(_('description'), blank=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, 
                                blank=True, related_name='children')
+    book_count = models.PositiveIntegerField(_('book count'), default=0)  # Active books, kept by books.signals
     is_active = models.BooleanField(_('active'), default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -71,6 +77,7 @@ class Publisher(models.Model):
     description = models.TextField(_('description'), blank=True)
     logo = models.ImageField(_('logo'), upload_to='publishers/', null=True, blank=True)
     website = models.URLField(_('website'), blank=True)
+    book_count = models.PositiveIntegerField(_('book count'), default=0)  # Active books, kept by books.signals
     is_active = models.BooleanField(_('active'), default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -142,7 +149,12 @@ class Book(models.Model):
     avg_rating = models.DecimalField(_('average rating'), max_digits=3, decimal_places=2, 
                                      default=0.00)
     rating_count = models.PositiveIntegerField(_('rating count'), default=0)
+    rating_sum = models.DecimalField(_('rating sum'), max_digits=12, decimal_places=1,
+                                     default=0)
     review_count = models.PositiveIntegerField(_('review count'), default=0)
+
+    # Full-text search document (title, authors, tags, description), kept by search.signals
+    search_vector = SearchVectorField(null=True, editable=False)
     
     # Status
     is_active = models.BooleanField(_('active'), default=True)
@@ -157,15 +169,39 @@ class Book(models.Model):
             models.Index(fields=['slug', 'is_active']),
             models.Index(fields=['avg_rating', 'rating_count']),
             models.Index(fields=['-created_at']),
+            GinIndex(fields=['search_vector'], name='book_search_vector_idx'),
+            GinIndex(OpClass(ImmutableUnaccent('title'), name='gin_trgm_ops'),
+                     name='book_title_trgm_idx'),
         ]
 
+    # Fields whose changes move author/genre/publisher book_count or the search index
+    TRACKED_FIELDS = ('title', 'publisher_id', 'is_active')
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Snapshot tracked fields so signals can tell what a save changed
+        if all(name in field_names for name in cls.TRACKED_FIELDS):
+            instance._tracked_state = instance.tracked_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None:
+            self._tracked_state = self.tracked_state()
+
+    def tracked_state(self):
+        return {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
         super().save(*args, **kwargs)
+        # Every post_save handler has seen the old state by now
+        self._tracked_state = self.tracked_state()
 
     def get_absolute_url(self):
         return reverse('book_detail', kwargs={'slug': self.slug})
@@ -206,6 +242,7 @@ class BookEdition(models.Model):
 class BookView(models.Model):
     """
     Book View Model to track views of each book.
+    Superseded by BookDailyView, no longer written on each detail hit.
     """
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='book_views')
     ip_address = models.GenericIPAddressField(null=True, blank=True)
@@ -222,6 +259,50 @@ class BookView(models.Model):
 
     def __str__(self):
         return f"{self.book.title} viewed at {self.created_at}"
+
+
+class BookDailyView(models.Model):
+    """
+    Daily view counter per book.
+    Views are buffered in Redis and flushed here by a periodic task.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='daily_views')
+    date = models.DateField(_('date'))
+    view_count = models.PositiveIntegerField(_('view count'), default=0)
+
+    class Meta:
+        verbose_name = _('book daily view')
+        verbose_name_plural = _('book daily views')
+        ordering = ['-date']
+        unique_together = ['book', 'date']
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.book.title}: {self.view_count} views on {self.date}"
+
+
+class BookTrendingScore(models.Model):
+    """
+    Precomputed trending score per book (time-decayed views, shelf adds
+    and reviews), refreshed periodically by books.trending.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True,
+                                related_name='trending_score')
+    score = models.FloatField(_('score'), default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('book trending score')
+        verbose_name_plural = _('book trending scores')
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.book.title}: {self.score:.2f}"
     
 
 class DataSeedTracker(models.Model):
@@ -1,43 +1,41 @@
+from django.db.models import prefetch_related_objects
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
 from .models import Author, Genre, Publisher, Tag, Book, BookEdition
 
 
-class AuthorSerializer(serializers.ModelSerializer):
-    book_count = serializers.SerializerMethodField()
+def prepare_book_list(books):
+    """
+    Load everything BookListSerializer reads for a page of books in a
+    constant number of queries: authors and genres, kept if already
+    prefetched (their book_count is a column).
+    """
+    books = list(books)
+    prefetch_related_objects(books, 'authors', 'genres')
+    return books
+
 
+class AuthorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Author
         fields = ['id', 'name', 'slug', 'bio', 'photo', 'birth_date', 
                  'death_date', 'nationality', 'website', 'book_count']
         read_only_fields = ['id', 'slug', 'book_count']
 
-    def get_book_count(self, obj):
-        return obj.books.filter(is_active=True).count()
-
 
 class GenreSerializer(serializers.ModelSerializer):
-    book_count = serializers.SerializerMethodField()
-
     class Meta:
         model = Genre
         fields = ['id', 'name', 'slug', 'description', 'parent', 'book_count']
         read_only_fields = ['id', 'slug', 'book_count']
 
-    def get_book_count(self, obj):
-        return obj.books.filter(is_active=True).count()
-
 
 class PublisherSerializer(serializers.ModelSerializer):
-    book_count = serializers.SerializerMethodField()
-
     class Meta:
         model = Publisher
         fields = ['id', 'name', 'slug', 'description', 'logo', 'website', 'book_count']
         read_only_fields = ['id', 'slug', 'book_count']
 
-    def get_book_count(self, obj):
-        return obj.books.filter(is_active=True).count()
-
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -53,6 +51,22 @@ class BookEditionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class BookCoverSerializer(serializers.ModelSerializer):
+    """Title and cover only (shelf/collection previews): no related rows"""
+    class Meta:
+        model = Book
+        fields = ['id', 'title', 'slug', 'cover']
+        read_only_fields = fields
+
+
+class BookListListSerializer(serializers.ListSerializer):
+    """many=True mode of BookListSerializer: batch-loads the page first"""
+
+    def to_representation(self, data):
+        books = data.all() if isinstance(data, BaseManager) else data
+        return super().to_representation(prepare_book_list(books))
+
+
 class BookListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for list view"""
     authors = AuthorSerializer(many=True, read_only=True)
@@ -65,11 +79,13 @@ class BookListSerializer(serializers.ModelSerializer):
                  'genres', 'primary_genre', 'avg_rating', 'rating_count', 
                  'review_count','link_buy']
         read_only_fields = ['id', 'slug']
+        list_serializer_class = BookListListSerializer
 
     def get_primary_genre(self, obj):
-        primary = obj.genres.first()
+        # genres.all() reuses the prefetch (ordered by name like .first())
+        primary = next(iter(obj.genres.all()), None)
         if primary:
-            return GenreSerializer(primary).data
+            return GenreSerializer(primary, context=self.context).data
         return None
 
 
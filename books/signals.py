@@ -0,0 +1,149 @@
+from collections import Counter
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from bookreview.caching import invalidate
+from .models import Author, Book, BookEdition, Genre, Publisher, Tag
+from .counters import shift_book_counts
+
+
+# =========================
+# 1. BOOK: publisher, is_active
+# =========================
+
+@receiver(pre_save, sender=Book)
+def capture_book_state(sender, instance: Book, raw=False, **kwargs):
+    """Lấy trạng thái cũ của sách nếu instance không được load từ DB"""
+    if instance.pk and not raw and not hasattr(instance, '_tracked_state'):
+        instance._tracked_state = Book.objects.filter(pk=instance.pk).values(
+            *Book.TRACKED_FIELDS
+        ).first()
+
+
+@receiver(post_save, sender=Book)
+def handle_book_save(sender, instance: Book, created, raw=False, **kwargs):
+    """
+    - Đổi publisher / is_active -> cập nhật book_count của publisher
+    - Bật/tắt is_active -> cập nhật book_count của tất cả author, genre của sách
+    """
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_tracked_state', None)
+    was_active = bool(previous and previous['is_active'])
+    old_publisher = previous['publisher_id'] if previous else None
+
+    publishers = Counter()
+    if was_active:
+        publishers[old_publisher] -= 1
+    if instance.is_active:
+        publishers[instance.publisher_id] += 1
+    shift_book_counts(Publisher, publishers)
+
+    # A new book has no authors/genres yet: m2m_changed counts them when added
+    if previous is not None and was_active != instance.is_active:
+        delta = 1 if instance.is_active else -1
+        for field, model in (('authors', Author), ('genres', Genre)):
+            ids = getattr(instance, field).values_list('pk', flat=True)
+            shift_book_counts(model, {pk: delta for pk in ids})
+
+
+@receiver(pre_delete, sender=Book)
+def capture_book_relations(sender, instance: Book, **kwargs):
+    """Các dòng M2M bị xóa trước sách -> nhớ author, genre để trừ book_count"""
+    if instance.is_active:
+        instance._counted_relations = {
+            Author: list(instance.authors.values_list('pk', flat=True)),
+            Genre: list(instance.genres.values_list('pk', flat=True)),
+        }
+
+
+@receiver(post_delete, sender=Book)
+def handle_book_delete(sender, instance: Book, **kwargs):
+    if not instance.is_active:
+        return
+    shift_book_counts(Publisher, {instance.publisher_id: -1})
+    for model, ids in getattr(instance, '_counted_relations', {}).items():
+        shift_book_counts(model, {pk: -1 for pk in ids})
+
+
+# =========================
+# 2. BOOK.AUTHORS / BOOK.GENRES
+# =========================
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+def handle_book_relations(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    book.authors/genres.add/remove/clear (hoặc author/genre.books.*)
+    -> cộng/trừ book_count theo số sách active được thêm/bớt
+    """
+    related_model = instance.__class__ if reverse else model
+    related_column = f'{related_model._meta.model_name}_id'
+
+    if action in ('pre_remove', 'pre_clear'):
+        # pk_set of remove may hold ids that were never linked, and clear has none
+        links = sender.objects.all()
+        if reverse:
+            links = links.filter(**{related_column: instance.pk}, book__is_active=True)
+        elif instance.is_active:
+            links = links.filter(book_id=instance.pk)
+        else:
+            links = links.none()
+        if pk_set is not None:
+            links = links.filter(**{'book_id__in' if reverse else f'{related_column}__in': pk_set})
+        instance._unlinked_count = Counter(links.values_list(related_column, flat=True))
+        return
+
+    if action == 'post_add':
+        if reverse:
+            added = Book.objects.filter(pk__in=pk_set, is_active=True).count()
+            shift_book_counts(related_model, {instance.pk: added})
+        elif instance.is_active:
+            shift_book_counts(related_model, {pk: 1 for pk in pk_set})
+    elif action in ('post_remove', 'post_clear'):
+        removed = getattr(instance, '_unlinked_count', Counter())
+        shift_book_counts(related_model, {pk: -count for pk, count in removed.items()})
+
+
+# =========================
+# 3. CACHE (bookreview.caching)
+# =========================
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book(sender, instance: Book, **kwargs):
+    invalidate(f'book:{instance.pk}')
+
+
+@receiver(post_save, sender=BookEdition)
+@receiver(post_delete, sender=BookEdition)
+def invalidate_book_edition(sender, instance: BookEdition, **kwargs):
+    invalidate(f'book:{instance.book_id}')
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Publisher)
+@receiver(post_delete, sender=Publisher)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_taxonomy(sender, instance, **kwargs):
+    """Author/genre/publisher/tag đổi -> cache của chính nó, danh sách và sách nhúng nó"""
+    name = sender._meta.model_name
+    invalidate(f'{name}:{instance.pk}', f'{name}:list')
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+@receiver(m2m_changed, sender=Book.tags.through)
+def invalidate_book_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate(f'book:{instance.pk}')
+    else:
+        # Books that lose the author/genre/tag carry its tag; added ones are in pk_set
+        invalidate(f'{instance._meta.model_name}:{instance.pk}', *[f'book:{pk}' for pk in pk_set or ()])
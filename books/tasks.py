@@ -0,0 +1,17 @@
+from celery import shared_task
+
+from . import trending, view_tracking
+
+
+@shared_task
+def flush_book_views():
+    """Flush buffered book views from Redis to BookDailyView - Run every minute"""
+    written = view_tracking.flush_book_views()
+    return f"Flushed views of {written} book-days"
+
+
+@shared_task
+def refresh_trending_books():
+    """Recompute decayed trending scores - Run every 10 minutes"""
+    scored = trending.refresh_trending_scores()
+    return f"Refreshed trending scores of {scored} books"
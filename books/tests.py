@@ -1,17 +1,26 @@
 """
 Tests for books app
 """
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
 
-from .models import Book, Author, Genre, Publisher, Tag
+from bookreview.caching import get_or_compute, invalidate
+from .models import Book, Author, Genre, Publisher, Tag, BookDailyView, BookTrendingScore
+from .view_tracking import apply_view_counts, flush_book_views
+from .trending import compute_trending_scores, refresh_trending_scores
 
 User = get_user_model()
 
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bookreview-tests'}}
+
 
 class BookModelTest(TestCase):
     """Test Book model"""
@@ -163,3 +172,398 @@ class BookAPITest(APITestCase):
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    
+    def test_trending_books(self):
+        """Test trending books ranks recently viewed books"""
+        apply_view_counts({(self.book.pk, timezone.localdate()): 3})
+        refresh_trending_scores()
+        url = reverse('books:book_trending')
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['id'], self.book.pk)
+    
+    def test_book_detail_counts_view_once_per_visitor(self):
+        """Test repeated detail hits from one visitor count a single view"""
+        from django.core.cache import cache
+        url = reverse('books:book_detail', kwargs={'slug': self.book.slug})
+        # Local cache: the dedup key and the buffer never reach the shared Redis
+        with self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'book-view-tests',
+        }}):
+            cache.clear()
+            self.client.get(url, format='json')
+            self.client.get(url, format='json')
+            flush_book_views()
+        daily = BookDailyView.objects.get(book=self.book, date=timezone.localdate())
+        self.assertEqual(daily.view_count, 1)
+
+
+class BookViewFlushTest(TestCase):
+    """Test flushing buffered view counts"""
+    
+    def setUp(self):
+        self.books = [Book.objects.create(title=f'Book {i}') for i in range(3)]
+    
+    def test_apply_view_counts_accumulates(self):
+        """Test counts are added to existing daily rows in bulk"""
+        today = timezone.localdate()
+        apply_view_counts({(self.books[0].pk, today): 2})
+        apply_view_counts({
+            (self.books[0].pk, today): 3,
+            (self.books[1].pk, today): 1,
+            (999999, today): 5,
+        })
+        counts = dict(BookDailyView.objects.values_list('book_id', 'view_count'))
+        self.assertEqual(counts, {self.books[0].pk: 5, self.books[1].pk: 1})
+
+
+class TrendingScoreTest(TestCase):
+    """Test decayed trending scores"""
+    
+    def setUp(self):
+        self.fresh = Book.objects.create(title='Fresh Book')
+        self.old = Book.objects.create(title='Old Book')
+    
+    def test_older_activity_decays(self):
+        """Test the same activity counts less the older it is"""
+        today = timezone.localdate()
+        apply_view_counts({
+            (self.fresh.pk, today): 10,
+            (self.old.pk, today - timedelta(days=6)): 10,
+        })
+        scores = compute_trending_scores(today)
+        self.assertAlmostEqual(scores[self.fresh.pk], 10.0)
+        self.assertAlmostEqual(scores[self.old.pk], 2.5)
+    
+    def test_refresh_drops_stale_books(self):
+        """Test books without activity in the horizon leave the table"""
+        BookTrendingScore.objects.create(book=self.old, score=50)
+        apply_view_counts({(self.fresh.pk, timezone.localdate()): 1})
+        refresh_trending_scores()
+        self.assertEqual(
+            list(BookTrendingScore.objects.values_list('book_id', flat=True)),
+            [self.fresh.pk]
+        )
+
+
+class BookCountTest(TestCase):
+    """Test denormalized book_count on authors, genres and publishers"""
+    
+    def setUp(self):
+        self.author = Author.objects.create(name='Counted Author')
+        self.other_author = Author.objects.create(name='Other Author')
+        self.genre = Genre.objects.create(name='Counted Genre')
+        self.publisher = Publisher.objects.create(name='Counted Publisher')
+        self.other_publisher = Publisher.objects.create(name='Other Publisher')
+        self.book = Book.objects.create(title='Counted Book', publisher=self.publisher)
+        self.book.authors.add(self.author, self.other_author)
+        self.book.genres.add(self.genre)
+    
+    def assertCounts(self, author, genre, publisher):
+        self.assertEqual(
+            (Author.objects.get(pk=self.author.pk).book_count,
+             Genre.objects.get(pk=self.genre.pk).book_count,
+             Publisher.objects.get(pk=self.publisher.pk).book_count),
+            (author, genre, publisher)
+        )
+    
+    def test_add_and_remove(self):
+        """Test forward and reverse m2m changes move the counters"""
+        self.assertCounts(1, 1, 1)
+        second = Book.objects.create(title='Second Book')
+        self.author.books.add(second)
+        self.genre.books.add(second)
+        self.assertCounts(2, 2, 1)
+        self.book.authors.remove(self.author, self.author)
+        self.book.genres.remove(Genre.objects.create(name='Never Linked'))
+        self.assertCounts(1, 2, 1)
+        self.genre.books.clear()
+        self.assertCounts(1, 0, 1)
+    
+    def test_deactivate_and_move(self):
+        """Test is_active and publisher changes"""
+        book = Book.objects.get(pk=self.book.pk)
+        book.is_active = False
+        book.save()
+        self.assertCounts(0, 0, 0)
+        self.assertEqual(Author.objects.get(pk=self.other_author.pk).book_count, 0)
+        book.is_active = True
+        book.publisher = self.other_publisher
+        book.save()
+        self.assertCounts(1, 1, 0)
+        self.assertEqual(Publisher.objects.get(pk=self.other_publisher.pk).book_count, 1)
+    
+    def test_delete(self):
+        """Test deleting a book releases its counts"""
+        self.book.delete()
+        self.assertCounts(0, 0, 0)
+    
+    def test_recompute_command(self):
+        """Test recompute_book_counts repairs drift"""
+        from io import StringIO
+        from django.core.management import call_command
+        Author.objects.update(book_count=9)
+        Publisher.objects.update(book_count=9)
+        call_command('recompute_book_counts', stdout=StringIO())
+        self.assertCounts(1, 1, 1)
+        self.assertEqual(Publisher.objects.get(pk=self.other_publisher.pk).book_count, 0)
+
+class BookSearchTest(APITestCase):
+    """Test full-text search over books and reviews"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='TestPass123!'
+        )
+        self.author = Author.objects.create(name='Lev Tolstoy')
+        self.book = Book.objects.create(title='Chiến tranh và hòa bình', description='Tiểu thuyết sử thi')
+        self.book.authors.add(self.author)
+        self.other = Book.objects.create(title='Garden of Shadows')
+        self.url = reverse('search:search')
+    
+    def search_titles(self, query, search_type='books'):
+        response = self.client.get(self.url, {'q': query, 'type': search_type})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        key = 'books' if search_type == 'books' else 'reviews'
+        return [item['title'] for item in response.data[key]]
+    
+    def test_search_ignores_diacritics(self):
+        """Test unaccented queries match Vietnamese titles"""
+        self.assertEqual(self.search_titles('chien tranh'), [self.book.title])
+    
+    def test_search_by_author_name(self):
+        """Test author names added after creation are searchable"""
+        self.assertEqual(self.search_titles('tolstoy'), [self.book.title])
+        self.author.name = 'Leo Tolstoy'
+        self.author.save()
+        self.assertEqual(self.search_titles('leo'), [self.book.title])
+    
+    def test_typo_falls_back_to_trigrams(self):
+        """Test a misspelled title still finds the book"""
+        self.assertEqual(self.search_titles('Gardn of Shadow'), [self.other.title])
+    
+    def test_reviews_follow_book_title(self):
+        """Test renaming a book reindexes its reviews"""
+        from reviews.models import Review
+        review = Review.objects.create(book=self.other, user=self.user, title='Hay', body_md='Rất hay')
+        self.other.title = 'Vườn bóng tối'
+        self.other.save()
+        self.assertEqual(self.search_titles('vuon', 'reviews'), [review.title])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AutocompleteTest(APITestCase):
+    """Test autocomplete suggestions (no Redis index: suggestions come from the DB)"""
+    
+    def setUp(self):
+        patcher = mock.patch('search.autocomplete._request_rebuild')
+        self.request_rebuild = patcher.start()
+        self.addCleanup(patcher.stop)
+        Book.objects.create(title='Tôi thấy hoa vàng trên cỏ xanh', rating_count=5)
+        Book.objects.create(title='Cho tôi xin một vé đi tuổi thơ', rating_count=500)
+        Book.objects.create(title='Mắt biếc', rating_count=50)
+        Author.objects.create(name='Nguyễn Nhật Ánh')
+        self.url = reverse('search:autocomplete')
+    
+    def suggestions(self, query, search_type='books'):
+        response = self.client.get(self.url, {'q': query, 'type': search_type})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['text'] for item in response.data['suggestions']]
+    
+    def test_folded_prefixes(self):
+        """Test every word start is indexed without diacritics"""
+        from search.autocomplete import fold, prefixes
+        self.assertEqual(fold('Mắt Biếc, Đà Lạt'), 'mat biec da lat')
+        self.assertEqual(prefixes('mat biec'), {'m', 'ma', 'mat', 'mat ', 'mat b', 'mat bi',
+                                                'mat bie', 'mat biec', 'b', 'bi', 'bie', 'biec'})
+    
+    def test_books_by_popularity(self):
+        """Test unaccented word prefixes match, most rated first"""
+        self.assertEqual(self.suggestions('toi'), [
+            'Cho tôi xin một vé đi tuổi thơ',
+            'Tôi thấy hoa vàng trên cỏ xanh',
+        ])
+        self.assertEqual(self.suggestions('mat bi'), ['Mắt biếc'])
+    
+    def test_authors(self):
+        """Test author names match from any word"""
+        self.assertEqual(self.suggestions('nhat', 'authors'), ['Nguyễn Nhật Ánh'])
+    
+    def test_missing_index_requests_rebuild(self):
+        """Test an empty Redis asks for a rebuild and still answers from the DB"""
+        redis = mock.Mock()
+        redis.get.return_value = None
+        with mock.patch('search.autocomplete.get_redis', return_value=redis), \
+                mock.patch('search.autocomplete._generation', (None, 0.0)):
+            self.assertEqual(self.suggestions('mat bi'), ['Mắt biếc'])
+        self.request_rebuild.assert_called_once_with()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ListQueryCountTest(APITestCase):
+    """Test list endpoints run a constant number of queries whatever the page size"""
+    
+    # (url name, kwargs, params): expected queries
+    ENDPOINTS = {
+        ('books:book_list', None, ()): 4,
+        ('books:explore_books', None, ()): 4,
+        ('books:book_trending', None, ()): 4,
+        ('books:author_list', None, ()): 2,
+        ('books:genre_list', None, ()): 2,
+        ('books:publisher_list', None, ()): 2,
+        ('books:tag_list', None, ()): 2,
+        ('books:genre_detail', (('slug', 'shared-genre'),), ()): 6,
+        ('search:search', None, (('q', 'book'),)): 5,
+    }
+    
+    def setUp(self):
+        self.genre = Genre.objects.create(name='Shared Genre')
+        self.created = 0
+    
+    def add_books(self, count):
+        for _ in range(count):
+            self.created += 1
+            n = self.created
+            book = Book.objects.create(
+                title=f'Book {n}',
+                publisher=Publisher.objects.create(name=f'Publisher {n}'),
+            )
+            book.authors.add(Author.objects.create(name=f'Author {n}a'), Author.objects.create(name=f'Author {n}b'))
+            book.genres.add(self.genre, Genre.objects.create(name=f'Genre {n}'))
+            book.tags.add(Tag.objects.create(name=f'tag{n}'))
+            apply_view_counts({(book.pk, timezone.localdate()): n})
+        refresh_trending_scores()
+    
+    def count_queries(self):
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        counts = {}
+        for endpoint in self.ENDPOINTS:
+            name, kwargs, params = endpoint
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name, kwargs=dict(kwargs or ())), dict(params))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts[endpoint] = len(queries)
+        return counts
+    
+    def test_query_count_does_not_grow_with_page(self):
+        """Test 2 and 8 books per page cost the same, pinned number of queries"""
+        self.add_books(2)
+        self.assertEqual(self.count_queries(), self.ENDPOINTS)
+        self.add_books(6)
+        self.assertEqual(self.count_queries(), self.ENDPOINTS)
+
+
+class BookKeysetPaginationTest(APITestCase):
+    """Test ?cursor= pagination of the book list and genre pages"""
+    
+    def setUp(self):
+        self.genre = Genre.objects.create(name='Keyset Genre')
+        for i in range(7):
+            book = Book.objects.create(title=f'Keyset Book {i % 3}', slug=f'keyset-{i}', rating_count=i % 2)
+            book.genres.add(self.genre)
+    
+    def walk(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results = response.data['results']
+            if isinstance(results, dict):  # genre detail: {genre, books}
+                results = results['books']
+            ids += [row['id'] for row in results]
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+    
+    def test_book_list_orderings_with_ties(self):
+        """Test every ordering visits each book once, ties broken by id"""
+        books = list(Book.objects.all())
+        with mock.patch('bookreview.pagination.KeysetPagination.page_size', 3):
+            for ordering, key in (('-rating_count', lambda b: (-b.rating_count, -b.pk)),
+                                  ('title', lambda b: (b.title, b.pk))):
+                ids = self.walk(reverse('books:book_list'), {'cursor': '', 'ordering': ordering})
+                self.assertEqual(ids, [b.pk for b in sorted(books, key=key)], ordering)
+    
+    def test_genre_detail(self):
+        """Test genre pages walk the genre's books by rating"""
+        with mock.patch('bookreview.pagination.KeysetPagination.page_size', 2):
+            ids = self.walk(reverse('books:genre_detail', kwargs={'slug': self.genre.slug}), {'cursor': ''})
+        self.assertEqual(sorted(ids), sorted(Book.objects.values_list('pk', flat=True)))
+        self.assertEqual(len(ids), 7)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VersionedCacheTest(APITestCase):
+    """Test the tag-versioned cache and the cached book detail"""
+    
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(name='Cached Author')
+        self.book = Book.objects.create(title='Cached Book')
+        self.book.authors.add(self.author)
+        self.url = reverse('books:book_detail', kwargs={'slug': self.book.slug})
+    
+    def test_invalidate_tag(self):
+        """Test a value is computed once until one of its tags is invalidated"""
+        compute = mock.Mock(side_effect=[1, 2])
+        self.assertEqual(get_or_compute('test', 'key', compute, ['thing:1', 'thing:2']), 1)
+        self.assertEqual(get_or_compute('test', 'key', compute, ['thing:1', 'thing:2']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate('thing:2')
+        self.assertEqual(get_or_compute('test', 'key', compute, ['thing:1', 'thing:2']), 2)
+        self.assertEqual(compute.call_count, 2)
+    
+    def test_stampede_protection(self):
+        """Test expired entries are served stale while locked, invalidated ones are not"""
+        compute = mock.Mock(side_effect=[1, 2])
+        get_or_compute('test', 'key', compute, ['thing:1'], timeout=0)  # Expires at once
+        cache.add('cached:test:key:lock', 1)  # Another request is recomputing
+        self.assertEqual(get_or_compute('test', 'key', compute, ['thing:1'], timeout=0), 1)
+        self.assertEqual(compute.call_count, 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate('thing:1')
+        with mock.patch('bookreview.caching.LOCK_WAIT', 0.1):
+            self.assertEqual(get_or_compute('test', 'key', compute, ['thing:1']), 2)
+    
+    def test_cache_down_computes_without_waiting(self):
+        """Test a failed lock (cache.add -> None, IGNORE_EXCEPTIONS) computes at once"""
+        compute = mock.Mock(return_value=1)
+        with mock.patch('bookreview.caching.cache.get', return_value=None), \
+                mock.patch('bookreview.caching.cache.get_many', return_value={}), \
+                mock.patch('bookreview.caching.cache.add', return_value=None), \
+                mock.patch('bookreview.caching.time.sleep') as sleep:
+            self.assertEqual(get_or_compute('test', 'key', compute, ['thing:1']), 1)
+        sleep.assert_not_called()
+        compute.assert_called_once()
+    
+    def test_book_detail_invalidation(self):
+        """Test the cached book detail follows reviews, the book and its authors"""
+        from reviews.models import Review
+        self.assertEqual(self.client.get(self.url).data['review_count'], 0)
+        with self.assertNumQueries(1):  # slug -> id only
+            self.client.get(self.url)
+        
+        writer = User.objects.create_user(username='cachewriter', email='cw@example.com', password='TestPass123!')
+        with mock.patch('reviews.signals.enqueue_new_review_notifications'), \
+                mock.patch('reviews.signals.enqueue_feed_fan_out'), \
+                self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(book=self.book, user=writer, title='Fresh', body_md='Body ' * 30,
+                                  rating=4, status='public')
+        data = self.client.get(self.url).data
+        self.assertEqual((data['review_count'], data['rating_count']), (1, 1))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.name = 'Renamed Author'
+            self.author.save()
+        self.assertEqual(self.client.get(self.url).data['authors'][0]['name'], 'Renamed Author')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.is_active = False
+            self.book.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
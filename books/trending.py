@@ -0,0 +1,104 @@
+"""
+Trending books engine.
+
+Every activity (view, shelf add, public review) is worth its configured
+weight, halved every TRENDING_HALF_LIFE_DAYS. `refresh_trending_scores`
+recomputes the scores from daily buckets and stores them in
+BookTrendingScore; the trending endpoint only reads the top ids.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import BookDailyView, BookTrendingScore
+
+TRENDING_CACHE_KEY = 'trending_books'
+
+
+def decay(age_days):
+    return 0.5 ** (age_days / settings.TRENDING_HALF_LIFE_DAYS)
+
+
+def _daily_activity(today):
+    """Yield (kind, book_id, day, count) over the trending horizon"""
+    from reviews.models import Review
+    from shelves.models import ShelfItem
+
+    start = today - timedelta(days=settings.TRENDING_HORIZON_DAYS)
+    tz = timezone.get_current_timezone()
+
+    views = BookDailyView.objects.filter(
+        date__gte=start, book__is_active=True
+    ).values_list('book_id', 'date', 'view_count')
+    for book_id, day, count in views.iterator():
+        yield 'view', book_id, day, count
+
+    shelves = ShelfItem.objects.filter(
+        added_at__date__gte=start, book__is_active=True
+    ).annotate(day=TruncDate('added_at', tzinfo=tz)).order_by().values('book_id', 'day').annotate(
+        count=Count('shelf__user', distinct=True)
+    )
+    for row in shelves.iterator():
+        yield 'shelf', row['book_id'], row['day'], row['count']
+
+    reviews = Review.objects.filter(
+        created_at__date__gte=start, status='public', is_active=True, book__is_active=True
+    ).annotate(day=TruncDate('created_at', tzinfo=tz)).order_by().values('book_id', 'day').annotate(
+        count=Count('id')
+    )
+    for row in reviews.iterator():
+        yield 'review', row['book_id'], row['day'], row['count']
+
+
+def compute_trending_scores(today=None):
+    """Time-decayed score per book id"""
+    today = today or timezone.localdate()
+    weights = settings.TRENDING_WEIGHTS
+    scores = defaultdict(float)
+    for kind, book_id, day, count in _daily_activity(today):
+        scores[book_id] += weights[kind] * count * decay((today - day).days)
+    return scores
+
+
+def refresh_trending_scores():
+    """Recompute and store all trending scores, then publish the top list"""
+    scores = compute_trending_scores()
+    started = timezone.now()
+
+    with transaction.atomic():
+        BookTrendingScore.objects.bulk_create(
+            [BookTrendingScore(book_id=book_id, score=score) for book_id, score in scores.items()],
+            update_conflicts=True,
+            unique_fields=['book'],
+            update_fields=['score', 'updated_at'],
+            batch_size=1000,
+        )
+        # Books that dropped out of the horizon were not touched by this run
+        BookTrendingScore.objects.filter(updated_at__lt=started).delete()
+
+    top_ids = _top_ids_from_db()
+    cache.set(TRENDING_CACHE_KEY, top_ids, settings.TRENDING_CACHE_TIMEOUT)
+    return len(scores)
+
+
+def _top_ids_from_db():
+    return list(
+        BookTrendingScore.objects.filter(score__gt=0)
+        .order_by('-score', 'book_id')
+        .values_list('book_id', flat=True)[:settings.TRENDING_SIZE]
+    )
+
+
+def get_trending_book_ids():
+    """Top trending book ids, best first"""
+    book_ids = cache.get(TRENDING_CACHE_KEY)
+    if book_ids is None:
+        book_ids = _top_ids_from_db()
+        cache.set(TRENDING_CACHE_KEY, book_ids, settings.TRENDING_CACHE_TIMEOUT)
+    return book_ids
@@ -0,0 +1,109 @@
+"""
+Buffered book view counting.
+
+A detail hit only touches Redis: a dedup key per (book, visitor) and a
+HINCRBY on a pending hash keyed by "<book_id>:<date>". `flush_book_views`
+(run by Celery beat) moves the pending counts into BookDailyView in bulk.
+Without Redis the view is written straight to BookDailyView instead.
+"""
+import logging
+from collections import defaultdict
+from datetime import date as date_cls
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from redis.exceptions import RedisError, ResponseError
+
+from bookreview.redis_utils import get_redis, redis_key
+from .models import Book, BookDailyView
+
+logger = logging.getLogger('bookreview')
+
+PENDING_KEY = 'bookviews:pending'
+FLUSHING_KEY = 'bookviews:flushing'
+
+
+def _visitor(ip, user_id):
+    return f'u{user_id}' if user_id else f'ip{ip}'
+
+
+def record_book_view(book_id, ip=None, user_id=None):
+    """
+    Count one view of `book_id`, ignoring repeats from the same visitor
+    within BOOK_VIEW_DEDUP_SECONDS. Returns True if the view was counted.
+    """
+    dedup_key = f'bookviews:seen:{book_id}:{_visitor(ip, user_id)}'
+    if cache.add(dedup_key, 1, settings.BOOK_VIEW_DEDUP_SECONDS) is False:
+        return False
+
+    today = timezone.localdate()
+    redis = get_redis()
+    if redis is not None:
+        try:
+            redis.hincrby(redis_key(PENDING_KEY), f'{book_id}:{today.isoformat()}', 1)
+            return True
+        except RedisError as exc:
+            logger.warning('Buffering book view failed, writing to DB: %s', exc)
+
+    apply_view_counts({(book_id, today): 1})
+    return True
+
+
+def apply_view_counts(counts):
+    """Add {(book_id, date): views} to BookDailyView, one batch per date"""
+    by_date = defaultdict(dict)
+    for (book_id, day), views in counts.items():
+        by_date[day][book_id] = by_date[day].get(book_id, 0) + views
+
+    written = 0
+    for day, views in by_date.items():
+        book_ids = set(Book.objects.filter(pk__in=views.keys()).values_list('pk', flat=True))
+        if not book_ids:
+            continue
+        with transaction.atomic():
+            BookDailyView.objects.bulk_create(
+                [BookDailyView(book_id=book_id, date=day) for book_id in book_ids],
+                ignore_conflicts=True,
+            )
+            if len(book_ids) == 1:
+                book_id = next(iter(book_ids))
+                BookDailyView.objects.filter(book_id=book_id, date=day).update(
+                    view_count=F('view_count') + views[book_id]
+                )
+            else:
+                rows = list(BookDailyView.objects.select_for_update().filter(
+                    date=day, book_id__in=book_ids
+                ))
+                for row in rows:
+                    row.view_count += views[row.book_id]
+                BookDailyView.objects.bulk_update(rows, ['view_count'], batch_size=1000)
+        written += len(book_ids)
+    return written
+
+
+def flush_book_views():
+    """Move buffered view counts from Redis to BookDailyView"""
+    redis = get_redis()
+    if redis is None:
+        return 0
+
+    pending, flushing = redis_key(PENDING_KEY), redis_key(FLUSHING_KEY)
+    # A leftover flushing hash means the previous flush died half way: retry it first
+    if not redis.exists(flushing):
+        try:
+            redis.rename(pending, flushing)
+        except ResponseError:
+            # Nothing buffered
+            return 0
+
+    counts = {}
+    for field, value in redis.hgetall(flushing).items():
+        book_id, day = field.decode().split(':', 1)
+        counts[(int(book_id), date_cls.fromisoformat(day))] = int(value)
+
+    written = apply_view_counts(counts)
+    redis.delete(flushing)
+    return written
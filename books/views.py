@@ -2,28 +2,27 @@ from rest_framework import generics, filters, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.core.cache import cache
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_headers
 from rest_framework.pagination import PageNumberPagination
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models.functions import Coalesce
-from django.db.models import Count, Q, F, FloatField, ExpressionWrapper
 from django.core.paginator import Paginator  # NEW
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from reviews.models import Review
+from bookreview.caching import CachedListMixin, get_or_compute
+from bookreview.pagination import KeysetDefaultPagination
+from bookreview.public import PublicPayloadMixin
 
-from .models import Author, Genre, Publisher, Tag, Book, BookView
+from .models import Author, Genre, Publisher, Tag, Book
+from .view_tracking import record_book_view
+from .trending import get_trending_book_ids
 from .serializers import (
     AuthorSerializer, GenreSerializer, PublisherSerializer, TagSerializer,
     BookListSerializer, BookDetailSerializer, 
 )
 
 
-class BookListView(generics.ListAPIView):
+class BookListView(PublicPayloadMixin, generics.ListAPIView):
     """Book List with Filters"""
     queryset = Book.objects.filter(is_active=True).select_related('publisher').prefetch_related(
         'authors', 'genres', 'tags'
@@ -35,6 +34,7 @@ class BookListView(generics.ListAPIView):
     search_fields = ['title', 'description', 'authors__name', 'tags__name']
     ordering_fields = ['created_at', 'avg_rating', 'rating_count', 'review_count', 'title']
     ordering = ['-created_at']
+    pagination_class = KeysetDefaultPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -52,8 +52,18 @@ class BookListView(generics.ListAPIView):
         return queryset
 
 
-class BookDetailView(generics.RetrieveAPIView):
-    """Book Detail - Cached for 60 seconds"""
+def book_detail_tags(data):
+    """Cache tags of a serialized book: the book and every related row it embeds"""
+    tags = [f'book:{data["id"]}']
+    if data['publisher']:
+        tags.append(f'publisher:{data["publisher"]["id"]}')
+    for field, name in (('authors', 'author'), ('genres', 'genre'), ('tags', 'tag')):
+        tags.extend(f'{name}:{row["id"]}' for row in data[field])
+    return tags
+
+
+class BookDetailView(PublicPayloadMixin, generics.RetrieveAPIView):
+    """Book Detail - Payload cached until the book or an embedded row changes (bookreview.caching)"""
     queryset = Book.objects.filter(is_active=True).select_related('publisher').prefetch_related(
         'authors', 'genres', 'tags', 'editions'
     )
@@ -61,10 +71,6 @@ class BookDetailView(generics.RetrieveAPIView):
     lookup_field = 'slug'
     permission_classes = [permissions.AllowAny]
     
-    @method_decorator(cache_page(60))  # Cache for 60 seconds
-    def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
-    
     #Lay địa chỉ IP của client
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -75,79 +81,41 @@ class BookDetailView(generics.RetrieveAPIView):
         return ip
     
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        ip = self.get_client_ip(request)
-        user = request.user if request.user.is_authenticated else None
-        
-        BookView.objects.create(
-            book=instance,
-            ip_address=ip,
-            user=user
+        # slug -> id bằng 1 query trên index: entry theo id nên slug đổi/tái sử dụng không trả nhầm sách
+        book_id = self.get_queryset().filter(slug=self.kwargs['slug']).values_list('pk', flat=True).first()
+        if book_id is None:
+            raise Http404
+        data = get_or_compute(
+            'book_detail', book_id,
+            lambda: self.get_serializer(self.get_object()).data,
+            book_detail_tags, timeout=60 * 60,
         )
-        return super().retrieve(request, *args, **kwargs)
-    
-    def get_object(self):
-        slug = self.kwargs.get('slug')
-        cache_key = f'book_detail:{slug}'
-        book = cache.get(cache_key)
-        
-        if book is None:
-            book = super().get_object()
-            cache.set(cache_key, book, 60)  # Cache for 60 seconds
-        
-        return book
-    
+        # View được buffer trong Redis, không ghi DB trên mỗi request
+        record_book_view(
+            data['id'],
+            ip=self.get_client_ip(request),
+            user_id=request.user.pk if request.user.is_authenticated else None,
+        )
+        return Response(data)
+
 
 class TrendingBookListView(generics.ListAPIView):
-    """Trending Books - Based on views, shelves, and reviews in the last 7 days"""
+    """Trending Books - Served from precomputed decayed scores (books.trending)"""
     serializer_class = BookListSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
+    filter_backends = []
 
     def get_queryset(self):
-        last_week = timezone.now() - timedelta(days=7)
-
-        queryset = Book.objects.filter(is_active=True).annotate(
-            recent_views=Count(
-                'book_views',
-                filter=Q(book_views__created_at__gte=last_week)
-            ),
-
-            recent_shelves=Coalesce(
-                Count(
-                    'shelf_items__shelf__user',
-                    filter=Q(
-                        shelf_items__added_at__gte=last_week,
-                        shelf_items__shelf__user__isnull=False
-                    ),
-                    distinct=True
-                ),
-                0
-            ),
-
-            recent_reviews=Count(
-                'reviews',
-                filter=Q(
-                    reviews__created_at__gte=last_week,
-                    reviews__status='public',
-                    reviews__is_active=True
-                )
-            )
-        ).annotate(
-            trending_score=ExpressionWrapper(
-                F('recent_views')     * 1.0   +
-                F('recent_shelves')   * 6.0   +
-                F('recent_reviews')   * 10.0,
-                output_field=FloatField()
-            )
-        ).filter(trending_score__gt=0)\
-         .order_by('-trending_score', '-avg_rating', '-created_at')[:10]
-
-        return queryset
+        book_ids = get_trending_book_ids()
+        books = Book.objects.filter(pk__in=book_ids, is_active=True)\
+            .prefetch_related('authors', 'genres')
+        position = {book_id: index for index, book_id in enumerate(book_ids)}
+        return sorted(books, key=lambda book: position[book.pk])
 
 
-class AuthorListView(generics.ListAPIView):
-    """Author List - Cached for 5 minutes"""
+class AuthorListView(CachedListMixin, generics.ListAPIView):
+    """Author List - Cached until an author changes (bookreview.caching)"""
     queryset = Author.objects.filter(is_active=True)
     serializer_class = AuthorSerializer
     permission_classes = [permissions.AllowAny]
@@ -155,10 +123,8 @@ class AuthorListView(generics.ListAPIView):
     search_fields = ['name', 'bio']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
-    
-    @method_decorator(cache_page(300))  # Cache for 5 minutes
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+    cache_namespace = 'author_list'
+    cache_tags = ['author:list']
 
 class BookRatingDistributionAPIView(APIView):
     """Trả về phân bố điểm 1–5 cho 1 cuốn sách"""
@@ -207,18 +173,16 @@ class AuthorDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
 
 
-class GenreListView(generics.ListAPIView):
-    """Genre List - Cached for 5 minutes"""
+class GenreListView(CachedListMixin, generics.ListAPIView):
+    """Genre List - Cached until a genre changes (bookreview.caching)"""
     queryset = Genre.objects.filter(is_active=True)
     serializer_class = GenreSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['name']
     ordering = ['name']
-    
-    @method_decorator(cache_page(300))  # Cache for 5 minutes
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+    cache_namespace = 'genre_list'
+    cache_tags = ['genre:list']
 
 
 class GenreDetailView(generics.RetrieveAPIView):
@@ -253,8 +217,8 @@ class GenreDetailView(generics.RetrieveAPIView):
             'books': books_data
         })
 
-class PublisherListView(generics.ListAPIView):
-    """Publisher List - Cached for 5 minutes"""
+class PublisherListView(CachedListMixin, generics.ListAPIView):
+    """Publisher List - Cached until a publisher changes (bookreview.caching)"""
     queryset = Publisher.objects.filter(is_active=True)
     serializer_class = PublisherSerializer
     permission_classes = [permissions.AllowAny]
@@ -262,10 +226,8 @@ class PublisherListView(generics.ListAPIView):
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
-    
-    @method_decorator(cache_page(300))  # Cache for 5 minutes
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+    cache_namespace = 'publisher_list'
+    cache_tags = ['publisher:list']
 
 
 class PublisherDetailView(generics.RetrieveAPIView):
@@ -276,8 +238,8 @@ class PublisherDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
 
 
-class TagListView(generics.ListAPIView):
-    """Tag List - Cached for 5 minutes"""
+class TagListView(CachedListMixin, generics.ListAPIView):
+    """Tag List - Cached until a tag changes (bookreview.caching)"""
     queryset = Tag.objects.filter(is_active=True)
     serializer_class = TagSerializer
     permission_classes = [permissions.AllowAny]
@@ -285,10 +247,8 @@ class TagListView(generics.ListAPIView):
     search_fields = ['name', 'description']
     ordering_fields = ['name']
     ordering = ['name']
-    
-    @method_decorator(cache_page(300))  # Cache for 5 minutes
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+    cache_namespace = 'tag_list'
+    cache_tags = ['tag:list']
 
 
 class TagDetailView(generics.RetrieveAPIView):
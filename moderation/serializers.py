@@ -1,11 +1,12 @@
 from rest_framework import serializers
 from .models import Report, ModeratorAction
-from users.serializers import UserSerializer
+from users.serializers import UserCardSerializer
+from bookreview import content_types
 
 
 class ReportSerializer(serializers.ModelSerializer):
-    reporter = UserSerializer(read_only=True)
-    moderator = UserSerializer(read_only=True)
+    reporter = UserCardSerializer(read_only=True)
+    moderator = UserCardSerializer(read_only=True)
     content_object = serializers.SerializerMethodField()
 
     class Meta:
@@ -19,17 +20,18 @@ class ReportSerializer(serializers.ModelSerializer):
     def get_content_object(self, obj):
         if obj.content_object:
             # Serialize based on content type
-            if obj.content_type.model == 'review':
+            model_name = content_types.name_of(obj.content_type_id)
+            if model_name == 'review':
                 from reviews.serializers import ReviewListSerializer
                 return ReviewListSerializer(obj.content_object, context=self.context).data
-            elif obj.content_type.model == 'comment':
+            elif model_name == 'comment':
                 from reviews.serializers import CommentSerializer
                 return CommentSerializer(obj.content_object, context=self.context).data
         return None
 
 
 class ModeratorActionSerializer(serializers.ModelSerializer):
-    moderator = UserSerializer(read_only=True)
+    moderator = UserCardSerializer(read_only=True)
     content_object = serializers.SerializerMethodField()
 
     class Meta:
@@ -41,10 +43,11 @@ class ModeratorActionSerializer(serializers.ModelSerializer):
     def get_content_object(self, obj):
         if obj.content_object:
             # Serialize based on content type
-            if obj.content_type.model == 'review':
+            model_name = content_types.name_of(obj.content_type_id)
+            if model_name == 'review':
                 from reviews.serializers import ReviewListSerializer
                 return ReviewListSerializer(obj.content_object, context=self.context).data
-            elif obj.content_type.model == 'comment':
+            elif model_name == 'comment':
                 from reviews.serializers import CommentSerializer
                 return CommentSerializer(obj.content_object, context=self.context).data
         return None
@@ -21,10 +21,14 @@ class ReportListView(generics.ListCreateAPIView):
         # Moderators can see all reports
         if user.is_staff or user.groups.filter(name='Moderators').exists():
             status_filter = self.request.query_params.get('status', 'pending')
-            return Report.objects.filter(status=status_filter).order_by('-created_at')
+            return Report.objects.filter(status=status_filter).select_related(
+                'reporter__profile', 'moderator__profile'
+            ).order_by('-created_at')
         
         # Regular users can only see their own reports
-        return Report.objects.filter(reporter=user).order_by('-created_at')
+        return Report.objects.filter(reporter=user).select_related(
+            'reporter__profile', 'moderator__profile'
+        ).order_by('-created_at')
 
     def perform_create(self, serializer):
         serializer.save(reporter=self.request.user)
@@ -124,6 +128,6 @@ def resolve_report(request, pk):
 
 class ModeratorActionListView(generics.ListAPIView):
     """Moderator Action List - Moderator only"""
-    queryset = ModeratorAction.objects.all().order_by('-created_at')
+    queryset = ModeratorAction.objects.select_related('moderator__profile').order_by('-created_at')
     serializer_class = ModeratorActionSerializer
     permission_classes = [IsModerator]
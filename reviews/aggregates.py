@@ -0,0 +1,188 @@
+"""
+Book rating aggregates (avg_rating, rating_count, review_count).
+
+Review signals apply the difference between the previous and the new state
+of a review as a single F() UPDATE on the book, so the cost of an edit no
+longer grows with the number of reviews. `reconcile_book_aggregates` rebuilds
+the same numbers from scratch to detect and repair drift (bulk updates that
+bypass signals, concurrent edits, ...).
+"""
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Case, When, Value, F, Count, Sum, DecimalField, ExpressionWrapper
+from django.db.models.functions import Greatest
+
+from bookreview.caching import invalidate
+from books.models import Book
+
+ZERO = Decimal('0')
+AVG_QUANTUM = Decimal('0.01')
+
+
+def review_contribution(state):
+    """
+    What a review in `state` adds to its book:
+    (book_id, review_count, rating_count, rating_sum)
+    """
+    if state is None:
+        return None, 0, 0, ZERO
+    book_id, status, is_active, rating = state
+    if status != 'public' or not is_active:
+        return book_id, 0, 0, ZERO
+    if rating is None:
+        return book_id, 1, 0, ZERO
+    return book_id, 1, 1, Decimal(str(rating))
+
+
+def average(rating_sum, rating_count):
+    if not rating_count:
+        return Decimal('0.00')
+    return (Decimal(rating_sum) / rating_count).quantize(AVG_QUANTUM, rounding=ROUND_HALF_UP)
+
+
+def apply_book_delta(book_id, reviews=0, ratings=0, rating_sum=ZERO):
+    """Shift the aggregates of one book with a single UPDATE statement"""
+    if not book_id or (not reviews and not ratings and not rating_sum):
+        return 0
+
+    new_count = F('rating_count') + ratings
+    new_sum = F('rating_sum') + rating_sum
+    return Book.objects.filter(pk=book_id).update(
+        review_count=Greatest(F('review_count') + reviews, 0),
+        rating_count=Greatest(new_count, 0),
+        rating_sum=new_sum,
+        # SET expressions all read the pre-update row, so recompute from the deltas
+        avg_rating=Case(
+            When(rating_count__gt=-ratings, then=ExpressionWrapper(
+                new_sum / new_count,
+                output_field=DecimalField(max_digits=3, decimal_places=2),
+            )),
+            default=Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+    )
+
+
+def apply_review_transition(previous, current):
+    """
+    Move Book aggregates from the `previous` to the `current` review state.
+    Either side may be None (review created / deleted).
+    """
+    old_book, old_reviews, old_ratings, old_sum = review_contribution(previous)
+    new_book, new_reviews, new_ratings, new_sum = review_contribution(current)
+
+    if old_book == new_book:
+        apply_book_delta(new_book, new_reviews - old_reviews,
+                         new_ratings - old_ratings, new_sum - old_sum)
+        return
+
+    # Review moved to another book
+    apply_book_delta(old_book, -old_reviews, -old_ratings, -old_sum)
+    apply_book_delta(new_book, new_reviews, new_ratings, new_sum)
+
+
+def expected_book_aggregates(book_ids=None):
+    """Aggregates recomputed from the reviews table, keyed by book id"""
+    from .models import Review
+
+    reviews = Review.objects.filter(status='public', is_active=True)
+    if book_ids is not None:
+        reviews = reviews.filter(book_id__in=book_ids)
+
+    rows = reviews.order_by().values('book_id').annotate(
+        reviews=Count('id'),
+        ratings=Count('rating'),
+        total=Sum('rating'),
+    )
+    return {
+        row['book_id']: (row['reviews'], row['ratings'], row['total'] or ZERO)
+        for row in rows
+    }
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def changed_book_ids(since):
+    """Books having a review created or edited at/after `since`"""
+    from .models import Review
+
+    return Review.objects.filter(updated_at__gte=since).order_by().values_list(
+        'book_id', flat=True
+    ).distinct()
+
+
+def _reconcile_batches(book_ids, since, fix, batch_size):
+    """Yield (books scanned, drifted books) for each batch of `batch_size` books"""
+    books = Book.objects.only('id', 'review_count', 'rating_count', 'rating_sum', 'avg_rating')
+    if book_ids is not None:
+        books = books.filter(pk__in=book_ids)
+    if since is not None:
+        books = books.filter(pk__in=changed_book_ids(since))
+
+    for chunk in _chunked(books.order_by('pk').iterator(chunk_size=batch_size), batch_size):
+        expected = expected_book_aggregates([book.pk for book in chunk])
+        drifted = []
+        for book in chunk:
+            reviews, ratings, total = expected.get(book.pk, (0, 0, ZERO))
+            stored = (book.review_count, book.rating_count, book.rating_sum, book.avg_rating)
+            expected_values = (reviews, ratings, total, average(total, ratings))
+            if stored == expected_values:
+                continue
+            book.review_count, book.rating_count, book.rating_sum, book.avg_rating = expected_values
+            drifted.append((book, stored))
+
+        if fix and drifted:
+            Book.objects.bulk_update(
+                [book for book, _ in drifted],
+                ['review_count', 'rating_count', 'rating_sum', 'avg_rating'],
+                batch_size=batch_size,
+            )
+            invalidate(*[f'book:{book.pk}' for book, _ in drifted])
+        yield len(chunk), drifted
+
+
+def reconcile_book_aggregates(book_ids=None, since=None, fix=False, batch_size=500):
+    """
+    Compare stored aggregates with the reviews table, `batch_size` books at a
+    time (one grouped aggregate + one bulk UPDATE per batch).
+    Returns (book, stored_values) for every drifted book, with `book` already
+    carrying the expected values; they are written back when `fix` is set.
+
+    `since` limits the scan to books whose reviews changed after that
+    timestamp. Deleted reviews leave no trace there, so a full pass is still
+    needed from time to time.
+    """
+    drifted = []
+    for _, batch in _reconcile_batches(book_ids, since, fix, batch_size):
+        drifted.extend(batch)
+    return drifted
+
+
+def recompute_book_aggregates(since=None, batch_size=1000):
+    """
+    Set-based recompute used by the periodic task.
+    Returns metrics: books scanned/updated, elapsed seconds and rows per second.
+    """
+    started = time.monotonic()
+    scanned = updated = 0
+    for count, drifted in _reconcile_batches(None, since, True, batch_size):
+        scanned += count
+        updated += len(drifted)
+
+    elapsed = time.monotonic() - started
+    return {
+        'scanned': scanned,
+        'updated': updated,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(scanned / elapsed, 1) if elapsed else float(scanned),
+    }
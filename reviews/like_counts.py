@@ -0,0 +1,212 @@
+"""
+Write-behind like_count for Review and Comment.
+
+A like/unlike writes its Like row and, after commit, a HINCRBY on a pending
+hash keyed by "<model>:<id>" instead of an UPDATE on the liked row, so a
+popular review does not serialize every like on its row lock.
+`flush_like_counts` (run by Celery beat) folds the pending deltas into
+like_count with one UPDATE per batch of rows. Readers add the deltas still
+in Redis (`pending_like_deltas`) so counts look real time. Without Redis
+the delta is applied straight to the row with F().
+
+Flushes hold a cache lock (FLUSH_LOCK), so two never apply the same
+deltas. A worker dying between the DB commit and dropping the flushing
+hash would still apply them twice on the next run: every flushed object
+is remembered in a set and `reconcile_like_counts` (Celery beat) recounts
+them from Like rows.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from redis.exceptions import RedisError, ResponseError
+
+from bookreview import content_types
+from bookreview.caching import invalidate
+from bookreview.redis_utils import get_redis, redis_key
+from .models import Review, Comment, Like
+
+logger = logging.getLogger('bookreview')
+
+PENDING_KEY = 'likecounts:pending'
+FLUSHING_KEY = 'likecounts:flushing'
+TOUCHED_KEY = 'likecounts:touched'
+FLUSH_LOCK = 'likecounts:flush-lock'
+FLUSH_LOCK_TIMEOUT = 5 * 60
+FLUSH_BATCH_SIZE = 500
+
+MODELS = {'review': Review, 'comment': Comment}
+
+
+def _field(model, object_id):
+    return f'{model._meta.model_name}:{object_id}'
+
+
+def shift_like_count(model, object_id, delta):
+    """like_count += delta for a Review/Comment, buffered in Redis once the transaction commits"""
+    model = model._meta.concrete_model
+    if model._meta.model_name not in MODELS:
+        return
+    transaction.on_commit(lambda: _buffer(model, object_id, delta))
+
+
+def _buffer(model, object_id, delta):
+    redis = get_redis()
+    if redis is not None:
+        try:
+            redis.hincrby(redis_key(PENDING_KEY), _field(model, object_id), delta)
+            return
+        except RedisError as exc:
+            logger.warning('Buffering like_count failed, writing to DB: %s', exc)
+    apply_like_deltas(model, {object_id: delta})
+
+
+def apply_like_deltas(model, deltas):
+    """Add {object_id: delta} to like_count (never below 0), one UPDATE per batch"""
+    deltas = {object_id: delta for object_id, delta in deltas.items() if delta}
+    ids = sorted(deltas)
+    updated = 0
+    for start in range(0, len(ids), FLUSH_BATCH_SIZE):
+        batch = ids[start:start + FLUSH_BATCH_SIZE]
+        delta = Case(
+            *[When(pk=object_id, then=Value(deltas[object_id])) for object_id in batch],
+            default=Value(0), output_field=IntegerField(),
+        )
+        updated += model.objects.filter(pk__in=batch).update(like_count=Greatest(F('like_count') + delta, 0))
+    # Cached review payloads hold the flushed like_count, readers add what is still pending
+    if model is Review:
+        invalidate(*[f'review:{object_id}' for object_id in ids])
+    return updated
+
+
+def pending_like_deltas(model, object_ids):
+    """{object_id: delta} not yet flushed for `object_ids` of `model` (ids without one are left out)"""
+    model = model._meta.concrete_model
+    object_ids = list(object_ids)
+    redis = get_redis()
+    if redis is None or not object_ids or model._meta.model_name not in MODELS:
+        return {}
+    fields = [_field(model, object_id) for object_id in object_ids]
+    try:
+        pipe = redis.pipeline(transaction=False)
+        pipe.hmget(redis_key(PENDING_KEY), fields)
+        # Deltas of a flush in progress are not in like_count yet either
+        pipe.hmget(redis_key(FLUSHING_KEY), fields)
+        pending, flushing = pipe.execute()
+    except RedisError as exc:
+        logger.warning('Reading pending like counts failed: %s', exc)
+        return {}
+    deltas = {}
+    for object_id, *values in zip(object_ids, pending, flushing):
+        delta = sum(int(value) for value in values if value is not None)
+        if delta:
+            deltas[object_id] = delta
+    return deltas
+
+
+def merge_pending_like_counts(objects):
+    """Add pending deltas to like_count of already loaded Review/Comment instances"""
+    objects = list(objects)
+    if not objects:
+        return objects
+    deltas = pending_like_deltas(type(objects[0]), [obj.pk for obj in objects])
+    for obj in objects:
+        obj.like_count = max(obj.like_count + deltas.get(obj.pk, 0), 0)
+    return objects
+
+
+def _parse(fields):
+    """{model: [object_id]} of "<model>:<id>" fields"""
+    ids = {model: [] for model in MODELS.values()}
+    for field in fields:
+        model_name, object_id = field.decode().split(':', 1)
+        if model_name in MODELS:
+            ids[MODELS[model_name]].append(int(object_id))
+    return ids
+
+
+def _flush(redis):
+    pending, flushing = redis_key(PENDING_KEY), redis_key(FLUSHING_KEY)
+    # A leftover flushing hash means the previous flush died half way: retry it first
+    if not redis.exists(flushing):
+        try:
+            redis.rename(pending, flushing)
+        except ResponseError:
+            # Nothing buffered
+            return 0
+
+    values = redis.hgetall(flushing)
+    deltas = {model: {} for model in MODELS.values()}
+    for field, value in values.items():
+        model_name, object_id = field.decode().split(':', 1)
+        if model_name in MODELS:
+            deltas[MODELS[model_name]][int(object_id)] = int(value)
+
+    updated = 0
+    with transaction.atomic():
+        for model, model_deltas in deltas.items():
+            updated += apply_like_deltas(model, model_deltas)
+    if values:
+        redis.sadd(redis_key(TOUCHED_KEY), *values)
+    redis.delete(flushing)
+    return updated
+
+
+def flush_like_counts():
+    """Move buffered like_count deltas from Redis to Review/Comment"""
+    redis = get_redis()
+    if redis is None:
+        return 0
+    # One flush at a time: a second one would apply the flushing hash again
+    if not cache.add(FLUSH_LOCK, 1, FLUSH_LOCK_TIMEOUT):
+        return 0
+    try:
+        return _flush(redis)
+    finally:
+        cache.delete(FLUSH_LOCK)
+
+
+def recount_like_counts(model, object_ids, pending=None):
+    """like_count = Like rows - deltas still pending, for `object_ids` of `model`"""
+    pending = pending or {}
+    counts = dict(Like.objects.filter(
+        content_type_id=content_types.content_type_id(model), object_id__in=object_ids
+    ).values('object_id').annotate(total=Count('id')).values_list('object_id', 'total'))
+    ids = sorted(set(object_ids))
+    updated = 0
+    for start in range(0, len(ids), FLUSH_BATCH_SIZE):
+        batch = ids[start:start + FLUSH_BATCH_SIZE]
+        count = Case(
+            *[When(pk=object_id, then=Value(max(counts.get(object_id, 0) - pending.get(object_id, 0), 0)))
+              for object_id in batch],
+            default=Value(0), output_field=IntegerField(),
+        )
+        updated += model.objects.filter(pk__in=batch).exclude(like_count=count).update(like_count=count)
+    if model is Review:
+        invalidate(*[f'review:{object_id}' for object_id in ids])
+    return updated
+
+
+def reconcile_like_counts():
+    """Recount like_count of the objects flushed since the last run; returns rows fixed"""
+    redis = get_redis()
+    if redis is None:
+        return 0
+    # Under the flush lock: no delta moves between reading it and counting Like rows
+    if not cache.add(FLUSH_LOCK, 1, FLUSH_LOCK_TIMEOUT):
+        return 0
+    try:
+        _flush(redis)
+        fixed = 0
+        while True:
+            fields = redis.spop(redis_key(TOUCHED_KEY), FLUSH_BATCH_SIZE)
+            if not fields:
+                return fixed
+            for model, object_ids in _parse(fields).items():
+                if object_ids:
+                    pending = pending_like_deltas(model, object_ids)
+                    fixed += recount_like_counts(model, object_ids, pending)
+    finally:
+        cache.delete(FLUSH_LOCK)
@@ -0,0 +1,66 @@
+"""
+Batch "did the current user like this?" lookups for serializers.
+
+A LikeResolver lives in the serializer context for the whole response.
+List serializers prime it with every id on the page (one query per model),
+so `is_liked` on each row is a set lookup instead of a query. Priming also
+reads the page's like_count deltas still buffered in Redis
+(reviews.like_counts), one HMGET per model, for `like_count`.
+"""
+from collections import defaultdict
+
+from bookreview.content_types import content_type_id
+from .like_counts import pending_like_deltas
+from .models import Like
+
+
+class LikeResolver:
+    def __init__(self, user):
+        self.user = user if user is not None and user.is_authenticated else None
+        self.liked = defaultdict(set)
+        self.loaded = defaultdict(set)
+        self.pending = defaultdict(dict)
+
+    def prime(self, model, object_ids):
+        """Load which of `object_ids` (of `model`) the user liked and their pending like deltas, skipping ids already known"""
+        model = model._meta.concrete_model
+        ids = set(object_ids) - self.loaded[model]
+        if not ids:
+            return
+        self.loaded[model] |= ids
+        self.pending[model].update(pending_like_deltas(model, ids))
+        if self.user is None:
+            return
+        self.liked[model] |= set(Like.objects.filter(
+            user=self.user,
+            content_type_id=content_type_id(model),
+            object_id__in=ids,
+        ).values_list('object_id', flat=True))
+
+    def is_liked(self, obj):
+        return self.is_liked_pk(obj._meta.concrete_model, obj.pk)
+
+    def is_liked_pk(self, model, pk):
+        if self.user is None:
+            return False
+        model = model._meta.concrete_model
+        self.prime(model, [pk])
+        return pk in self.liked[model]
+
+    def like_count(self, obj):
+        """like_count of `obj` plus its deltas not flushed yet"""
+        return self.like_count_pk(obj._meta.concrete_model, obj.pk, obj.like_count)
+
+    def like_count_pk(self, model, pk, like_count):
+        """`like_count` as stored (e.g. in a cached payload) plus the deltas not flushed yet"""
+        model = model._meta.concrete_model
+        self.prime(model, [pk])
+        return max(like_count + self.pending[model].get(pk, 0), 0)
+
+
+def like_resolver(context):
+    """The LikeResolver of a serializer context, created on first use"""
+    if 'like_resolver' not in context:
+        request = context.get('request')
+        context['like_resolver'] = LikeResolver(getattr(request, 'user', None))
+    return context['like_resolver']
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from reviews.aggregates import reconcile_book_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Find (and optionally fix) books whose rating aggregates drifted from their reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Write the recomputed aggregates back to the drifted books')
+        parser.add_argument('--book', type=int, action='append', dest='book_ids',
+                            help='Only check this book id (can be repeated)')
+        parser.add_argument('--since',
+                            help='Only check books whose reviews changed after this ISO datetime')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since value: {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        drifted = reconcile_book_aggregates(
+            book_ids=options['book_ids'],
+            since=since,
+            fix=options['fix'],
+            batch_size=options['batch_size'],
+        )
+
+        for book, stored in drifted:
+            self.stdout.write(
+                f'Book #{book.pk}: reviews {stored[0]} -> {book.review_count}, '
+                f'ratings {stored[1]} -> {book.rating_count}, '
+                f'sum {stored[2]} -> {book.rating_sum}, '
+                f'avg {stored[3]} -> {book.avg_rating}'
+            )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('No drift found'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drifted)} book(s)'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'{len(drifted)} book(s) drifted, run again with --fix to repair'
+            ))
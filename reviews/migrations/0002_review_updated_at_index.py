@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['updated_at'], name='reviews_rev_updated_3ebe01_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:25
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Func, OuterRef, Subquery, TextField
+
+
+def backfill_review_vectors(apps, schema_editor):
+    # Same document as search.engine.update_review_vectors at the time of this migration
+    Review = apps.get_model('reviews', 'Review')
+    Book = apps.get_model('books', 'Book')
+
+    def document(expression, weight):
+        unaccented = Func(expression, function='immutable_unaccent', output_field=TextField())
+        return SearchVector(unaccented, weight=weight, config='simple')
+
+    book_title = Subquery(Book.objects.filter(pk=OuterRef('book_id')).values('title'))
+    Review.objects.update(search_vector=(
+        document('title', 'A')
+        + document('body_md', 'B')
+        + document(book_title, 'C')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_review_updated_at_index'),
+        ('books', '0008_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_review_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='review_search_vector_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -37,10 +39,16 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     edited_at = models.DateTimeField(null=True, blank=True)
+
+    # Full-text search document (title, body, book title), kept by search.signals
+    search_vector = SearchVectorField(null=True, editable=False)
     
     # Generic relation for likes
     likes = GenericRelation('Like', related_query_name='review')
 
+    # Fields whose changes move Book.avg_rating / rating_count / review_count
+    AGGREGATE_FIELDS = ('book_id', 'status', 'is_active', 'rating')
+
     class Meta:
         verbose_name = _('review')
         verbose_name_plural = _('reviews')
@@ -50,11 +58,30 @@ class Review(models.Model):
             models.Index(fields=['book', 'status', '-created_at']),
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['-created_at']),
+            models.Index(fields=['updated_at']),
+            GinIndex(fields=['search_vector'], name='review_search_vector_idx'),
         ]
 
     def __str__(self):
         return f"{self.user.username}'s review of {self.book.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Snapshot the fields feeding Book aggregates so signals can apply deltas
+        if all(name in field_names for name in cls.AGGREGATE_FIELDS):
+            instance._aggregate_state = instance.aggregate_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None:
+            self._aggregate_state = self.aggregate_state()
+
+    def aggregate_state(self):
+        """Current (book_id, status, is_active, rating) as seen by Book aggregates"""
+        return tuple(getattr(self, name) for name in self.AGGREGATE_FIELDS)
+
     def save(self, *args, **kwargs):
         # Convert markdown to HTML and sanitize
         if self.body_md:
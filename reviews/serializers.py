@@ -1,9 +1,13 @@
 from rest_framework import serializers
 from django.conf import settings
+from django.db.models.manager import BaseManager
 from .models import Review, ReviewImage, Comment, Like
+from .likes import like_resolver
+from .threads import walk
+from bookreview.public import ViewerFieldsMixin
 from books.models import Book
 from books.serializers import BookListSerializer
-from users.serializers import UserSerializer
+from users.serializers import UserCardSerializer
 
 # 1. ReviewImageSerializer (Độc lập)
 class ReviewImageSerializer(serializers.ModelSerializer):
@@ -14,7 +18,7 @@ class ReviewImageSerializer(serializers.ModelSerializer):
 
 # 2. ReviewSerializer (CHÍNH - Dùng để ghi)
 class ReviewSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer(read_only=True)
     book_info = BookListSerializer(source='book', read_only=True)
     book = serializers.PrimaryKeyRelatedField(queryset=Book.objects.all(), write_only=True)
 
@@ -36,27 +40,47 @@ class ReviewSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
+# Danh sách review/comment: lấy is_liked của cả trang bằng 1 query
+class LikePrimingListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, BaseManager) else data)
+        like_resolver(self.context).prime(self.child.Meta.model, [item.pk for item in self.like_targets(items)])
+        return super().to_representation(items)
+
+    def like_targets(self, items):
+        return items
+
+# Comment đã load sẵn cây reply (reviews.threads): lấy is_liked của cả cây
+class CommentThreadListSerializer(LikePrimingListSerializer):
+    def like_targets(self, items):
+        return walk(items)
+
 # 3. ReviewListSerializer (Dùng để đọc)
-class ReviewListSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class ReviewListSerializer(ViewerFieldsMixin, serializers.ModelSerializer):
+    user = UserCardSerializer(read_only=True)
     book = BookListSerializer(read_only=True)
+    like_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     
     class Meta:
         model = Review
         fields = ['id', 'book', 'user', 'title', 'body_html', 'rating', 'like_count', 'comment_count', 'is_liked', 'created_at', 'updated_at', 'edited_at']
+        list_serializer_class = LikePrimingListSerializer
+
+    VIEWER_FIELDS = ('is_liked',)
+
+    def get_like_count(self, obj):
+        return like_resolver(self.context).like_count(obj)
 
     def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Like.objects.filter(user=request.user, content_type__model='review', object_id=obj.id).exists()
-        return False
+        return like_resolver(self.context).is_liked(obj)
 
 # 4. ReviewDetailSerializer (Dùng để đọc chi tiết)
-class ReviewDetailSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class ReviewDetailSerializer(ViewerFieldsMixin, serializers.ModelSerializer):
+    user = UserCardSerializer(read_only=True)
     book = BookListSerializer(read_only=True)
     images = ReviewImageSerializer(many=True, read_only=True)
+    like_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     user_can_edit = serializers.SerializerMethodField()
     
@@ -64,38 +88,54 @@ class ReviewDetailSerializer(serializers.ModelSerializer):
         model = Review
         fields = ['id', 'book', 'user', 'title', 'body_md', 'body_html', 'rating', 'status', 'like_count', 'comment_count', 'images', 'is_liked', 'user_can_edit', 'created_at', 'updated_at', 'edited_at']
 
+    # Khác nhau theo user: không nằm trong payload chung (bookreview.public)
+    VIEWER_FIELDS = ('is_liked', 'user_can_edit')
+
+    def get_like_count(self, obj):
+        return like_resolver(self.context).like_count(obj)
+
     def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Like.objects.filter(user=request.user, content_type__model='review', object_id=obj.id).exists()
-        return False
+        return like_resolver(self.context).is_liked(obj)
 
     def get_user_can_edit(self, obj):
         request = self.context.get('request')
         return request and request.user == obj.user
 
 # 5. CommentSerializer (Đặt ở đây, không import từ chính file này)
-class CommentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class CommentSerializer(ViewerFieldsMixin, serializers.ModelSerializer):
+    user = UserCardSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
+    reply_count = serializers.SerializerMethodField()
+    like_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     user_can_edit = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
-        fields = ['id', 'review', 'user', 'parent', 'body', 'status', 'like_count', 'replies', 'is_liked', 'user_can_edit', 'created_at', 'updated_at']
+        fields = ['id', 'review', 'user', 'parent', 'body', 'status', 'like_count', 'replies', 'reply_count', 'is_liked', 'user_can_edit', 'created_at', 'updated_at']
         read_only_fields = ['id', 'like_count', 'created_at', 'updated_at']
+        list_serializer_class = CommentThreadListSerializer
+
+    VIEWER_FIELDS = ('is_liked', 'user_can_edit')
 
     def get_replies(self, obj):
-        if obj.is_reply(): return []
-        replies = Comment.objects.filter(parent=obj, status='public', is_active=True)
+        # Cây reply đã load sẵn (CommentListView) -> không query thêm
+        replies = getattr(obj, 'thread_replies', None)
+        if replies is None:
+            if obj.is_reply(): return []
+            replies = Comment.objects.filter(parent=obj, status='public', is_active=True)
         return CommentSerializer(replies, many=True, context=self.context).data
 
+    def get_reply_count(self, obj):
+        if hasattr(obj, 'reply_count'):
+            return obj.reply_count
+        return obj.replies.filter(status='public', is_active=True).count()
+
+    def get_like_count(self, obj):
+        return like_resolver(self.context).like_count(obj)
+
     def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Like.objects.filter(user=request.user, content_type__model='comment', object_id=obj.id).exists()
-        return False
+        return like_resolver(self.context).is_liked(obj)
 
     def get_user_can_edit(self, obj):
         request = self.context.get('request')
@@ -103,7 +143,7 @@ class CommentSerializer(serializers.ModelSerializer):
 
 # 6. LikeSerializer
 class LikeSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer(read_only=True)
     class Meta:
         model = Like
         fields = ['id', 'user', 'created_at']
\ No newline at end of file
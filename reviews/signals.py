@@ -1,174 +1,133 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Avg
+from django.db import transaction
 from django.contrib.contenttypes.models import ContentType
 
+from bookreview import content_types
+from bookreview.caching import invalidate
 from .models import Review, Comment, Like
-from social.models import Notification, Follow
+from .aggregates import apply_review_transition
+from .like_counts import shift_like_count
+from social.coalesce import schedule_like_notification
+from social.models import Notification
 
 
 # =========================
 # 1. REVIEW: rating + new_review
 # =========================
 
+@receiver(pre_save, sender=Review)
+def capture_review_state(sender, instance: Review, **kwargs):
+    """Lấy trạng thái cũ của review nếu instance không được load từ DB"""
+    if instance.pk and not hasattr(instance, '_aggregate_state'):
+        instance._aggregate_state = Review.objects.filter(pk=instance.pk).values_list(
+            *Review.AGGREGATE_FIELDS
+        ).first()
+
+
 @receiver(post_save, sender=Review)
 def handle_review_save(sender, instance: Review, created, **kwargs):
     """
-    - Cập nhật avg_rating, rating_count, review_count cho Book
+    - Cập nhật avg_rating, rating_count, review_count cho Book theo delta
+      giữa trạng thái cũ và mới của review (1 câu UPDATE, không đếm lại)
     - Nếu là review mới (created) và public -> gửi thông báo new_review tới follower
+    - Khi review trở thành public + active (mới tạo, nháp được đăng, được
+      moderation hiện lại) -> fan-out vào timeline của follower
     """
-    book = instance.book
-
-    # Chỉ tính các review public & active
-    public_reviews = Review.objects.filter(
-        book=book,
-        status='public',
-        is_active=True
-    )
-
-    # Tổng số review public
-    book.review_count = public_reviews.count()
-
-    # Rating (chỉ tính review có rating)
-    rated_reviews = public_reviews.exclude(rating__isnull=True)
-    if rated_reviews.exists():
-        book.avg_rating = rated_reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-        book.rating_count = rated_reviews.count()
-    else:
-        book.avg_rating = 0
-        book.rating_count = 0
-
-    book.save(update_fields=['avg_rating', 'rating_count', 'review_count'])
+    previous = None if created else getattr(instance, '_aggregate_state', None)
+    current = instance.aggregate_state()
+    apply_review_transition(previous, current)
+    invalidate_review(instance, previous)
+    instance._aggregate_state = current
 
     # --- THÔNG BÁO NEW_REVIEW ---
     # Chỉ gửi khi:
     #   - là review mới tạo (created=True)
     #   - đang ở trạng thái public
     #   - review còn active
+    # Việc fan-out tới follower (thông báo + timeline) chạy trong Celery task,
+    # request chỉ enqueue job sau khi transaction commit (để worker đọc được review)
+    review_id = instance.pk
     if created and instance.status == 'public' and instance.is_active:
-        try:
-            # Những user đang follow người viết review
-            user_ct = ContentType.objects.get_for_model(instance.user.__class__)
-            follower_ids = Follow.objects.filter(
-                content_type=user_ct,
-                object_id=instance.user_id
-            ).values_list('follower_id', flat=True)
-
-            review_ct = ContentType.objects.get_for_model(Review)
-            noti_list = []
-
-            for follower_id in follower_ids:
-                # Không tự gửi thông báo cho chính mình
-                if follower_id == instance.user_id:
-                    continue
-
-                noti_list.append(
-                    Notification(
-                        user_id=follower_id,
-                        notification_type='new_review',
-                        content_type=review_ct,
-                        object_id=instance.id,
-                        payload={
-                            'message': f'{instance.user.username} đã viết review mới về "{instance.book.title}".'
-                        }
-                    )
-                )
+        transaction.on_commit(lambda: enqueue_new_review_notifications(review_id))
+    # Timeline: mỗi lần chuyển sang hiển thị (fan-out bỏ qua entry đã có)
+    if is_visible(current) and not (previous and is_visible(previous)):
+        transaction.on_commit(lambda: enqueue_feed_fan_out(review_id))
 
-            if noti_list:
-                Notification.objects.bulk_create(noti_list, ignore_conflicts=True)
-        except Exception as e:
-            # Để server không chết nếu lỗi notification
-            print(f'Lỗi tạo thông báo new_review: {e}')
 
+def is_visible(state):
+    """Review (book_id, status, is_active, rating) đang hiển thị công khai"""
+    _, status, is_active, _ = state
+    return status == 'public' and is_active
 
-@receiver(post_delete, sender=Review)
-def handle_review_delete(sender, instance: Review, **kwargs):
-    """Khi xóa review -> tính lại rating & review_count của Book"""
-    book = instance.book
-    public_reviews = Review.objects.filter(
-        book=book,
-        status='public',
-        is_active=True
-    )
 
-    book.review_count = public_reviews.count()
-    rated_reviews = public_reviews.exclude(rating__isnull=True)
-    if rated_reviews.exists():
-        book.avg_rating = rated_reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-        book.rating_count = rated_reviews.count()
-    else:
-        book.avg_rating = 0
-        book.rating_count = 0
+def enqueue_new_review_notifications(review_id):
+    from social.tasks import fan_out_new_review_notifications
+    try:
+        fan_out_new_review_notifications.delay(review_id)
+    except Exception as e:
+        # Để server không chết nếu broker lỗi
+        print(f'Lỗi enqueue thông báo new_review: {e}')
 
-    book.save(update_fields=['avg_rating', 'rating_count', 'review_count'])
+
+def enqueue_feed_fan_out(review_id):
+    from social.tasks import fan_out_review_to_feeds
+    try:
+        fan_out_review_to_feeds.delay(review_id)
+    except Exception as e:
+        print(f'Lỗi enqueue fan-out feed: {e}')
+
+
+def invalidate_review(review: Review, previous=None):
+    """Cache của review và sách (rating, review_count), cả sách cũ nếu review đổi sách"""
+    invalidate(f'review:{review.pk}', f'book:{review.book_id}', previous and f'book:{previous[0]}')
+
+
+@receiver(post_delete, sender=Review)
+def handle_review_delete(sender, instance: Review, **kwargs):
+    """Khi xóa review -> trừ phần đóng góp của review khỏi rating & review_count của Book"""
+    previous = getattr(instance, '_aggregate_state', None) or instance.aggregate_state()
+    apply_review_transition(previous, None)
+    invalidate_review(instance, previous)
 
 
 # =========================
 # 2. LIKE: review_like / comment_like
 # =========================
 
+def _shift_like_count(like: Like, delta):
+    """like_count += delta cho Review/Comment: ghi vào Redis, flush định kỳ (reviews.like_counts)"""
+    model = ContentType.objects.get_for_id(like.content_type_id).model_class()
+    if model in (Review, Comment):
+        shift_like_count(model, like.object_id, delta)
+
+
 @receiver(post_save, sender=Like)
-def handle_like_create(sender, instance: Like, created, **kwargs):
+def handle_like_create(sender, instance: Like, created, raw=False, **kwargs):
     """
     - Tăng like_count cho Review/Comment
-    - Gửi notification review_like / comment_like
+    - Gộp notification review_like / comment_like: 1 thông báo cho mỗi
+      (người nhận, review/comment), Celery task gộp sau commit, xem social.coalesce
     """
-    if not created:
+    if not created or raw:
         return
-
-    obj = instance.content_object
-    ct = ContentType.objects.get_for_model(obj.__class__)
-
-    # Cập nhật like_count nếu model có field này
-    if hasattr(obj, 'like_count'):
-        from .models import Like as LikeModel
-        obj.like_count = LikeModel.objects.filter(
-            content_type=ct,
-            object_id=obj.id
-        ).count()
-        obj.save(update_fields=['like_count'])
-
-    # --- Thông báo ---
-    try:
-        # Like REVIEW
-        if isinstance(obj, Review) and obj.user_id != instance.user_id:
-            Notification.objects.create(
-                user=obj.user,
-                notification_type='review_like',
-                content_type=ct,
-                object_id=obj.id,
-                payload={
-                    'message': f'{instance.user.username} đã thích review của bạn về "{obj.book.title}".'
-                }
-            )
-        # Like COMMENT
-        from .models import Comment as CommentModel
-        if isinstance(obj, CommentModel) and obj.user_id != instance.user_id:
-            Notification.objects.create(
-                user=obj.user,
-                notification_type='comment_like',
-                content_type=ct,
-                object_id=obj.id,
-                payload={
-                    'message': f'{instance.user.username} đã thích bình luận của bạn.'
-                }
-            )
-    except Exception as e:
-        print(f'Lỗi tạo thông báo like: {e}')
+    _shift_like_count(instance, 1)
+    _schedule_like_notification(instance)
 
 
 @receiver(post_delete, sender=Like)
 def handle_like_delete(sender, instance: Like, **kwargs):
-    """Khi bỏ like -> cập nhật lại like_count"""
-    obj = instance.content_object
-    ct = ContentType.objects.get_for_model(obj.__class__)
-    if hasattr(obj, 'like_count'):
-        from .models import Like as LikeModel
-        obj.like_count = LikeModel.objects.filter(
-            content_type=ct,
-            object_id=obj.id
-        ).count()
-        obj.save(update_fields=['like_count'])
+    """Khi bỏ like -> giảm like_count và số người thích trong thông báo đã gộp"""
+    _shift_like_count(instance, -1)
+    _schedule_like_notification(instance)
+
+
+def _schedule_like_notification(like: Like):
+    """Thông báo được dựng lại từ các Like trong Celery, request không khóa/ghi Notification"""
+    model = ContentType.objects.get_for_id(like.content_type_id).model_class()
+    if model in (Review, Comment):
+        content_type_id, object_id = like.content_type_id, like.object_id
+        transaction.on_commit(lambda: schedule_like_notification(content_type_id, object_id))
 
 
 # =========================
@@ -199,7 +158,7 @@ def handle_comment_save(sender, instance: Comment, created, **kwargs):
         return
 
     try:
-        comment_ct = ContentType.objects.get_for_model(Comment)
+        comment_ct = content_types.content_type_id('comment')
 
         # Reply vào comment
         if instance.parent:
@@ -208,7 +167,7 @@ def handle_comment_save(sender, instance: Comment, created, **kwargs):
                 Notification.objects.create(
                     user=parent_user,
                     notification_type='comment_reply',
-                    content_type=comment_ct,
+                    content_type_id=comment_ct,
                     object_id=instance.id,
                     payload={
                         'message': f'{instance.user.username} đã trả lời bình luận của bạn trong review về "{review.book.title}".'
@@ -222,7 +181,7 @@ def handle_comment_save(sender, instance: Comment, created, **kwargs):
                 Notification.objects.create(
                     user=review_owner,
                     notification_type='review_comment',
-                    content_type=comment_ct,
+                    content_type_id=comment_ct,
                     object_id=instance.id,
                     payload={
                         'message': f'{instance.user.username} đã bình luận vào review của bạn về "{review.book.title}".'
@@ -0,0 +1,17 @@
+from celery import shared_task
+
+from . import like_counts
+
+
+@shared_task
+def flush_like_counts():
+    """Flush buffered like_count deltas from Redis to Review/Comment - Run every 15 seconds"""
+    updated = like_counts.flush_like_counts()
+    return f"Flushed like counts of {updated} rows"
+
+
+@shared_task
+def reconcile_like_counts():
+    """Recount like_count of recently flushed reviews/comments from Like rows - Run every 10 minutes"""
+    fixed = like_counts.reconcile_like_counts()
+    return f"Reconciled like counts of {fixed} rows"
@@ -1,7 +1,15 @@
 """
 Tests for reviews app
 """
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient, APITestCase
@@ -9,10 +17,16 @@ from rest_framework import status
 from rest_framework.authtoken.models import Token
 
 from books.models import Book, Author, Publisher
+from social.models import Follow, Notification
+from social.tasks import fan_out_new_review_notifications, refresh_like_notification
+from users.models import Profile
 from .models import Review, Comment, Like
+from .like_counts import flush_like_counts, reconcile_like_counts, shift_like_count
 
 User = get_user_model()
 
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reviews-tests'}}
+
 
 class ReviewModelTest(TestCase):
     """Test Review model"""
@@ -326,3 +340,857 @@ class LikeAPITest(APITestCase):
             object_id=self.review.pk
         ).exists())
 
+
+
+class BookAggregateTest(TestCase):
+    """Test incremental Book rating aggregates"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='TestPass123!'
+        )
+        self.other = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='TestPass123!'
+        )
+        self.book = Book.objects.create(title='Test Book', description='Test Description')
+        self.review = Review.objects.create(
+            book=self.book,
+            user=self.user,
+            title='Test Review',
+            body_md='Test review body with more than 100 characters to meet the minimum requirement.',
+            rating=4.5,
+            status='public'
+        )
+    
+    def assertAggregates(self, review_count, rating_count, avg_rating):
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.review_count, review_count)
+        self.assertEqual(self.book.rating_count, rating_count)
+        self.assertEqual(self.book.avg_rating, Decimal(avg_rating))
+    
+    def test_create_updates_aggregates(self):
+        """Test new reviews are added to the book aggregates"""
+        self.assertAggregates(1, 1, '4.50')
+        Review.objects.create(
+            book=self.book, user=self.other, title='Second',
+            body_md='Second review body', rating=3, status='public'
+        )
+        self.assertAggregates(2, 2, '3.75')
+    
+    def test_status_and_rating_changes(self):
+        """Test hiding, re-publishing and re-rating a review"""
+        self.review.status = 'hidden'
+        self.review.save()
+        self.assertAggregates(0, 0, '0.00')
+        
+        self.review.status = 'public'
+        self.review.rating = None
+        self.review.save()
+        self.assertAggregates(1, 0, '0.00')
+        
+        self.review.rating = 2
+        self.review.save()
+        self.assertAggregates(1, 1, '2.00')
+    
+    def test_delete_updates_aggregates(self):
+        """Test deleting a review removes its contribution"""
+        self.review.delete()
+        self.assertAggregates(0, 0, '0.00')
+    
+    def test_edit_does_not_recount(self):
+        """Test saving a review runs a constant number of queries"""
+        review = Review.objects.get(pk=self.review.pk)
+        review.rating = 3
+        # UPDATE review + UPDATE book + UPDATE review search_vector
+        with self.assertNumQueries(3):
+            review.save()
+        self.assertAggregates(1, 1, '3.00')
+    
+    def test_reconcile_command(self):
+        """Test reconcile_book_ratings repairs drift"""
+        Book.objects.filter(pk=self.book.pk).update(review_count=7, avg_rating=1)
+        out = StringIO()
+        call_command('reconcile_book_ratings', '--fix', stdout=out)
+        self.assertIn(f'Book #{self.book.pk}', out.getvalue())
+        self.assertAggregates(1, 1, '4.50')
+    
+    def test_update_book_ratings_task(self):
+        """Test the periodic task rewrites drifted books in bulk"""
+        from bookreview.tasks import update_book_ratings
+        Book.objects.filter(pk=self.book.pk).update(review_count=0, rating_count=0, avg_rating=0)
+        result = update_book_ratings()
+        self.assertIn('updated 1', result)
+        self.assertAggregates(1, 1, '4.50')
+    
+    def test_update_book_ratings_since(self):
+        """Test --since only touches books with recently changed reviews"""
+        from bookreview.tasks import update_book_ratings
+        Book.objects.filter(pk=self.book.pk).update(review_count=0)
+        result = update_book_ratings(since=(timezone.now() + timedelta(minutes=1)).isoformat())
+        self.assertIn('Scanned 0 books', result)
+        self.assertAggregates(0, 1, '4.50')
+    
+    def test_update_book_ratings_invalid_since(self):
+        """Test an unparseable or date-only since is rejected with a clear error"""
+        from bookreview.tasks import update_book_ratings
+        for since in ('yesterday', '2024-01-01'):
+            with self.assertRaisesMessage(ValueError, 'Invalid since value'):
+                update_book_ratings(since=since)
+
+
+class NewReviewFanOutTest(TestCase):
+    """Test new_review notification fan-out"""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='reviewer',
+            email='reviewer@example.com',
+            password='TestPass123!'
+        )
+        self.book = Book.objects.create(title='Test Book', description='Test Description')
+        user_ct = ContentType.objects.get_for_model(User)
+        self.followers = []
+        for i in range(3):
+            follower = User.objects.create_user(
+                username=f'follower{i}',
+                email=f'follower{i}@example.com',
+                password='TestPass123!'
+            )
+            Profile.objects.create(user=follower, notify_follow=(i != 2))
+            Follow.objects.create(follower=follower, content_type=user_ct, object_id=self.author.pk)
+            self.followers.append(follower)
+    
+    def create_review(self):
+        return Review.objects.create(
+            book=self.book, user=self.author, title='Test Review',
+            body_md='Test review body', rating=4, status='public'
+        )
+    
+    def test_save_only_enqueues(self):
+        """Test creating a review enqueues the fan-out after commit"""
+        with mock.patch('social.tasks.fan_out_new_review_notifications.delay') as delay, \
+                mock.patch('social.tasks.fan_out_review_to_feeds.delay') as feed_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                review = self.create_review()
+        delay.assert_called_once_with(review.pk)
+        feed_delay.assert_called_once_with(review.pk)
+        self.assertFalse(Notification.objects.filter(notification_type='new_review').exists())
+    
+    def test_fan_out_respects_preferences_and_is_idempotent(self):
+        """Test followers opting out are skipped and retries do not duplicate"""
+        review = self.create_review()
+        fan_out_new_review_notifications(review.pk, batch_size=1)
+        fan_out_new_review_notifications(review.pk, batch_size=1)
+        recipients = set(Notification.objects.filter(
+            notification_type='new_review', object_id=review.pk
+        ).values_list('user_id', flat=True))
+        self.assertEqual(recipients, {self.followers[0].pk, self.followers[1].pk})
+
+
+class LikeBatchTest(APITestCase):
+    """Test is_liked is resolved for a whole page in one query"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='liker',
+            email='liker@example.com',
+            password='TestPass123!'
+        )
+        writers = [
+            User.objects.create_user(username=f'writer{i}', email=f'writer{i}@example.com', password='TestPass123!')
+            for i in range(4)
+        ]
+        book = Book.objects.create(title='Liked Book')
+        self.reviews = [
+            Review.objects.create(book=book, user=writer, title=f'Review {i}', body_md='Body ' * 10)
+            for i, writer in enumerate(writers)
+        ]
+        self.comments = [
+            Comment.objects.create(review=self.reviews[0], user=writer, body='Nice')
+            for writer in writers
+        ]
+        review_ct = ContentType.objects.get_for_model(Review)
+        comment_ct = ContentType.objects.get_for_model(Comment)
+        Like.objects.create(user=self.user, content_type=review_ct, object_id=self.reviews[1].pk)
+        Like.objects.create(user=self.user, content_type=comment_ct, object_id=self.comments[2].pk)
+        for review in self.reviews:
+            Follow.objects.create(
+                follower=self.user, content_type=ContentType.objects.get_for_model(User),
+                object_id=review.user_id
+            )
+            Notification.objects.create(
+                user=self.user, notification_type='new_review',
+                content_type=review_ct, object_id=review.pk
+            )
+        self.client.force_authenticate(self.user)
+    
+    def get_with_like_queries(self, url, params=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        like_queries = [q for q in queries.captured_queries if 'FROM "reviews_like"' in q['sql']]
+        return response.data, len(like_queries)
+    
+    def test_review_list(self):
+        """Test review list and feed resolve likes with one query"""
+        for url in (reverse('reviews:review_list'), reverse('social:feed')):
+            data, like_queries = self.get_with_like_queries(url)
+            rows = data['results'] if isinstance(data, dict) else data
+            liked = {row['id'] for row in rows if row['is_liked']}
+            self.assertEqual(liked, {self.reviews[1].pk})
+            self.assertEqual(like_queries, 1)
+    
+    def test_comment_list(self):
+        """Test comment list resolves likes with one query"""
+        data, like_queries = self.get_with_like_queries(
+            reverse('reviews:comment_list'), {'review': self.reviews[0].pk}
+        )
+        liked = {row['id'] for row in data['results'] if row['is_liked']}
+        self.assertEqual(liked, {self.comments[2].pk})
+        self.assertEqual(like_queries, 1)
+    
+    def test_notification_list(self):
+        """Test notifications resolve likes of their reviews with one query"""
+        data, like_queries = self.get_with_like_queries(reverse('social:notification_list'))
+        liked = {row['content_object']['id'] for row in data['results'] if row['content_object']['is_liked']}
+        self.assertEqual(liked, {self.reviews[1].pk})
+        self.assertEqual(like_queries, 1)
+
+
+class CommentThreadTest(APITestCase):
+    """Test comment list loads whole threads in a fixed number of queries"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='threaduser',
+            email='thread@example.com',
+            password='TestPass123!'
+        )
+        book = Book.objects.create(title='Thread Book')
+        self.review = Review.objects.create(book=book, user=self.user, title='Thread', body_md='Body ' * 30)
+        self.url = reverse('reviews:comment_list')
+    
+    def make_thread(self, roots, depth):
+        """`roots` top-level comments, each with a chain of `depth` replies"""
+        chains = []
+        for i in range(roots):
+            chain = [Comment.objects.create(review=self.review, user=self.user, body=f'Root {i}')]
+            for level in range(depth):
+                chain.append(Comment.objects.create(
+                    review=self.review, user=self.user, parent=chain[-1], body=f'Reply {i}.{level}'
+                ))
+            chains.append(chain)
+        return chains
+    
+    def get(self, params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'review': self.review.pk, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.total_queries = len(queries)
+        tables = [
+            table for q in queries.captured_queries
+            for table in ('reviews_comment', 'reviews_like') if f'FROM "{table}"' in q['sql']
+        ]
+        return response.data, tables
+    
+    def test_replies_depth(self):
+        """Test replies are nested down to ?depth= and deeper branches are counted"""
+        chain, = self.make_thread(1, 3)
+        Comment.objects.create(review=self.review, user=self.user, parent=chain[1], body='Hidden', status='hidden')
+        
+        data, _ = self.get({'depth': 2})
+        root, = data['results']
+        self.assertEqual(root['id'], chain[0].pk)
+        reply, = root['replies']
+        self.assertEqual(reply['id'], chain[1].pk)
+        self.assertEqual(reply['reply_count'], 1)
+        nested, = reply['replies']
+        self.assertEqual(nested['id'], chain[2].pk)
+        self.assertEqual(nested['replies'], [])
+        self.assertEqual(nested['reply_count'], 1)
+        
+        data, _ = self.get({'depth': 0})
+        self.assertEqual(data['results'][0]['replies'], [])
+        self.assertEqual(data['results'][0]['reply_count'], 1)
+    
+    def test_query_count_independent_of_thread_size(self):
+        """Test a page costs the same queries for 1 or 20 threads"""
+        self.make_thread(1, 3)
+        _, small = self.get({'depth': 3})
+        small_total = self.total_queries
+        self.make_thread(19, 3)
+        data, large = self.get({'depth': 3})
+        self.assertEqual(len(data['results']), 20)
+        self.assertEqual(large, small)
+        self.assertEqual(self.total_queries, small_total)
+        self.assertEqual(large, ['reviews_comment', 'reviews_comment'])
+        
+        self.client.force_authenticate(self.user)
+        _, authenticated = self.get({'depth': 3})
+        self.assertEqual(authenticated.count('reviews_like'), 1)
+    
+    def test_cursor_pagination(self):
+        """Test top-level comments are paginated with a cursor"""
+        chains = self.make_thread(3, 1)
+        data, _ = self.get({'page_size': 2})
+        self.assertEqual([c['id'] for c in data['results']], [chains[0][0].pk, chains[1][0].pk])
+        response = self.client.get(data['next'])
+        self.assertEqual([c['id'] for c in response.data['results']], [chains[2][0].pk])
+        self.assertIsNone(response.data['next'])
+    
+    def test_replies_of_comment(self):
+        """Test ?parent= lists the replies of one comment"""
+        chain, = self.make_thread(1, 2)
+        data, _ = self.get({'parent': chain[0].pk})
+        reply, = data['results']
+        self.assertEqual(reply['id'], chain[1].pk)
+        self.assertEqual(reply['replies'][0]['id'], chain[2].pk)
+
+
+class KeysetPaginationTest(APITestCase):
+    """Test ?cursor= keyset pagination of reviews"""
+    
+    def setUp(self):
+        book = Book.objects.create(title='Keyset Book')
+        self.reviews = []
+        for i in range(7):
+            user = User.objects.create_user(username=f'keyset{i}', email=f'keyset{i}@example.com', password='TestPass123!')
+            self.reviews.append(Review.objects.create(
+                book=book, user=user, title=f'Keyset {i}', body_md='Body ' * 30, rating=3 + i % 2
+            ))
+        # Ties on created_at must still give a stable, gap-free order (tie-broken by id)
+        Review.objects.filter(pk__in=[r.pk for r in self.reviews[2:5]]).update(
+            created_at=self.reviews[2].created_at
+        )
+        self.newest_first = [r.pk for r in sorted(
+            Review.objects.all(), key=lambda r: (r.created_at, r.pk), reverse=True
+        )]
+    
+    def walk(self, url, params=None):
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+    
+    @mock.patch('bookreview.pagination.KeysetPagination.page_size', 3)
+    def test_walk_forward_and_back(self):
+        """Test cursors visit every review once, both ways"""
+        pages = self.walk(reverse('reviews:review_list'), {'cursor': ''})
+        self.assertEqual(len(pages), 3)
+        self.assertNotIn('count', pages[0])
+        self.assertIsNone(pages[0]['previous'])
+        self.assertEqual([row['id'] for page in pages for row in page['results']], self.newest_first)
+        
+        back = self.client.get(pages[2]['previous']).data
+        self.assertEqual([row['id'] for row in back['results']], self.newest_first[3:6])
+        back = self.client.get(back['previous']).data
+        self.assertEqual([row['id'] for row in back['results']], self.newest_first[:3])
+        self.assertIsNone(back['previous'])
+    
+    def test_deep_page_costs_the_same(self):
+        """Test a later page runs the same queries as the first, and no COUNT(*)"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('reviews:review_list')
+        with mock.patch('bookreview.pagination.KeysetPagination.page_size', 2):
+            with CaptureQueriesContext(connection) as first:
+                next_url = self.client.get(url, {'cursor': ''}).data['next']
+            next_url = self.client.get(next_url).data['next']
+            with CaptureQueriesContext(connection) as later:
+                self.client.get(next_url)
+        self.assertEqual(len(first), len(later))
+        self.assertFalse([q for q in later.captured_queries if 'COUNT(' in q['sql']])
+    
+    def test_keyset_by_default(self):
+        """Test reviews, books and notifications serve keyset pages without ?cursor=, no COUNT(*)"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.force_authenticate(user=User.objects.get(username='keyset0'))
+        for url in (reverse('reviews:review_list'), reverse('books:book_list'),
+                    reverse('social:notification_list')):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            self.assertNotIn('count', response.data, url)
+            self.assertIn('next', response.data, url)
+            self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql']], url)
+    
+    def test_approximate_count_and_page_mode(self):
+        """Test ?count=approximate and that legacy ?page= still returns an exact count"""
+        response = self.client.get(reverse('reviews:review_list'), {'cursor': '', 'count': 'approximate'})
+        self.assertIsInstance(response.data['approximate_count'], int)
+        
+        response = self.client.get(reverse('reviews:review_list'), {'page': 1})
+        self.assertEqual(response.data['count'], 7)
+        
+        response = self.client.get(reverse('reviews:review_list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_frontend_review_list(self):
+        """Test the review list page links to the next page with a cursor"""
+        response = self.client.get(reverse('review_list_frontend'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cursor_page = response.context['cursor_page']
+        self.assertEqual([r.pk for r in cursor_page.object_list], self.newest_first)
+        self.assertFalse(cursor_page.has_next)
+        
+        response = self.client.get(reverse('review_list_frontend'), {'page': 1})
+        self.assertEqual(response.context['page_obj'].number, 1)
+    
+    def test_frontend_review_list_sort_tabs(self):
+        """Test every sort tab of the review list page loads, unrated reviews included"""
+        Review.objects.filter(pk=self.reviews[0].pk).update(rating=None)
+        for sort in ('newest', 'top_rated', 'most_liked', 'most_commented'):
+            response = self.client.get(reverse('review_list_frontend'), {'sort': sort})
+            self.assertEqual(response.status_code, status.HTTP_200_OK, sort)
+            self.assertEqual(response.context['sort'], sort)
+            self.assertEqual(len(response.context['reviews']), 7, sort)
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis hash/set commands of reviews.like_counts"""
+    
+    def __init__(self):
+        import threading
+        self.data = {}
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+    
+    def hincrby(self, key, field, amount):
+        with self.lock:
+            values = self.data.setdefault(key, {})
+            field = self._bytes(field)
+            values[field] = int(values.get(field, 0)) + amount
+    
+    def hmget(self, key, fields):
+        values = self.data.get(key, {})
+        return [values.get(self._bytes(field)) for field in fields]
+    
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+    
+    def exists(self, key):
+        return int(key in self.data)
+    
+    def rename(self, source, target):
+        from redis.exceptions import ResponseError
+        with self.lock:
+            if source not in self.data:
+                raise ResponseError('no such key')
+            self.data[target] = self.data.pop(source)
+    
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+    
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(self._bytes(member) for member in members)
+    
+    def spop(self, key, count):
+        members = self.data.get(key, set())
+        return [members.pop() for _ in range(min(count, len(members)))]
+    
+    def pipeline(self, transaction=True):
+        redis, calls = self, []
+        
+        class Pipeline:
+            def __getattr__(self, name):
+                return lambda *args: calls.append((getattr(redis, name), args))
+            
+            def execute(self):
+                return [method(*args) for method, args in calls]
+        return Pipeline()
+
+
+class FakeRedisMixin:
+    """Buffer like counts in a FakeRedis: tests never touch the shared Redis hashes"""
+    
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch('reviews.like_counts.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LikeNotificationTest(FakeRedisMixin, APITestCase):
+    """Test like_count F() updates and one coalesced notification per liked object"""
+    
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(username='likeowner', email='lo@example.com', password='TestPass123!')
+        self.book = Book.objects.create(title='Popular Book')
+        self.review = Review.objects.create(book=self.book, user=self.owner, title='Viral',
+                                            body_md='Body ' * 30, status='public')
+        self.likers = [
+            User.objects.create_user(username=f'liker{i}', email=f'liker{i}@example.com', password='TestPass123!')
+            for i in range(5)
+        ]
+        self.url = reverse('reviews:review_like', kwargs={'pk': self.review.pk})
+        self.review_ct = ContentType.objects.get_for_model(Review).pk
+        from django.core.cache import cache
+        cache.clear()
+        # Run the debounced refresh now instead of through the broker
+        patcher = mock.patch('social.tasks.refresh_like_notification.apply_async',
+                             side_effect=lambda args, countdown: refresh_like_notification.apply(args))
+        self.refresh = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def like(self, user, method='post'):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(self.url)
+    
+    def notification(self):
+        return Notification.objects.get(user=self.owner, notification_type='review_like')
+    
+    def test_likes_share_one_notification(self):
+        """Test every like updates the same notification with count and latest actors"""
+        for user in self.likers[:3]:
+            self.like(user)
+        notification = self.notification()
+        self.assertEqual(notification.payload['count'], 3)
+        self.assertEqual(notification.payload['actors'], ['liker2', 'liker1', 'liker0'])
+        self.assertEqual(notification.payload['message'], 'liker2, liker1, liker0 đã thích review của bạn về "Popular Book".')
+        
+        for user in self.likers[3:]:
+            self.like(user)
+        notification = self.notification()
+        self.assertEqual(notification.payload['count'], 5)
+        self.assertEqual(notification.payload['message'], 'liker4, liker3, liker2 và 2 người khác đã thích review của bạn về "Popular Book".')
+        flush_like_counts()
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.like_count, 5)
+    
+    def test_like_count_without_recount(self):
+        """Test like/unlike shift like_count with one UPDATE, the notification count follows Like rows"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.like(self.likers[0])
+        self.refresh.reset_mock()
+        self.refresh.side_effect = None  # Leave the refresh pending
+        with CaptureQueriesContext(connection) as queries:
+            self.like(self.likers[1])
+            self.like(self.likers[1], 'delete')
+        self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()])
+        self.refresh.assert_called_once_with((self.review_ct, self.review.pk), countdown=mock.ANY)
+        flush_like_counts()
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.like_count, 1)
+        refresh_like_notification.apply((self.review_ct, self.review.pk))
+        self.assertEqual(self.notification().payload['count'], 1)
+        # Liking again does not count twice
+        self.like(self.likers[1])
+        refresh_like_notification.apply((self.review_ct, self.review.pk))
+        self.assertEqual(self.notification().payload['count'], 2)
+        flush_like_counts()
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.like_count, 2)
+    
+    def test_likes_debounced_off_the_request(self):
+        """Test a burst of likes locks and writes no notification and schedules one refresh"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.refresh.side_effect = None
+        with CaptureQueriesContext(connection) as queries:
+            for user in self.likers:
+                self.like(user)
+        self.assertFalse([q['sql'] for q in queries if 'social_notification' in q['sql']])
+        self.refresh.assert_called_once_with((self.review_ct, self.review.pk), countdown=mock.ANY)
+        refresh_like_notification.apply((self.review_ct, self.review.pk))
+        self.assertEqual(self.notification().payload['count'], 5)
+        # The refresh ran: the next like schedules another one
+        self.like(self.likers[0], 'delete')
+        self.assertEqual(self.refresh.call_count, 2)
+    
+    def test_unlikes_lower_the_count(self):
+        """Test unlikes lower the grouped count and the last one removes the notification"""
+        from social.unread import unread_count
+        for user in self.likers[:2]:
+            self.like(user)
+        self.like(self.likers[1], 'delete')
+        self.assertEqual(self.notification().payload['count'], 1)
+        self.assertEqual(self.notification().payload['actors'], ['liker0'])
+        self.like(self.likers[0], 'delete')
+        self.assertFalse(Notification.objects.filter(notification_type='review_like').exists())
+        self.assertEqual(unread_count(self.owner.pk), 0)
+    
+    def test_unlike_without_like(self):
+        """Test DELETE on a review the user never liked writes nothing"""
+        response = self.like(self.likers[0], 'delete')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(Notification.objects.filter(notification_type='review_like').exists())
+        flush_like_counts()
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.like_count, 0)
+    
+    def test_read_notification_resurfaces(self):
+        """Test a new like makes a read grouped notification unread again"""
+        from social.unread import unread_count
+        self.like(self.likers[0])
+        self.notification().mark_as_read()
+        self.assertEqual(unread_count(self.owner.pk), 0)
+        self.like(self.likers[1])
+        self.assertFalse(self.notification().is_read)
+        self.assertEqual(unread_count(self.owner.pk), 1)
+        # Own likes do not notify
+        self.like(self.owner)
+        self.assertEqual(self.notification().payload['count'], 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LikeCounterTest(FakeRedisMixin, APITestCase):
+    """Test write-behind like_count: deltas buffered, merged on read, flushed in batches"""
+    
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(username='counterowner', email='co@example.com', password='TestPass123!')
+        book = Book.objects.create(title='Counted Book')
+        self.review = Review.objects.create(book=book, user=self.owner, title='Counted',
+                                            body_md='Body ' * 30, status='public')
+        self.comment = Comment.objects.create(review=self.review, user=self.owner, body='Counted comment')
+    
+    def test_reads_merge_pending_deltas(self):
+        """Test API reads include deltas that are not flushed yet"""
+        with self.captureOnCommitCallbacks(execute=True):
+            shift_like_count(Review, self.review.pk, 3)
+            shift_like_count(Comment, self.comment.pk, 2)
+            shift_like_count(Comment, self.comment.pk, -1)
+        
+        response = self.client.get(reverse('reviews:review_list'), {'book': self.review.book_id})
+        self.assertEqual(response.data['results'][0]['like_count'], 3)
+        response = self.client.get(reverse('reviews:comment_list'), {'review': self.review.pk})
+        self.assertEqual(response.data['results'][0]['like_count'], 1)
+        
+        flush_like_counts()
+        self.review.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual((self.review.like_count, self.comment.like_count), (3, 1))
+        # Flushed deltas are not counted twice
+        response = self.client.get(reverse('reviews:review_list'), {'book': self.review.book_id})
+        self.assertEqual(response.data['results'][0]['like_count'], 3)
+    
+    def test_rolled_back_like_is_not_counted(self):
+        """Test a delta is only buffered once its transaction commits"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            shift_like_count(Review, self.review.pk, 1)
+        self.assertEqual(len(callbacks), 1)
+        flush_like_counts()
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.like_count, 0)
+    
+    def test_one_flush_at_a_time(self):
+        """Test a flush skips while another holds the lock"""
+        from django.core.cache import cache
+        from .like_counts import FLUSH_LOCK
+        with self.captureOnCommitCallbacks(execute=True):
+            shift_like_count(Review, self.review.pk, 2)
+        cache.add(FLUSH_LOCK, 1)
+        self.assertEqual(flush_like_counts(), 0)
+        cache.delete(FLUSH_LOCK)
+        self.assertEqual(flush_like_counts(), 1)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.like_count, 2)
+    
+    def test_reconcile_fixes_double_applied_flush(self):
+        """Test reconcile recounts flushed objects from Like rows, minus deltas still pending"""
+        likers = [User.objects.create_user(username=f'counter{i}', email=f'counter{i}@example.com',
+                                           password='TestPass123!') for i in range(3)]
+        self.client.force_authenticate(likers[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('reviews:review_like', kwargs={'pk': self.review.pk}))
+        flush_like_counts()
+        Review.objects.filter(pk=self.review.pk).update(like_count=2)  # Same deltas applied twice
+        for user in likers[1:]:
+            self.client.force_authenticate(user)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('reviews:review_like', kwargs={'pk': self.review.pk}))
+        
+        self.assertEqual(reconcile_like_counts(), 1)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.like_count, 3)
+        self.assertEqual(reconcile_like_counts(), 0)  # Nothing flushed since
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LikeLoadTest(FakeRedisMixin, TransactionTestCase):
+    """Load test: many users like one review at the same time"""
+    
+    LIKERS = 20
+    
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user(username='loadowner', email='load@example.com', password='TestPass123!')
+        self.review = Review.objects.create(book=Book.objects.create(title='Hot Book'), user=owner,
+                                            title='Hot', body_md='Body ' * 30, status='public')
+        self.likers = [
+            User.objects.create_user(username=f'loadliker{i}', email=f'loadliker{i}@example.com', password='TestPass123!')
+            for i in range(self.LIKERS)
+        ]
+        from django.core.cache import cache
+        cache.clear()
+        patcher = mock.patch('social.tasks.refresh_like_notification.apply_async')
+        self.refresh = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_concurrent_likes(self):
+        """Test concurrent likes all land, in like_count and in one notification"""
+        import threading
+        from django.db import connection
+        url = reverse('reviews:review_like', kwargs={'pk': self.review.pk})
+        barrier = threading.Barrier(self.LIKERS)
+        statuses = []
+        
+        def like(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                statuses.append(client.post(url).status_code)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=like, args=(user,)) for user in self.likers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(statuses, [status.HTTP_201_CREATED] * self.LIKERS)
+        self.assertEqual(Like.objects.filter(object_id=self.review.pk).count(), self.LIKERS)
+        response = APIClient().get(reverse('reviews:review_detail', kwargs={'pk': self.review.pk}))
+        self.assertEqual(response.data['like_count'], self.LIKERS)
+        
+        flush_like_counts()
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.like_count, self.LIKERS)
+        # One debounced refresh folds every like
+        self.refresh.assert_called_once()
+        refresh_like_notification.apply(*self.refresh.call_args.args)
+        notification = Notification.objects.get(user=self.review.user, notification_type='review_like')
+        self.assertEqual(notification.payload['count'], self.LIKERS)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reviews-tests'}})
+class ReviewDetailCacheTest(APITestCase):
+    """Test the cached review detail keeps per-user fields per user"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.owner = User.objects.create_user(username='cacheowner', email='cacheowner@example.com', password='TestPass123!')
+        self.reader = User.objects.create_user(username='cachereader', email='cachereader@example.com', password='TestPass123!')
+        self.review = Review.objects.create(book=Book.objects.create(title='Cache Book'), user=self.owner,
+                                            title='Cached', body_md='Body ' * 30, status='public')
+        self.url = reverse('reviews:review_detail', kwargs={'pk': self.review.pk})
+    
+    def get(self, user):
+        self.client.force_authenticate(user)
+        return self.client.get(self.url).data
+    
+    def test_viewer_fields_are_not_shared(self):
+        """Test is_liked/user_can_edit of one user never reach another"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=self.reader, content_object=self.review)
+        data = self.get(self.reader)
+        self.assertEqual((data['is_liked'], data['user_can_edit'], data['like_count']), (True, False, 1))
+        data = self.get(self.owner)
+        self.assertEqual((data['is_liked'], data['user_can_edit'], data['like_count']), (False, True, 1))
+        data = self.get(None)
+        self.assertEqual((data['is_liked'], data['user_can_edit']), (False, False))
+    
+    def test_edit_invalidates(self):
+        """Test an edit is visible on the next read"""
+        self.assertEqual(self.get(self.owner)['title'], 'Cached')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, {'title': 'Edited'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get(self.reader)['title'], 'Edited')
+
+
+class PublicPayloadTest(APITestCase):
+    """Test ?public=1 payloads and the batched viewer-state endpoint"""
+    
+    def setUp(self):
+        from shelves.models import Shelf, ShelfItem
+        self.user = User.objects.create_user(username='viewer', email='viewer@example.com', password='TestPass123!')
+        other = User.objects.create_user(username='viewed', email='viewed@example.com', password='TestPass123!')
+        self.books = [Book.objects.create(title=f'Viewer Book {i}') for i in range(2)]
+        self.reviews = [
+            Review.objects.create(book=book, user=user, title='Shared', body_md='Body ' * 30, status='public')
+            for book, user in zip(self.books, (self.user, other))
+        ]
+        self.comment = Comment.objects.create(review=self.reviews[1], user=self.user, body='Mine')
+        Like.objects.create(user=self.user, content_object=self.reviews[1])
+        self.shelf = Shelf.objects.create(user=self.user, name='Favourites')
+        ShelfItem.objects.create(shelf=self.shelf, book=self.books[0])
+        self.client.force_login(self.user)
+    
+    def test_public_payload_has_no_viewer_fields(self):
+        """Test public responses are identical for everyone and cacheable"""
+        for url in (reverse('reviews:review_list'), reverse('reviews:review_detail', kwargs={'pk': self.reviews[1].pk}),
+                    reverse('reviews:comment_list')):
+            response = self.client.get(url, {'public': 1})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('public', response['Cache-Control'])
+            self.assertNotIn('Cookie', response.get('Vary', ''))
+            data = response.data
+            rows = data['results'] if 'results' in data else [data]
+            for row in rows:
+                self.assertNotIn('is_liked', row)
+                self.assertNotIn('user_can_edit', row)
+        # Without ?public=1 the per-user fields are still there
+        response = self.client.get(reverse('reviews:review_detail', kwargs={'pk': self.reviews[1].pk}))
+        self.assertTrue(response.data['is_liked'])
+    
+    def test_public_param_ignored_on_writes(self):
+        """Test ?public=1 does not drop authentication on PATCH/POST"""
+        url = reverse('reviews:review_detail', kwargs={'pk': self.reviews[0].pk}) + '?public=1'
+        response = self.client.patch(url, {'title': 'Edited'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+        response = self.client.post(reverse('reviews:comment_list') + '?public=1',
+                                    {'review': self.reviews[0].pk, 'body': 'Still me'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+    
+    def test_viewer_state(self):
+        """Test likes, edit rights and shelves for a list of ids, one query per relation"""
+        ContentType.objects.get_for_model(Review)
+        ContentType.objects.get_for_model(Comment)
+        params = {
+            'reviews': ','.join(str(review.pk) for review in self.reviews),
+            'comments': str(self.comment.pk),
+            'books': ','.join(str(book.pk) for book in self.books),
+        }
+        self.client.get(reverse('viewer_state'), params)  # Session lookups
+        with self.assertNumQueries(7):  # session + user, likes x2, owned rows x2, shelf items
+            response = self.client.get(reverse('viewer_state'), params)
+        self.assertEqual(response.data['reviews'], {
+            str(self.reviews[0].pk): {'is_liked': False, 'can_edit': True},
+            str(self.reviews[1].pk): {'is_liked': True, 'can_edit': False},
+        })
+        self.assertEqual(response.data['comments'], {str(self.comment.pk): {'is_liked': False, 'can_edit': True}})
+        self.assertEqual(response.data['books'], {
+            str(self.books[0].pk): {'shelves': [self.shelf.pk]},
+            str(self.books[1].pk): {'shelves': []},
+        })
+        
+        response = self.client.get(reverse('viewer_state'), {'reviews': 'a,b'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
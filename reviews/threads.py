@@ -0,0 +1,69 @@
+"""
+Comment threads: a page of comments plus their replies, a few levels deep.
+
+The page itself is one query; every reply under it, down to `depth`
+levels, comes from a second one (recursive CTE on parent_id). The tree is
+assembled in memory on `comment.thread_replies`, and users/profiles come
+with select_related, so a thread costs the same number of queries whatever
+its size. `reply_count` tells the client which branches were cut off.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from .models import Comment
+
+REPLIES_SQL = """
+    WITH RECURSIVE thread (id, depth) AS (
+        SELECT id, 1 FROM {table}
+        WHERE parent_id = ANY(%s) AND status = 'public' AND is_active
+        UNION ALL
+        SELECT c.id, thread.depth + 1 FROM {table} c
+        JOIN thread ON c.parent_id = thread.id
+        WHERE thread.depth < %s AND c.status = 'public' AND c.is_active
+    )
+    SELECT id FROM thread
+"""
+
+
+def visible_comments():
+    """Public comments with their author, profile and number of visible replies"""
+    replies = Comment.objects.filter(
+        parent=OuterRef('pk'), status='public', is_active=True
+    ).order_by().values('parent').annotate(count=Count('*')).values('count')
+    return Comment.objects.filter(status='public', is_active=True).select_related(
+        'user__profile'
+    ).annotate(
+        reply_count=Coalesce(Subquery(replies, output_field=IntegerField()), Value(0))
+    )
+
+
+def attach_replies(comments, depth):
+    """Load replies of `comments` down to `depth` levels into `thread_replies`"""
+    comments = list(comments)
+    by_id = {}
+    for comment in comments:
+        comment.thread_replies = []
+        by_id[comment.pk] = comment
+    if depth < 1 or not comments:
+        return comments
+
+    sql = REPLIES_SQL.format(table=Comment._meta.db_table)
+    replies = visible_comments().filter(
+        pk__in=RawSQL(sql, [list(by_id), depth])
+    ).order_by('created_at', 'pk')
+    replies = list(replies)
+    for reply in replies:
+        reply.thread_replies = []
+        by_id[reply.pk] = reply
+    # created_at order: each parent's list comes out sorted
+    for reply in replies:
+        by_id[reply.parent_id].thread_replies.append(reply)
+    return comments
+
+
+def walk(comments):
+    """Every comment of the loaded trees, parents first"""
+    for comment in comments:
+        yield comment
+        yield from walk(getattr(comment, 'thread_replies', ()))
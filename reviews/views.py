@@ -1,12 +1,10 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
-from django.contrib.contenttypes.models import ContentType
 from django_filters.rest_framework import DjangoFilterBackend
-from django.core.cache import cache
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.conf import settings
 
 from .models import Review, ReviewImage, Comment, Like
 from books.models import Book
@@ -15,7 +13,13 @@ from .serializers import (
     CommentSerializer, LikeSerializer, ReviewSerializer # <--- NHỚ IMPORT CÁI NÀY
 )
 from .permissions import IsOwnerOrReadOnly
+from .likes import like_resolver
+from .threads import attach_replies, visible_comments
 from users.throttles import CommentThrottle
+from bookreview import content_types
+from bookreview.caching import get_or_compute
+from bookreview.pagination import KeysetDefaultPagination
+from bookreview.public import PublicPayloadMixin, is_public_request
 
 class ReviewByBookView(APIView):
     """Get Book details for Review by slug"""
@@ -44,18 +48,19 @@ class ReviewByBookView(APIView):
             return Response({'error': 'Book not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class ReviewListView(generics.ListCreateAPIView):
+class ReviewListView(PublicPayloadMixin, generics.ListCreateAPIView):
     """
     Review List (GET) and Create (POST).
     Đã đổi tên class cho chuẩn RESTful (thường là ListCreateAPIView)
     nhưng nếu urls.py của bạn đang gọi là ReviewListView thì bạn đổi tên class này lại nhé.
     """
     queryset = Review.objects.filter(status='public', is_active=True).select_related(
-        'book', 'user'
+        'book', 'user__profile'
     ).prefetch_related('images').order_by('-created_at')
     
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
+    pagination_class = KeysetDefaultPagination
     
     filterset_fields = ['book', 'user', 'status'] 
     
@@ -68,10 +73,10 @@ class ReviewListView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ReviewDetailView(PublicPayloadMixin, generics.RetrieveUpdateDestroyAPIView):
     """Review Detail, Update, Delete"""
     queryset = Review.objects.filter(is_active=True).select_related(
-        'book', 'user'
+        'book', 'user__profile'
     ).prefetch_related('images')
     
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
@@ -82,37 +87,36 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
             return ReviewSerializer
         return ReviewDetailSerializer
 
-    # --- SỬA PHẦN CACHE TẠI ĐÂY ---
-
     def retrieve(self, request, *args, **kwargs):
-        # 1. Tạo tên key thủ công
-        pk = kwargs.get('pk')
-        cache_key = f'review_detail_{pk}'
-        
-        # 2. Thử lấy từ cache
-        data = cache.get(cache_key)
-        
-        if not data:
-            # 3. Nếu chưa có, gọi logic gốc để lấy từ DB
-            response = super().retrieve(request, *args, **kwargs)
-            # 4. Lưu data vào cache 60s
-            cache.set(cache_key, response.data, 60)
-            return response
-        
-        # Trả về data từ cache (không query DB)
-        return Response(data)
+        # Phần chung cho mọi user được cache (bookreview.caching), bị xóa khi
+        # review/sách đổi; phần riêng từng user ghép vào sau
+        data = get_or_compute(
+            'review_detail', kwargs['pk'], self.get_shared_data,
+            lambda data: [f'review:{data["id"]}', f'book:{data["book"]["id"]}'],
+            timeout=10 * 60,  # Profile của người viết không có tag, chỉ hết hạn theo thời gian
+        )
+        return Response(self.overlay_viewer_fields(dict(data)))
+
+    def get_shared_data(self):
+        review = self.get_object()
+        data = self.get_serializer(review).data
+        data['like_count'] = review.like_count  # Like chưa flush cộng theo từng request
+        for field in ReviewDetailSerializer.VIEWER_FIELDS:
+            data.pop(field, None)
+        return data
+
+    def overlay_viewer_fields(self, data):
+        resolver = like_resolver(self.get_serializer_context())
+        user = self.request.user
+        data['like_count'] = resolver.like_count_pk(Review, data['id'], data['like_count'])
+        if is_public_request(self.request):
+            return data  # Phần riêng lấy ở /api/viewer-state/
+        data['is_liked'] = resolver.is_liked_pk(Review, data['id'])
+        data['user_can_edit'] = user.is_authenticated and user.pk == data['user']['id']
+        return data
 
     def perform_update(self, serializer):
         serializer.save(user=self.request.user)
-        # 5. Xóa đúng cái key đã tạo ở trên
-        pk = self.kwargs.get('pk')
-        cache.delete(f'review_detail_{pk}')
-
-    def perform_destroy(self, instance):
-        # 6. Xóa cache khi bài viết bị xóa
-        pk = self.kwargs.get('pk')
-        cache.delete(f'review_detail_{pk}')
-        instance.delete()
 
 
 @api_view(['POST', 'DELETE'])
@@ -124,33 +128,60 @@ def review_like_view(request, pk):
     except Review.DoesNotExist:
         return Response({'error': 'Review not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    content_type = ContentType.objects.get_for_model(Review)
+    content_type_id = content_types.content_type_id('review')
+    if request.method == 'DELETE':
+        # Không tạo Like chỉ để xóa nó (mỗi lần tạo là 1 thông báo + 1 lần cộng like_count)
+        Like.objects.filter(user=request.user, content_type_id=content_type_id, object_id=review.id).delete()
+        return Response({'message': 'Unliked'}, status=status.HTTP_200_OK)
+    
     like, created = Like.objects.get_or_create(
         user=request.user,
-        content_type=content_type,
+        content_type_id=content_type_id,
         object_id=review.id
     )
     
-    if request.method == 'DELETE':
-        like.delete()
-        return Response({'message': 'Unliked'}, status=status.HTTP_200_OK)
-    
     if not created:
         return Response({'message': 'Already liked'}, status=status.HTTP_200_OK)
     
     return Response({'message': 'Liked'}, status=status.HTTP_201_CREATED)
 
 
-class CommentListView(generics.ListCreateAPIView):
-    """Comment List and Create"""
-    queryset = Comment.objects.filter(status='public', is_active=True, parent__isnull=True).select_related(
-        'review', 'user'
-    ).order_by('created_at')
+class CommentListView(PublicPayloadMixin, generics.ListCreateAPIView):
+    """
+    Comment List and Create
+    - Top-level comments (?parent=<id>: replies of that comment), cursor-paginated
+    - Each comment carries its replies ?depth= levels deep (reviews.threads)
+    """
+    class Pagination(CursorPagination):
+        ordering = ('created_at', 'id')
+        page_size_query_param = 'page_size'
+        max_page_size = 100
+
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     throttle_classes = [CommentThrottle]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['review']
+    filterset_fields = ['review', 'parent']
+    pagination_class = Pagination
+
+    def get_queryset(self):
+        queryset = visible_comments()
+        if 'parent' not in self.request.query_params:
+            queryset = queryset.filter(parent__isnull=True)
+        return queryset
+
+    def get_reply_depth(self):
+        try:
+            depth = int(self.request.query_params.get('depth', settings.COMMENT_REPLY_DEPTH))
+        except ValueError:
+            depth = settings.COMMENT_REPLY_DEPTH
+        return max(0, min(depth, settings.COMMENT_MAX_REPLY_DEPTH))
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        comments = attach_replies(page, self.get_reply_depth())
+        serializer = self.get_serializer(comments, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -158,7 +189,7 @@ class CommentListView(generics.ListCreateAPIView):
 
 class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Comment Detail, Update, Delete"""
-    queryset = Comment.objects.filter(is_active=True)
+    queryset = Comment.objects.filter(is_active=True).select_related('user__profile')
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
@@ -175,17 +206,18 @@ def comment_like_view(request, pk):
     except Comment.DoesNotExist:
         return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    content_type = ContentType.objects.get_for_model(Comment)
+    content_type_id = content_types.content_type_id('comment')
+    if request.method == 'DELETE':
+        # Không tạo Like chỉ để xóa nó (mỗi lần tạo là 1 thông báo + 1 lần cộng like_count)
+        Like.objects.filter(user=request.user, content_type_id=content_type_id, object_id=comment.id).delete()
+        return Response({'message': 'Unliked'}, status=status.HTTP_200_OK)
+    
     like, created = Like.objects.get_or_create(
         user=request.user,
-        content_type=content_type,
+        content_type_id=content_type_id,
         object_id=comment.id
     )
     
-    if request.method == 'DELETE':
-        like.delete()
-        return Response({'message': 'Unliked'}, status=status.HTTP_200_OK)
-    
     if not created:
         return Response({'message': 'Already liked'}, status=status.HTTP_200_OK)
     
@@ -0,0 +1,212 @@
+"""
+Autocomplete index for book titles and author names.
+
+Every accent-folded prefix of each word of a title/name (up to
+PREFIX_LENGTH characters, running on into the following words) is a Redis
+sorted set of ids scored by popularity, so a keystroke is a single
+ZREVRANGE on the typed prefix whatever the catalog size:
+
+    autocomplete:<gen>:book:p:chien tr  ->  {book_id: rating_count, ...}
+    autocomplete:<gen>:book:entries     ->  {book_id: [title, folded title]}
+
+`rebuild_autocomplete_index` (Celery beat) writes a new generation and
+switches to it; Book/Author saves update the current generation in place.
+Without Redis, or before the first build, suggestions come from the DB.
+"""
+import json
+import logging
+import re
+import time
+import unicodedata
+
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.search import SearchQuery
+from redis.exceptions import RedisError
+
+from bookreview.redis_utils import get_redis, redis_key
+from books.models import Author, Book
+from .functions import ImmutableUnaccent
+
+logger = logging.getLogger('bookreview')
+
+PREFIX_LENGTH = 15
+GENERATION_KEY = 'autocomplete:generation'
+REBUILD_LOCK_KEY = 'autocomplete:rebuild-requested'
+OLD_GENERATION_TTL = 5 * 60
+GENERATION_CACHE_SECONDS = 30
+
+KINDS = ('book', 'author')
+
+_generation = (None, 0.0)  # (generation, read at)
+
+
+def fold(text):
+    """Lowercase, strip Vietnamese diacritics and collapse punctuation to spaces"""
+    text = (text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+def prefixes(folded):
+    """Indexed prefixes of a folded text: every word start, 1..PREFIX_LENGTH chars"""
+    words = folded.split()
+    result = set()
+    for i in range(len(words)):
+        tail = ' '.join(words[i:])[:PREFIX_LENGTH].rstrip()
+        result.update(tail[:n] for n in range(1, len(tail) + 1))
+    return result
+
+
+def _key(generation, kind, name):
+    return redis_key(f'autocomplete:{generation}:{kind}:{name}')
+
+
+def _prefix_key(generation, kind, prefix):
+    return _key(generation, kind, f'p:{prefix}')
+
+
+def _entries(kind):
+    """(id, text, popularity) of everything that should be suggested"""
+    if kind == 'book':
+        return Book.objects.filter(is_active=True).values_list('pk', 'title', 'rating_count')
+    return Author.objects.filter(is_active=True).annotate(
+        popularity=Coalesce(Sum('books__rating_count', filter=Q(books__is_active=True)), 0)
+    ).values_list('pk', 'name', 'popularity')
+
+
+def _current_generation(redis):
+    global _generation
+    generation, read_at = _generation
+    if generation is None or time.monotonic() - read_at > GENERATION_CACHE_SECONDS:
+        generation = redis.get(redis_key(GENERATION_KEY))
+        generation = int(generation) if generation is not None else None
+        _generation = (generation, time.monotonic())
+    return generation
+
+
+def _add(pipe, generation, kind, pk, text, score):
+    folded = fold(text)
+    for prefix in prefixes(folded):
+        pipe.zadd(_prefix_key(generation, kind, prefix), {pk: score})
+    pipe.hset(_key(generation, kind, 'entries'), pk, json.dumps([text, folded]))
+
+
+def rebuild_index(batch_size=1000):
+    """Build a fresh generation of the index and switch suggestions to it"""
+    global _generation
+    redis = get_redis()
+    if redis is None:
+        return 0
+
+    previous = redis.get(redis_key(GENERATION_KEY))
+    generation = redis.incr(redis_key('autocomplete:next-generation'))
+    indexed = 0
+    for kind in KINDS:
+        pipe = redis.pipeline(transaction=False)
+        for count, (pk, text, score) in enumerate(_entries(kind).iterator(chunk_size=batch_size), 1):
+            _add(pipe, generation, kind, pk, text, score)
+            if count % batch_size == 0:
+                pipe.execute()
+        pipe.execute()
+        indexed += redis.hlen(_key(generation, kind, 'entries'))
+
+    redis.set(redis_key(GENERATION_KEY), generation)
+    _generation = (generation, time.monotonic())
+
+    # Processes still caching the old generation keep reading it for a while
+    if previous is not None:
+        pipe = redis.pipeline(transaction=False)
+        for key in redis.scan_iter(match=redis_key(f'autocomplete:{int(previous)}:*'), count=1000):
+            pipe.expire(key, OLD_GENERATION_TTL)
+        pipe.execute()
+    return indexed
+
+
+def update_entry(kind, pk, text=None, score=0):
+    """Re-index one book/author in the current generation; text=None removes it"""
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        generation = _current_generation(redis)
+        if generation is None:
+            return
+        entries = _key(generation, kind, 'entries')
+        old = redis.hget(entries, pk)
+        pipe = redis.pipeline(transaction=False)
+        if old is not None:
+            for prefix in prefixes(json.loads(old)[1]):
+                pipe.zrem(_prefix_key(generation, kind, prefix), pk)
+            pipe.hdel(entries, pk)
+        if text is not None:
+            _add(pipe, generation, kind, pk, text, score)
+        pipe.execute()
+    except RedisError as exc:
+        logger.warning('Updating autocomplete entry %s #%s failed: %s', kind, pk, exc)
+
+
+def author_popularity(author_id):
+    return Book.objects.filter(authors=author_id, is_active=True).aggregate(
+        total=Coalesce(Sum('rating_count'), 0)
+    )['total']
+
+
+def suggest(kind, query, limit=10):
+    """Up to `limit` titles/names starting (at any word) with `query`, most popular first"""
+    folded = fold(query)
+    if not folded:
+        return []
+
+    redis = get_redis()
+    if redis is not None:
+        try:
+            generation = _current_generation(redis)
+            if generation is not None:
+                return _suggest_from_redis(redis, generation, kind, folded, limit)
+            _request_rebuild()
+        except RedisError as exc:
+            logger.warning('Autocomplete lookup failed, using DB: %s', exc)
+    return _suggest_from_db(kind, folded, limit)
+
+
+def _suggest_from_redis(redis, generation, kind, folded, limit):
+    truncated = len(folded) > PREFIX_LENGTH
+    # Long queries share the PREFIX_LENGTH key with other texts: over-fetch and filter
+    ids = redis.zrevrange(_prefix_key(generation, kind, folded[:PREFIX_LENGTH]), 0,
+                          limit * 5 - 1 if truncated else limit - 1)
+    if not ids:
+        return []
+    suggestions = []
+    for entry in redis.hmget(_key(generation, kind, 'entries'), ids):
+        if entry is None:
+            continue
+        text, entry_folded = json.loads(entry)
+        if truncated and f' {folded}' not in f' {entry_folded}':
+            continue
+        suggestions.append(text)
+    return suggestions[:limit]
+
+
+def _request_rebuild():
+    """Index not built yet (fresh Redis): ask a worker to build it, once"""
+    from .tasks import rebuild_autocomplete_index
+
+    if cache.add(REBUILD_LOCK_KEY, 1, 10 * 60):
+        rebuild_autocomplete_index.delay()
+
+
+def _suggest_from_db(kind, folded, limit):
+    if kind == 'book':
+        # Prefix match on the title words (weight A) of the stored search vector
+        terms = ' & '.join(f'{word}:*A' for word in folded.split())
+        return list(Book.objects.filter(
+            is_active=True,
+            search_vector=SearchQuery(terms, search_type='raw', config='simple'),
+        ).order_by('-rating_count').values_list('title', flat=True)[:limit])
+
+    return list(Author.objects.alias(folded_name=ImmutableUnaccent('name')).filter(
+        Q(folded_name__istartswith=folded) | Q(folded_name__icontains=f' {folded}'),
+        is_active=True,
+    ).order_by('name').values_list('name', flat=True)[:limit])
@@ -0,0 +1,89 @@
+"""
+Postgres full-text search for books and reviews.
+
+Book.search_vector and Review.search_vector store an unaccented tsvector
+built with the 'simple' config: Postgres has no Vietnamese dictionary, so
+diacritics are folded ("Tiếng Việt" ~ "tieng viet") instead of stemmed.
+Queries go through the GIN indexes and are ranked with SearchRank. When a
+book query matches nothing, titles are compared by trigram similarity so
+typos still return something.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+
+from .functions import ImmutableUnaccent
+
+SEARCH_CONFIG = 'simple'
+DEFAULT_ORDERING = ('-rank', '-rating_count')
+
+
+def _document(expression, weight):
+    return SearchVector(ImmutableUnaccent(expression), weight=weight, config=SEARCH_CONFIG)
+
+
+def _related_names(through, field):
+    """Space separated names of the related rows of each outer book"""
+    names = through.objects.filter(book_id=OuterRef('pk')).order_by().values('book_id').annotate(
+        names=StringAgg(f'{field}__name', ' ')
+    ).values('names')
+    return Subquery(names, output_field=TextField())
+
+
+def update_book_vectors(books):
+    """Rebuild search_vector for a Book queryset in one UPDATE"""
+    Book = books.model
+    return books.update(search_vector=(
+        _document('title', 'A')
+        + _document(_related_names(Book.authors.through, 'author'), 'B')
+        + _document(_related_names(Book.tags.through, 'tag'), 'C')
+        + _document('description', 'D')
+    ))
+
+
+def update_review_vectors(reviews):
+    """Rebuild search_vector for a Review queryset in one UPDATE"""
+    Book = reviews.model._meta.get_field('book').related_model
+    book_title = Subquery(Book.objects.filter(pk=OuterRef('book_id')).values('title'))
+    return reviews.update(search_vector=(
+        _document('title', 'A')
+        + _document('body_md', 'B')
+        + _document(book_title, 'C')
+    ))
+
+
+def search_query(text):
+    return SearchQuery(ImmutableUnaccent(Value(text)), search_type='websearch', config=SEARCH_CONFIG)
+
+
+def search_books(text, books, ordering=None, limit=20):
+    """
+    Up to `limit` books from `books` matching `text`, annotated with `rank`.
+    Falls back to trigram similarity on the title when nothing matches.
+    """
+    ordering = ordering or DEFAULT_ORDERING
+    query = search_query(text)
+    matches = books.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by(*ordering)
+    results = list(matches[:limit])
+    if results:
+        return results
+
+    # Không có từ nào khớp: có thể gõ sai chính tả -> so khớp trigram trên tiêu đề
+    folded = ImmutableUnaccent(Value(text))
+    similar = books.alias(folded_title=ImmutableUnaccent('title')).filter(
+        folded_title__trigram_similar=folded
+    ).annotate(
+        rank=TrigramSimilarity(ImmutableUnaccent('title'), folded)
+    ).order_by(*ordering)
+    return list(similar[:limit])
+
+
+def search_reviews(text, reviews, ordering=None, limit=20):
+    """Up to `limit` reviews from `reviews` matching `text`, annotated with `rank`"""
+    query = search_query(text)
+    matches = reviews.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by(*(ordering or ('-rank', '-like_count')))
+    return list(matches[:limit])
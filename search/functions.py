@@ -0,0 +1,10 @@
+from django.db.models import Func, TextField
+
+
+class ImmutableUnaccent(Func):
+    """
+    unaccent() wrapped in an IMMUTABLE SQL function (created by
+    books.0008_search_vector) so it can be used in index expressions.
+    """
+    function = 'immutable_unaccent'
+    output_field = TextField()
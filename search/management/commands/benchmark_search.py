@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from books.models import Author, Book
+from search.engine import search_books, update_book_vectors
+
+WORDS = [
+    'Tiếng', 'Việt', 'Hà', 'Nội', 'mùa', 'thu', 'người', 'đàn', 'bà', 'biển', 'nhớ', 'dòng',
+    'sông', 'ký', 'ức', 'giấc', 'mơ', 'thành', 'phố', 'ánh', 'sáng', 'đêm', 'trăng', 'rừng',
+    'núi', 'lửa', 'gió', 'mưa', 'chiến', 'tranh', 'hòa', 'bình', 'tuổi', 'trẻ', 'quê', 'hương',
+    'history', 'garden', 'shadow', 'river', 'winter', 'letters', 'silent', 'empire', 'journey',
+]
+
+# (label, query): exact word, folded diacritics, two words, typo (trigram fallback), no match
+QUERIES = [
+    ('word', 'sông'),
+    ('unaccented', 'song'),
+    ('phrase', 'mùa thu'),
+    ('typo', 'chiếm tranh'),
+    ('miss', 'xyzzy'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure search latency (full-text vs. the old icontains query) against growing '
+        'synthetic catalogs. Runs in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                            help='Catalog sizes (number of books) to measure')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query and size')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sizes = sorted(options['sizes'])
+
+        self.stdout.write(f"{'books':>8}  {'query':<11}{'engine':<10}{'median ms':>10}{'p95 ms':>10}")
+        with transaction.atomic():
+            authors = Author.objects.bulk_create(
+                Author(name=f'Benchmark {self._words(rng, 2)} {i}', slug=f'benchmark-author-{i}')
+                for i in range(200)
+            )
+            created = 0
+            for size in sizes:
+                self._seed_books(rng, authors, created, size)
+                created = size
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE books_book')
+                self._measure(size, options['repeat'])
+
+            transaction.set_rollback(True)
+
+    def _words(self, rng, count):
+        return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+    def _seed_books(self, rng, authors, start, stop):
+        Through = Book.authors.through
+        for offset in range(start, stop, 1000):
+            books = Book.objects.bulk_create(
+                Book(
+                    title=self._words(rng, rng.randint(2, 5)),
+                    slug=f'benchmark-book-{i}',
+                    description=self._words(rng, 40),
+                    rating_count=rng.randint(0, 500),
+                )
+                for i in range(offset, min(offset + 1000, stop))
+            )
+            Through.objects.bulk_create(
+                Through(book_id=book.pk, author_id=rng.choice(authors).pk) for book in books
+            )
+            # bulk_create bypasses the search signals
+            update_book_vectors(Book.objects.filter(pk__in=[book.pk for book in books]))
+
+    def _measure(self, size, repeat):
+        books = Book.objects.filter(is_active=True)
+        engines = {
+            'fts': lambda q: search_books(q, books),
+            'icontains': lambda q: list(books.filter(
+                Q(title__icontains=q) | Q(description__icontains=q) |
+                Q(authors__name__icontains=q) | Q(tags__name__icontains=q)
+            ).distinct().order_by('-avg_rating', '-rating_count', '-created_at')[:20]),
+        }
+        for label, query in QUERIES:
+            for name, run in engines.items():
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    run(query)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(
+                    f'{size:>8}  {label:<11}{name:<10}{statistics.median(timings):>10.2f}{p95:>10.2f}'
+                )
@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from books.models import Author, Book, Tag
+from reviews.models import Review
+from . import autocomplete
+from .engine import update_book_vectors, update_review_vectors
+
+BOOK_SEARCH_FIELDS = {'title', 'description'}
+REVIEW_SEARCH_FIELDS = {'title', 'body_md', 'book'}
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+# =========================
+# 1. BOOK: title, description, authors, tags
+# =========================
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance: Book, created, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, BOOK_SEARCH_FIELDS):
+        return
+    update_book_vectors(Book.objects.filter(pk=instance.pk))
+    # Review documents include the book title (old state captured by books.signals)
+    previous = None if created else getattr(instance, '_tracked_state', None)
+    if previous and previous['title'] != instance.title:
+        update_review_vectors(Review.objects.filter(book_id=instance.pk))
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.tags.through)
+def index_book_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    """book.authors/tags hoặc author/tag.books thay đổi -> index lại sách liên quan"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            update_book_vectors(Book.objects.filter(pk=instance.pk))
+        return
+
+    if action == 'pre_clear':
+        instance._cleared_book_ids = list(instance.books.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        update_book_vectors(Book.objects.filter(pk__in=pk_set))
+    elif action == 'post_clear':
+        update_book_vectors(Book.objects.filter(pk__in=getattr(instance, '_cleared_book_ids', [])))
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Tag)
+def index_books_of_name(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Author/Tag đổi tên -> index lại các sách của nó"""
+    if created or raw or not _touches(update_fields, {'name'}):
+        return
+    update_book_vectors(Book.objects.filter(pk__in=instance.books.values('pk')))
+
+
+# =========================
+# 2. AUTOCOMPLETE: book titles, author names
+# =========================
+
+@receiver(post_save, sender=Book)
+def autocomplete_book(sender, instance: Book, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, {'title', 'is_active', 'rating_count'}):
+        return
+    if instance.is_active:
+        args = ('book', instance.pk, instance.title, instance.rating_count)
+    else:
+        args = ('book', instance.pk)
+    transaction.on_commit(lambda: autocomplete.update_entry(*args))
+
+
+@receiver(post_save, sender=Author)
+def autocomplete_author(sender, instance: Author, created, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, {'name', 'is_active'}):
+        return
+    pk, name, is_active = instance.pk, instance.name, instance.is_active
+
+    def update():
+        if is_active:
+            popularity = 0 if created else autocomplete.author_popularity(pk)
+            autocomplete.update_entry('author', pk, name, popularity)
+        else:
+            autocomplete.update_entry('author', pk)
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+def autocomplete_remove(sender, instance, **kwargs):
+    kind = 'book' if sender is Book else 'author'
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.update_entry(kind, pk))
+
+
+# =========================
+# 3. REVIEW: title, body, book
+# =========================
+
+@receiver(post_save, sender=Review)
+def index_review(sender, instance: Review, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, REVIEW_SEARCH_FIELDS):
+        return
+    update_review_vectors(Review.objects.filter(pk=instance.pk))
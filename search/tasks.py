@@ -0,0 +1,10 @@
+from celery import shared_task
+
+from . import autocomplete
+
+
+@shared_task
+def rebuild_autocomplete_index():
+    """Rebuild the Redis autocomplete index (fresh popularity weights) - Run every hour"""
+    indexed = autocomplete.rebuild_index()
+    return f"Indexed {indexed} autocomplete entries"
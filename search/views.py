@@ -2,12 +2,13 @@ from rest_framework import generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.db.models import Q
-from django.contrib.postgres.search import SearchVector, TrigramSimilarity
 
 from books.models import Book, Author
 from reviews.models import Review
 from books.serializers import BookListSerializer, AuthorSerializer
 from reviews.serializers import ReviewListSerializer
+from .autocomplete import suggest
+from .engine import search_books, search_reviews
 
 
 @api_view(['GET'])
@@ -44,13 +45,7 @@ def search_view(request):
     
     # Search Books with filters
     if search_type in ['all', 'books']:
-        books = Book.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(authors__name__icontains=query) |
-            Q(tags__name__icontains=query),
-            is_active=True
-        )
+        books = Book.objects.filter(is_active=True)
         
         # Apply filters
         if genre:
@@ -79,15 +74,17 @@ def search_view(request):
         
         # Apply sorting
         if sort_by == 'rating':
-            books = books.order_by('-avg_rating', '-rating_count')
+            ordering = ('-avg_rating', '-rating_count')
         elif sort_by == 'date':
-            books = books.order_by('-created_at')
+            ordering = ('-created_at',)
         elif sort_by == 'title':
-            books = books.order_by('title')
+            ordering = ('title',)
         else:  # relevance (default)
-            books = books.order_by('-avg_rating', '-rating_count', '-created_at')
+            ordering = ('-rank', '-rating_count', '-created_at')
         
-        books = books.distinct().select_related('publisher').prefetch_related('authors', 'genres')[:20]
+        books = search_books(
+            query, books.select_related('publisher').prefetch_related('authors', 'genres'), ordering
+        )
         results['books'] = BookListSerializer(books, many=True, context={'request': request}).data
     
     # Search Authors
@@ -96,18 +93,12 @@ def search_view(request):
             Q(name__icontains=query) |
             Q(bio__icontains=query),
             is_active=True
-        ).distinct().order_by('name')[:20]
+        ).order_by('name')[:20]
         results['authors'] = AuthorSerializer(authors, many=True, context={'request': request}).data
     
     # Search Reviews with filters
     if search_type in ['all', 'reviews']:
-        reviews = Review.objects.filter(
-            Q(title__icontains=query) |
-            Q(body_md__icontains=query) |
-            Q(book__title__icontains=query),
-            status='public',
-            is_active=True
-        )
+        reviews = Review.objects.filter(status='public', is_active=True)
         
         # Apply filters for reviews
         if min_rating:
@@ -123,13 +114,15 @@ def search_view(request):
         
         # Apply sorting
         if sort_by == 'rating':
-            reviews = reviews.order_by('-rating', '-like_count')
+            ordering = ('-rating', '-like_count')
         elif sort_by == 'date':
-            reviews = reviews.order_by('-created_at')
+            ordering = ('-created_at',)
         else:  # relevance (default)
-            reviews = reviews.order_by('-like_count', '-created_at')
+            ordering = ('-rank', '-like_count', '-created_at')
         
-        reviews = reviews.distinct().select_related('book', 'user').prefetch_related('images')[:20]
+        reviews = search_reviews(
+            query, reviews.select_related('book', 'user').prefetch_related('images'), ordering
+        )
         results['reviews'] = ReviewListSerializer(reviews, many=True, context={'request': request}).data
     
     results['total'] = len(results['books']) + len(results['authors']) + len(results['reviews'])
@@ -147,20 +140,11 @@ def autocomplete_view(request):
     if not query or len(query) < 2:
         return Response({'suggestions': []})
     
-    suggestions = []
-    
     if search_type == 'books':
-        books = Book.objects.filter(
-            title__icontains=query,
-            is_active=True
-        ).values_list('title', flat=True)[:10]
-        suggestions = [{'text': title, 'type': 'book'} for title in books]
-        
+        suggestions = [{'text': title, 'type': 'book'} for title in suggest('book', query)]
     elif search_type == 'authors':
-        authors = Author.objects.filter(
-            name__icontains=query,
-            is_active=True
-        ).values_list('name', flat=True)[:10]
-        suggestions = [{'text': name, 'type': 'author'} for name in authors]
+        suggestions = [{'text': name, 'type': 'author'} for name in suggest('author', query)]
+    else:
+        suggestions = []
     
     return Response({'suggestions': suggestions})
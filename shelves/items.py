@@ -0,0 +1,103 @@
+"""
+Books on shelves and collections: book_count and item order.
+
+Shelf.book_count and Collection.book_count are shifted with F() updates,
+never recounted: ShelfItem/CollectionItem.save and delete shift by one,
+and the batch operations below shift once per batch. Adding books takes a
+row lock on the shelf (SELECT ... FOR UPDATE), so concurrent adds to one
+shelf queue up and each batch continues from MAX(order) + 1 instead of two
+requests reading the same items.count(). Both work for Shelf and
+Collection (anything with an `items` relation of book rows).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+
+from .previews import item_model
+
+
+def shift_item_counts(model, deltas):
+    """Apply {pk: delta} to model.book_count, one UPDATE per distinct delta"""
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if pk is not None and delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(
+            book_count=Greatest(F('book_count') + delta, 0)
+        )
+
+
+def _items_of(container):
+    Item = item_model(type(container))
+    container_field = type(container)._meta.get_field('items').field.name
+    return Item, Item.objects.filter(**{container_field: container}), container_field
+
+
+def _lock(*containers):
+    """Row-lock the containers, always in pk order (no deadlock between two moves)"""
+    for container in sorted(containers, key=lambda c: c.pk):
+        type(container).objects.select_for_update().filter(pk=container.pk).first()
+
+
+def _insert(container, book_ids):
+    """Add the missing books after the last item; caller holds the lock. Returns how many"""
+    Item, items, container_field = _items_of(container)
+    present = set(items.filter(book_id__in=book_ids).values_list('book_id', flat=True))
+    new_ids = [book_id for book_id in dict.fromkeys(book_ids) if book_id not in present]
+    if not new_ids:
+        return 0
+    last = items.aggregate(last=Max('order'))['last']
+    start = 0 if last is None else last + 1
+    Item.objects.bulk_create([
+        Item(**{container_field: container}, book_id=book_id, order=start + i)
+        for i, book_id in enumerate(new_ids)
+    ])
+    return len(new_ids)
+
+
+def _delete(container, book_ids):
+    """Remove the books; caller holds the lock. Returns how many"""
+    Item, items, _ = _items_of(container)
+    _, deleted = items.filter(book_id__in=book_ids).delete()
+    return deleted.get(Item._meta.label, 0)
+
+
+def add_books(container, book_ids):
+    """Append `book_ids` (the ones not there yet) to a shelf/collection; returns books added"""
+    with transaction.atomic():
+        _lock(container)
+        added = _insert(container, book_ids)
+        shift_item_counts(type(container), {container.pk: added})
+    return added
+
+
+def remove_books(container, book_ids):
+    """Remove `book_ids` from a shelf/collection; returns books removed"""
+    with transaction.atomic():
+        _lock(container)
+        removed = _delete(container, book_ids)
+        shift_item_counts(type(container), {container.pk: -removed})
+    return removed
+
+
+def move_books(source, target, book_ids):
+    """
+    Move the books of `book_ids` that are on `source` to the end of `target`,
+    two shelves or two collections (e.g. Want to Read -> Read). Books
+    already on `target` just leave `source`. Returns (removed, added).
+    """
+    if source.pk == target.pk:
+        return 0, 0
+    with transaction.atomic():
+        _lock(source, target)
+        _, items, _ = _items_of(source)
+        moving = list(items.filter(book_id__in=book_ids).order_by(
+            'order', '-added_at', 'pk'
+        ).values_list('book_id', flat=True))
+        removed = _delete(source, moving)
+        added = _insert(target, moving)
+        shift_item_counts(type(source), {source.pk: -removed, target.pk: added})
+    return removed, added
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shelves', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shelfitem',
+            index=models.Index(fields=['shelf', 'order', '-added_at', 'id'], name='shelves_she_shelf_i_c6e6a1_idx'),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
+from .items import shift_item_counts
+
 
 class Shelf(models.Model):
     """Shelf Model"""
@@ -61,22 +63,23 @@ class ShelfItem(models.Model):
         indexes = [
             models.Index(fields=['shelf', '-added_at']),
             models.Index(fields=['book', '-added_at']),
+            models.Index(fields=['shelf', 'order', '-added_at', 'id']),  # Keyset pages of a shelf
         ]
 
     def __str__(self):
         return f"{self.book.title} in {self.shelf.name}"
 
     def save(self, *args, **kwargs):
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        # Update shelf book count
-        self.shelf.book_count = self.shelf.items.count()
-        self.shelf.save(update_fields=['book_count'])
+        if adding:
+            # Update shelf book count (F() shift, see shelves.items)
+            shift_item_counts(Shelf, {self.shelf_id: 1})
 
     def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        # Update shelf book count
-        self.shelf.book_count = self.shelf.items.count()
-        self.shelf.save(update_fields=['book_count'])
+        result = super().delete(*args, **kwargs)
+        shift_item_counts(Shelf, {self.shelf_id: -1})
+        return result
 
 
 class ReadingProgress(models.Model):
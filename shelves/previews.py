@@ -0,0 +1,43 @@
+"""
+Cover previews of shelves and collections.
+
+List and detail payloads carry the stored book_count and the first
+SHELF_PREVIEW_SIZE items only; the full contents are paginated at
+/api/shelves/<pk>/items/ and /api/social/collections/<pk>/items/. The
+preview is one prefetch for a whole page of shelves: Django slices it per
+shelf with ROW_NUMBER() OVER (PARTITION BY shelf ORDER BY order, ...)
+instead of loading every item.
+"""
+from django.conf import settings
+from django.db.models import Prefetch
+
+PREVIEW_ATTR = 'preview_items'
+
+
+def item_model(model):
+    """ShelfItem for Shelf, CollectionItem for Collection (the `items` relation)"""
+    return model._meta.get_field('items').related_model
+
+
+def preview_items(model):
+    """First SHELF_PREVIEW_SIZE items of each shelf/collection, in shelf order"""
+    return item_model(model).objects.select_related('book').order_by(
+        'order', '-added_at', 'pk'
+    )[:settings.SHELF_PREVIEW_SIZE]
+
+
+def with_previews(queryset):
+    """Shelves/collections with their owner and `preview_items` loaded"""
+    return queryset.select_related('user__profile').prefetch_related(
+        Prefetch('items', queryset=preview_items(queryset.model), to_attr=PREVIEW_ATTR)
+    )
+
+
+def previews_of(obj):
+    """Preview of one shelf/collection; queried when it was not prefetched (e.g. after create)"""
+    items = getattr(obj, PREVIEW_ATTR, None)
+    if items is None:
+        items = list(obj.items.select_related('book').order_by(
+            'order', '-added_at', 'pk'
+        )[:settings.SHELF_PREVIEW_SIZE])
+    return items
@@ -1,7 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Shelf, ShelfItem, ReadingProgress
-from books.serializers import BookListSerializer
-from users.serializers import UserSerializer
+from .previews import previews_of
+from books.models import Book
+from books.serializers import BookCoverSerializer, BookListSerializer
+from users.serializers import UserCardSerializer
 
 
 class ShelfItemSerializer(serializers.ModelSerializer):
@@ -13,37 +16,55 @@ class ShelfItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'added_at']
 
 
+class ShelfItemPreviewSerializer(serializers.ModelSerializer):
+    book = BookCoverSerializer(read_only=True)
+
+    class Meta:
+        model = ShelfItem
+        fields = ['id', 'book', 'order', 'added_at']
+        read_only_fields = fields
+
+
 class ShelfSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    items = ShelfItemSerializer(many=True, read_only=True)
+    """Shelf with book_count and a cover preview; the items are at shelves:shelf_items"""
+    user = UserCardSerializer(read_only=True)
+    preview = serializers.SerializerMethodField()
     has_book = serializers.BooleanField(read_only=True, required=False)
-    book_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Shelf
         fields = ['id', 'user', 'name', 'system_type', 'description', 'visibility',
-                 'cover_image', 'book_count', 'items', 'created_at', 'updated_at', 'has_book']
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+                 'cover_image', 'book_count', 'preview', 'created_at', 'updated_at', 'has_book']
+        read_only_fields = ['id', 'user', 'book_count', 'created_at', 'updated_at']
 
         extra_kwargs = {
             'system_type': {'required': False, 'allow_null': True}
         }
     
-    def get_book_count(self, obj):
-        # Use annotated count if available, otherwise use model field or count items
-        if hasattr(obj, 'annotated_book_count'):
-            return obj.annotated_book_count
-        elif hasattr(obj, 'book_count') and obj.book_count is not None:
-            return obj.book_count
-        elif hasattr(obj, 'items'):
-            return obj.items.count()
-        return 0
+    def get_preview(self, obj):
+        return ShelfItemPreviewSerializer(previews_of(obj), many=True, context=self.context).data
 
     
 
 
+class BookIdsSerializer(serializers.Serializer):
+    """{"book_ids": [...]} of a batch add/remove; validated to the active books, in request order"""
+    book_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=settings.SHELF_BATCH_SIZE
+    )
+
+    def validate_book_ids(self, value):
+        active = set(Book.objects.filter(pk__in=value, is_active=True).values_list('pk', flat=True))
+        return [pk for pk in dict.fromkeys(value) if pk in active]
+
+
+class ShelfMoveSerializer(BookIdsSerializer):
+    """{"to": <shelf id>, "book_ids": [...]}"""
+    to = serializers.IntegerField(min_value=1)
+
+
 class ReadingProgressSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer(read_only=True)
     book = BookListSerializer(read_only=True)
 
     class Meta:
@@ -0,0 +1,118 @@
+"""
+Tests for shelves app
+"""
+from django.test import override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from books.models import Book
+from .models import Shelf, ShelfItem
+
+User = get_user_model()
+
+
+@override_settings(SHELF_PREVIEW_SIZE=2)
+class ShelfPreviewTest(APITestCase):
+    """Test shelf lists embed a bounded preview and the items endpoint pages through the rest"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='shelver', email='shelver@example.com',
+                                             password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        self.shelves = []
+        for name in ('Read', 'Favourites'):
+            shelf = Shelf.objects.create(user=self.user, name=name)
+            for i in range(5):
+                book = Book.objects.create(title=f'{name} {i}')
+                ShelfItem.objects.create(shelf=shelf, book=book, order=i)
+            self.shelves.append(shelf)
+    
+    def test_list_embeds_preview(self):
+        """Test each shelf carries book_count and its first SHELF_PREVIEW_SIZE books"""
+        response = self.client.get(reverse('shelves:shelf_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        shelves = {shelf['name']: shelf for shelf in response.data['results']}
+        self.assertNotIn('items', shelves['Read'])
+        self.assertEqual(shelves['Read']['book_count'], 5)
+        self.assertEqual([item['book']['title'] for item in shelves['Read']['preview']], ['Read 0', 'Read 1'])
+    
+    def test_items_keyset_pages(self):
+        """Test the items endpoint walks the whole shelf in order with cursors"""
+        url = reverse('shelves:shelf_items', kwargs={'pk': self.shelves[0].pk}) + '?page_size=2'
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [item['book']['title'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(titles, [f'Read {i}' for i in range(5)])
+    
+    def test_private_shelf_items_hidden(self):
+        """Test another user's private shelf is not readable"""
+        self.shelves[1].visibility = 'private'
+        self.shelves[1].save()
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('shelves:shelf_items', kwargs={'pk': self.shelves[1].pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ShelfBatchTest(APITestCase):
+    """Test book_count and item order under single and batch shelf operations"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='mover', email='mover@example.com',
+                                             password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        self.wtr = Shelf.objects.create(user=self.user, name='Want to Read', system_type='WTR')
+        self.read = Shelf.objects.create(user=self.user, name='Read', system_type='READ')
+        self.books = [Book.objects.create(title=f'Batch {i}') for i in range(6)]
+        self.ids = [book.pk for book in self.books]
+    
+    def items(self, shelf):
+        return list(shelf.items.order_by('order').values_list('book_id', 'order'))
+    
+    def test_batch_add_remove_and_move(self):
+        """Test a batch shifts book_count once and appends after MAX(order)"""
+        url = reverse('shelves:shelf_books', kwargs={'shelf_id': self.wtr.pk})
+        response = self.client.post(url, {'book_ids': self.ids[:5]}, format='json')
+        self.assertEqual(response.data, {'added': 5, 'book_count': 5})
+        # Already there: skipped
+        response = self.client.post(url, {'book_ids': self.ids[4:]}, format='json')
+        self.assertEqual(response.data, {'added': 1, 'book_count': 6})
+        response = self.client.delete(url, {'book_ids': self.ids[:1]}, format='json')
+        self.assertEqual(response.data, {'removed': 1, 'book_count': 5})
+        
+        self.client.post(reverse('shelves:shelf_item', kwargs={'shelf_id': self.read.pk, 'book_id': self.ids[1]}))
+        response = self.client.post(reverse('shelves:shelf_move', kwargs={'shelf_id': self.wtr.pk}),
+                                    {'to': self.read.pk, 'book_ids': self.ids[1:4]}, format='json')
+        self.assertEqual(response.data['moved'], 3)
+        self.assertEqual(response.data['added'], 2)  # Book 1 was on Read already
+        self.assertEqual(response.data['book_count'], {str(self.wtr.pk): 2, str(self.read.pk): 3})
+        self.assertEqual(self.items(self.read), [(self.ids[1], 0), (self.ids[2], 1), (self.ids[3], 2)])
+    
+    def test_single_add_after_removal_keeps_order_unique(self):
+        """Test order comes from MAX(order) + 1, not from the item count"""
+        for book_id in self.ids[:3]:
+            self.client.post(reverse('shelves:shelf_item', kwargs={'shelf_id': self.wtr.pk, 'book_id': book_id}))
+        self.client.delete(reverse('shelves:shelf_item', kwargs={'shelf_id': self.wtr.pk, 'book_id': self.ids[0]}))
+        self.client.post(reverse('shelves:shelf_item', kwargs={'shelf_id': self.wtr.pk, 'book_id': self.ids[3]}))
+        self.assertEqual([order for _, order in self.items(self.wtr)], [1, 2, 3])
+        self.wtr.refresh_from_db()
+        self.assertEqual(self.wtr.book_count, 3)
+        response = self.client.delete(
+            reverse('shelves:shelf_item', kwargs={'shelf_id': self.wtr.pk, 'book_id': self.ids[0]})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_invalid_batch(self):
+        """Test a batch needs a non-empty list of ids and an own target shelf"""
+        url = reverse('shelves:shelf_books', kwargs={'shelf_id': self.wtr.pk})
+        response = self.client.post(url, {'book_ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other = User.objects.create_user(username='notmine', email='notmine@example.com', password='TestPass123!')
+        foreign = Shelf.objects.create(user=other, name='Theirs')
+        response = self.client.post(reverse('shelves:shelf_move', kwargs={'shelf_id': self.wtr.pk}),
+                                    {'to': foreign.pk, 'book_ids': self.ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
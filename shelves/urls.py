@@ -1,8 +1,8 @@
 from django.urls import path
 from .views import (
-    ShelfListView, ShelfDetailView, shelf_item_view,
+    ShelfListView, ShelfDetailView, shelf_item_view, shelf_books_view, shelf_move_view,
     ReadingProgressListView, ReadingProgressDetailView,
-    UserShelvesView,
+    UserShelvesView, ShelfItemListView,
 )
 
 app_name = 'shelves'
@@ -11,7 +11,10 @@ urlpatterns = [
     # Shelves
     path('', ShelfListView.as_view(), name='shelf_list'),
     path('<int:pk>/', ShelfDetailView.as_view(), name='shelf_detail'),
+    path('<int:pk>/items/', ShelfItemListView.as_view(), name='shelf_items'),
+    path('<int:shelf_id>/books/', shelf_books_view, name='shelf_books'),
     path('<int:shelf_id>/books/<int:book_id>/', shelf_item_view, name='shelf_item'),
+    path('<int:shelf_id>/move/', shelf_move_view, name='shelf_move'),
     path('users/<int:user_id>/', UserShelvesView.as_view(), name='user_shelves'),
     
     # Reading Progress
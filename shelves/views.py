@@ -8,8 +8,13 @@ from django.db.models import Exists, OuterRef
 from rest_framework.permissions import IsAuthenticated
 
 from .models import Shelf, ShelfItem, ReadingProgress
-from .serializers import ShelfSerializer, ShelfItemSerializer, ReadingProgressSerializer
+from .serializers import (
+    ShelfSerializer, ShelfItemSerializer, ReadingProgressSerializer, BookIdsSerializer, ShelfMoveSerializer,
+)
+from .items import add_books, remove_books, move_books
+from .previews import with_previews
 from books.models import Book
+from bookreview.pagination import KeysetOnlyPagination
 
 User = get_user_model()
 
@@ -21,9 +26,9 @@ class ShelfListView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            queryset = Shelf.objects.filter(
+            queryset = with_previews(Shelf.objects.filter(
                 user=self.request.user
-            ).prefetch_related('items__book').order_by('-created_at')
+            )).order_by('-created_at')
 
             check_book_id = self.request.query_params.get('check_book_id')
             
@@ -37,9 +42,9 @@ class ShelfListView(generics.ListCreateAPIView):
 
             return queryset
 
-        return Shelf.objects.filter(
+        return with_previews(Shelf.objects.filter(
             visibility='public', is_active=True
-        ).prefetch_related('items__book').order_by('-created_at')
+        )).order_by('-created_at')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -53,10 +58,10 @@ class ShelfDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         user = self.request.user
         if self.request.method in ['GET']:
-            return Shelf.objects.filter(
+            return with_previews(Shelf.objects.filter(
                 Q(user=user) | Q(visibility='public', is_active=True)
-            ).prefetch_related('items__book')
-        return Shelf.objects.filter(user=user).prefetch_related('items__book')
+            ))
+        return Shelf.objects.filter(user=user)
 
 
 @api_view(['POST', 'DELETE'])
@@ -67,28 +72,79 @@ def shelf_item_view(request, shelf_id, book_id):
     book = get_object_or_404(Book, id=book_id, is_active=True)
     
     if request.method == 'POST':
-        item, created = ShelfItem.objects.get_or_create(
-            shelf=shelf,
-            book=book,
-            defaults={'order': shelf.items.count()}
-        )
-        if not created:
+        if not add_books(shelf, [book.id]):
             return Response({'message': 'Book already in shelf'}, status=status.HTTP_200_OK)
         return Response({'message': 'Book added to shelf'}, status=status.HTTP_201_CREATED)
     
     # DELETE
-    item = get_object_or_404(ShelfItem, shelf=shelf, book=book)
-    item.delete()
+    if not remove_books(shelf, [book.id]):
+        return Response({'error': 'Book not in shelf'}, status=status.HTTP_404_NOT_FOUND)
     return Response({'message': 'Book removed from shelf'}, status=status.HTTP_200_OK)
 
 
+@api_view(['POST', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def shelf_books_view(request, shelf_id):
+    """Add/Remove many books at once: {"book_ids": [...]}, book_count shifted once per batch"""
+    shelf = get_object_or_404(Shelf, id=shelf_id, user=request.user)
+    serializer = BookIdsSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    book_ids = serializer.validated_data['book_ids']
+
+    if request.method == 'POST':
+        result = {'added': add_books(shelf, book_ids)}
+    else:
+        result = {'removed': remove_books(shelf, book_ids)}
+    shelf.refresh_from_db(fields=['book_count'])
+    return Response({**result, 'book_count': shelf.book_count}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def shelf_move_view(request, shelf_id):
+    """Move books to another own shelf: {"to": <shelf id>, "book_ids": [...]} (e.g. WTR -> READ)"""
+    source = get_object_or_404(Shelf, id=shelf_id, user=request.user)
+    serializer = ShelfMoveSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    target = get_object_or_404(Shelf, id=serializer.validated_data['to'], user=request.user)
+
+    removed, added = move_books(source, target, serializer.validated_data['book_ids'])
+    counts = dict(Shelf.objects.filter(pk__in=[source.pk, target.pk]).values_list('pk', 'book_count'))
+    return Response({
+        'moved': removed,
+        'added': added,
+        'book_count': {str(source.pk): counts[source.pk], str(target.pk): counts[target.pk]},
+    }, status=status.HTTP_200_OK)
+
+
+class ShelfItemListView(generics.ListAPIView):
+    """
+    Books of one shelf (own or public), in shelf order
+    Keyset pages (?cursor=, ?page_size= up to 100): same cost on page 1 and page 150
+    """
+    serializer_class = ShelfItemSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetOnlyPagination
+
+    def get_queryset(self):
+        visible = Q(visibility='public', is_active=True)
+        if self.request.user.is_authenticated:
+            visible |= Q(user=self.request.user)
+        shelf = get_object_or_404(Shelf.objects.filter(visible), pk=self.kwargs['pk'])
+        return ShelfItem.objects.filter(shelf=shelf).select_related('book').prefetch_related(
+            'book__authors', 'book__genres'
+        ).order_by('order', '-added_at', 'pk')
+
+
 class ReadingProgressListView(generics.ListCreateAPIView):
     """Reading Progress List and Create"""
     serializer_class = ReadingProgressSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return ReadingProgress.objects.filter(user=self.request.user).select_related('book').order_by('-updated_at')
+        return ReadingProgress.objects.filter(user=self.request.user).select_related('book', 'user__profile').order_by('-updated_at')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -113,15 +169,7 @@ class UserShelvesView(generics.ListAPIView):
 
     def get_queryset(self):
         user_id = self.kwargs.get("user_id")
-        queryset = Shelf.objects.filter(
+        return with_previews(Shelf.objects.filter(
             user_id=user_id,
             is_active=True
-        ).prefetch_related('items__book').order_by("-created_at")
-        
-        # Annotate book_count if not already set
-        from django.db.models import Count
-        queryset = queryset.annotate(
-            annotated_book_count=Count('items')
-        )
-        
-        return queryset
+        )).order_by("-created_at")
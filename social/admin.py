@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Follow, Notification, Collection, CollectionItem
+from .models import Follow, Notification, NotificationArchive, Collection, CollectionItem
 
 
 @admin.register(Follow)
@@ -21,6 +21,14 @@ class NotificationAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ['user', 'notification_type', 'month', 'count']
+    list_filter = ['notification_type', 'month']
+    search_fields = ['user__username']
+    raw_id_fields = ['user']
+
+
 class CollectionItemInline(admin.TabularInline):
     model = CollectionItem
     extra = 1
@@ -0,0 +1,133 @@
+"""
+Like notifications, one per (recipient, liked object).
+
+A like or unlike does not touch the notification in the request: after
+commit it schedules `refresh_like_notification` (Celery, social.tasks)
+LIKE_NOTIFICATION_DEBOUNCE seconds later, at most one pending per liked
+object (its owner is the recipient), so a burst of likes on a popular
+review is folded with one UPDATE. The task rebuilds the payload from the
+Like rows: count of likers other than the owner, the newest
+LIKE_NOTIFICATION_ACTORS usernames in payload['actors'], the message
+("a, b và 12 người khác đã thích ..."). A like newer than the notification
+makes it unread and moves it back to the top; unlikes only lower the count,
+and the last one removes the notification. A partial unique constraint on
+Notification makes concurrent first likes converge on the same row
+(migration social.0005 folded the rows written before it).
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from bookreview import content_types
+from .models import Notification
+from .unread import shift_unread
+
+logger = logging.getLogger('bookreview')
+
+COALESCED_TYPES = ('review_like', 'comment_like')
+
+
+def like_message(notification_type, actors, count, book_title=''):
+    others = count - len(actors)
+    if not actors:
+        who = f'{count} người'
+    elif others > 0:
+        who = f'{", ".join(actors)} và {others} người khác'
+    else:
+        who = ', '.join(actors)
+    if notification_type == 'review_like':
+        return f'{who} đã thích review của bạn về "{book_title}".'
+    return f'{who} đã thích bình luận của bạn.'
+
+
+def _payload(notification_type, actors, count, book_title):
+    return {
+        'message': like_message(notification_type, actors, count, book_title),
+        'actors': actors,
+        'count': count,
+        'book_title': book_title,
+    }
+
+
+def _debounce_key(content_type_id, object_id):
+    return f'notifications:like-refresh:{content_type_id}:{object_id}'
+
+
+def schedule_like_notification(content_type_id, object_id):
+    """Refresh the like notification of a review/comment soon, once per burst of likes"""
+    from .tasks import refresh_like_notification
+
+    delay = settings.LIKE_NOTIFICATION_DEBOUNCE
+    if cache.add(_debounce_key(content_type_id, object_id), True, delay) is False:
+        return  # A refresh is already pending, it will see this like
+    try:
+        refresh_like_notification.apply_async((content_type_id, object_id), countdown=delay)
+    except Exception as e:
+        # A broker outage must not fail the like itself
+        cache.delete(_debounce_key(content_type_id, object_id))
+        logger.warning('Scheduling like notification of %s:%s failed: %s', content_type_id, object_id, e)
+
+
+def _liked_object(content_type_id, object_id):
+    """(recipient id, notification type, book title) of a liked review/comment, or None"""
+    from reviews.models import Review, Comment
+
+    if content_type_id == content_types.content_type_id('review'):
+        review = Review.objects.filter(pk=object_id).values('user_id', 'book__title').first()
+        return review and (review['user_id'], 'review_like', review['book__title'])
+    if content_type_id == content_types.content_type_id('comment'):
+        owner_id = Comment.objects.filter(pk=object_id).values_list('user_id', flat=True).first()
+        return owner_id and (owner_id, 'comment_like', '')
+    return None
+
+
+@transaction.atomic
+def fold_likes(content_type_id, object_id):
+    """Bring the owner's notification about a liked object in line with its Like rows"""
+    from reviews.models import Like
+
+    # Likes that land after this point schedule the next refresh
+    cache.delete(_debounce_key(content_type_id, object_id))
+    liked = _liked_object(content_type_id, object_id)
+    if not liked:
+        return None
+    recipient_id, notification_type, book_title = liked
+    likes = Like.objects.filter(
+        content_type_id=content_type_id, object_id=object_id
+    ).exclude(user_id=recipient_id)
+    latest = list(likes.order_by('-created_at', '-pk').values_list(
+        'user__username', 'created_at'
+    )[:settings.LIKE_NOTIFICATION_ACTORS])
+    lookup = {
+        'user_id': recipient_id, 'notification_type': notification_type,
+        'content_type_id': content_type_id, 'object_id': object_id,
+    }
+    notifications = Notification.objects.select_for_update().filter(**lookup)
+    if not latest:
+        # Everyone unliked
+        unread = notifications.filter(is_read=False).count()
+        notifications.delete()
+        if unread:
+            shift_unread({recipient_id: -unread})
+        return None
+
+    actors = [username for username, _ in latest]
+    payload = _payload(notification_type, actors, likes.count(), book_title)
+    notification, created = notifications.get_or_create(**lookup, defaults={'payload': payload})
+    if created:
+        return notification  # social.signals counts it as unread
+
+    notification.payload = payload
+    update_fields = ['payload']
+    if latest[0][1] > notification.created_at:  # Liked since it was last shown
+        was_read = notification.is_read
+        notification.is_read = False
+        notification.created_at = timezone.now()
+        update_fields += ['is_read', 'created_at']
+        if was_read:
+            shift_unread({recipient_id: 1})
+    notification.save(update_fields=update_fields)
+    return notification
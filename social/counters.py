@@ -0,0 +1,43 @@
+"""
+Denormalized Profile.follower_count / following_count.
+
+social.signals shifts the counters with F() updates on Follow create/delete.
+`recompute_follow_counts` rewrites the profiles whose counters drifted
+(follows written with bulk_create/queryset.delete, profiles created after
+their user's first follows).
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def shift_follow_counts(Profile, user_id, field, delta):
+    Profile.objects.filter(user_id=user_id).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def _count(follows, group_by):
+    counts = follows.order_by().values(group_by).annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def recompute_follow_counts(Profile, Follow):
+    """Fix every profile whose counters disagree with the follows table; returns rows fixed"""
+    User = Profile._meta.get_field('user').related_model
+    ContentType = Follow._meta.get_field('content_type').related_model
+    # Integer compare on Follow.content_type_id instead of a join per profile
+    user_ct = ContentType.objects.filter(
+        app_label=User._meta.app_label, model=User._meta.model_name
+    ).values('pk')[:1]
+    followers = _count(Follow.objects.filter(
+        content_type_id=Subquery(user_ct),
+        object_id=OuterRef('user_id'),
+    ), 'object_id')
+    following = _count(Follow.objects.filter(follower=OuterRef('user_id')), 'follower')
+
+    drifted = Profile.objects.alias(
+        actual_followers=followers, actual_following=following
+    ).filter(
+        ~Q(follower_count=F('actual_followers')) | ~Q(following_count=F('actual_following'))
+    )
+    return Profile.objects.filter(pk__in=drifted.values('pk')).update(
+        follower_count=followers, following_count=following
+    )
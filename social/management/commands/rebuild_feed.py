@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from social.models import Follow
+from social.timeline import rebuild_timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute users' home timelines from their follows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*')
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild the timeline of every user who follows something')
+        parser.add_argument('--size', type=int, default=None,
+                            help='Number of most recent reviews to keep (default FEED_TIMELINE_SIZE)')
+
+    def handle(self, *args, usernames, size, **options):
+        if options['all']:
+            users = User.objects.filter(
+                pk__in=Follow.objects.values('follower_id')
+            ).order_by('pk').only('pk', 'username')
+            total = 0
+            for user in users.iterator():
+                rebuild_timeline(user.pk, size=size)
+                total += 1
+            self.stdout.write(self.style.SUCCESS(f'{total} timelines rebuilt'))
+            return
+        if not usernames:
+            raise CommandError('Give usernames or --all')
+
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        missing = [username for username in usernames if username not in users]
+        if missing:
+            raise CommandError(f'Unknown user(s): {", ".join(missing)}')
+        for username in usernames:
+            entries = rebuild_timeline(users[username].pk, size=size)
+            self.stdout.write(f'{username}: {entries} feed entries')
+        self.stdout.write(self.style.SUCCESS('Timelines rebuilt'))
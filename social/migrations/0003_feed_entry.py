@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('social', '0002_alter_notification_notification_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='reviews.review')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'feed entry',
+                'verbose_name_plural': 'feed entries',
+                'ordering': ['-created_at', '-review'],
+                'indexes': [models.Index(fields=['user', '-created_at', '-review'], name='social_feed_user_id_242c4e_idx')],
+                'unique_together': {('user', 'review')},
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('social', '0003_feed_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('follow', 'New Follower'), ('review_like', 'Review Liked'), ('review_comment', 'Review Commented'), ('review_mention', 'Mentioned in Review'), ('comment_reply', 'Comment Replied'), ('comment_like', 'Comment Liked'), ('new_review', 'New Review from Following'), ('collection_item', 'Added to Collection'), ('rank_upgrade', 'Rank Upgraded'), ('system', 'System Message')], max_length=50, verbose_name='type')),
+                ('month', models.DateField(verbose_name='month')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='count')),
+            ],
+            options={
+                'verbose_name': 'notification archive',
+                'verbose_name_plural': 'notification archive',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at'], name='social_noti_created_1bac91_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_archive', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='notificationarchive',
+            unique_together={('user', 'notification_type', 'month')},
+        ),
+        # Retention deletes a little every hour: vacuum sooner so the visibility
+        # map stays current and (user, is_read, -created_at) scans stay index-only
+        migrations.RunSQL(
+            'ALTER TABLE social_notification SET '
+            '(autovacuum_vacuum_scale_factor = 0.02, autovacuum_analyze_scale_factor = 0.02)',
+            'ALTER TABLE social_notification RESET '
+            '(autovacuum_vacuum_scale_factor, autovacuum_analyze_scale_factor)',
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:58
+
+from django.db import migrations, models
+from django.db.models import Count
+
+COALESCED_TYPES = ('review_like', 'comment_like')
+
+
+def merge_like_notifications(apps, schema_editor):
+    """
+    Fold the one-row-per-like notifications into the newest of each group.
+    Redis unread counters are left alone: they expire within the hour and
+    are recounted from the table.
+    """
+    Notification = apps.get_model('social', 'Notification')
+    Review = apps.get_model('reviews', 'Review')
+    groups = Notification.objects.filter(
+        notification_type__in=COALESCED_TYPES, object_id__isnull=False
+    ).values('user_id', 'notification_type', 'content_type_id', 'object_id').annotate(
+        rows=Count('*')
+    ).filter(rows__gt=1).order_by()
+
+    for group in groups.iterator():
+        del group['rows']
+        rows = list(Notification.objects.filter(**group).order_by('-pk'))
+        newest, merged = rows[0], rows[1:]
+        count = sum(row.payload.get('count', 1) if isinstance(row.payload, dict) else 1 for row in rows)
+        if group['notification_type'] == 'review_like':
+            book_title = Review.objects.filter(pk=group['object_id']).values_list(
+                'book__title', flat=True
+            ).first() or ''
+            message = f'{count} người đã thích review của bạn về "{book_title}".'
+        else:
+            book_title = ''
+            message = f'{count} người đã thích bình luận của bạn.'
+        newest.payload = {'message': message, 'actors': [], 'count': count, 'book_title': book_title}
+        newest.is_read = all(row.is_read for row in rows)
+        newest.save(update_fields=['payload', 'is_read'])
+        Notification.objects.filter(pk__in=[row.pk for row in merged]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_search_vector'),
+        ('social', '0004_notification_retention'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_like_notifications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('notification_type__in', ['review_like', 'comment_like'])), fields=('user', 'notification_type', 'content_type', 'object_id'), name='social_notification_one_per_liked_object'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0005_coalesce_like_notifications'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='collectionitem',
+            index=models.Index(fields=['collection', 'order', '-added_at', 'id'], name='social_coll_collect_639953_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Q
+
+BATCH_SIZE = 1000
+
+
+def backfill_feed_entries(apps, schema_editor):
+    """Timeline of every user who follows something, like social.timeline.rebuild_timeline"""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Follow = apps.get_model('social', 'Follow')
+    FeedEntry = apps.get_model('social', 'FeedEntry')
+    Review = apps.get_model('reviews', 'Review')
+    Profile = apps.get_model('users', 'Profile')
+
+    content_type_ids = dict(ContentType.objects.filter(
+        Q(app_label='users', model='user') | Q(app_label='books', model__in=['book', 'author'])
+    ).values_list('model', 'pk'))
+    if len(content_type_ids) < 3:
+        return  # New database: no follows yet
+    user_ct, book_ct, author_ct = (content_type_ids[model] for model in ('user', 'book', 'author'))
+    # Celebrities are pulled at read time, not stored
+    celebrities = Profile.objects.filter(
+        follower_count__gte=settings.FEED_CELEBRITY_FOLLOWERS
+    ).values('user_id')
+    visible = Review.objects.filter(status='public', is_active=True)
+
+    follower_ids = Follow.objects.order_by('follower_id').values_list('follower_id', flat=True).distinct()
+    for follower_id in follower_ids.iterator(chunk_size=BATCH_SIZE):
+        follows = Follow.objects.filter(follower_id=follower_id)
+        reviews = visible.filter(
+            Q(user_id__in=follows.filter(content_type_id=user_ct).exclude(
+                object_id__in=celebrities
+            ).values('object_id'))
+            | Q(book_id__in=follows.filter(content_type_id=book_ct).values('object_id'))
+            | Q(book__authors__in=follows.filter(content_type_id=author_ct).values('object_id'))
+        ).values_list('pk', 'created_at').distinct().order_by('-created_at', '-pk')[:settings.FEED_TIMELINE_SIZE]
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=follower_id, review_id=review_id, created_at=created_at)
+            for review_id, created_at in reviews
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('users', '0004_follow_counts'),
+        ('books', '0009_book_count'),
+        ('reviews', '0003_search_vector'),
+        ('social', '0006_collectionitem_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_feed_entries, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,8 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.core.exceptions import ValidationError
 import json
 
+from shelves.items import shift_item_counts
+
 
 class Follow(models.Model):
     """Follow Model - Generic Foreign Key for following users/authors/books"""
@@ -54,7 +56,18 @@ class Notification(models.Model):
         ('rank_upgrade', _('Rank Upgraded')),
         ('system', _('System Message')),
     ]
-    
+
+    # Profile flag a recipient must keep enabled to receive each type
+    PREFERENCE_FIELDS = {
+        'follow': 'notify_follow',
+        'new_review': 'notify_follow',
+        'review_like': 'notify_review_like',
+        'comment_like': 'notify_review_like',
+        'review_comment': 'notify_comment',
+        'comment_reply': 'notify_comment',
+        'review_mention': 'notify_mention',
+    }
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
                             related_name='notifications')
     notification_type = models.CharField(_('type'), max_length=50, choices=TYPE_CHOICES)
@@ -77,6 +90,15 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['user', 'is_read', '-created_at']),
             models.Index(fields=['notification_type', '-created_at']),
+            models.Index(fields=['created_at']),  # Retention scans (social.retention)
+        ]
+        constraints = [
+            # Likes are folded into one notification per liked object (social.coalesce)
+            models.UniqueConstraint(
+                fields=['user', 'notification_type', 'content_type', 'object_id'],
+                condition=models.Q(notification_type__in=['review_like', 'comment_like']),
+                name='social_notification_one_per_liked_object',
+            ),
         ]
 
     def __str__(self):
@@ -87,6 +109,45 @@ class Notification(models.Model):
         self.save(update_fields=['is_read'])
 
 
+class NotificationArchive(models.Model):
+    """Monthly count of a user's purged notifications of one type (see social.retention)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='notification_archive')
+    notification_type = models.CharField(_('type'), max_length=50, choices=Notification.TYPE_CHOICES)
+    month = models.DateField(_('month'))  # First day of the month
+    count = models.PositiveIntegerField(_('count'), default=0)
+
+    class Meta:
+        verbose_name = _('notification archive')
+        verbose_name_plural = _('notification archive')
+        unique_together = ['user', 'notification_type', 'month']
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"{self.user_id} - {self.notification_type} {self.month:%Y-%m}: {self.count}"
+
+
+class FeedEntry(models.Model):
+    """A review pushed into a follower's home timeline (see social.timeline)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    review = models.ForeignKey('reviews.Review', on_delete=models.CASCADE, related_name='feed_entries')
+    # Copy of review.created_at: the timeline is read from the index alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = _('feed entry')
+        verbose_name_plural = _('feed entries')
+        unique_together = ['user', 'review']
+        ordering = ['-created_at', '-review']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-review']),
+        ]
+
+    def __str__(self):
+        return f"Review #{self.review_id} in {self.user_id}'s feed"
+
+
 class Collection(models.Model):
     """Collection Model"""
     VISIBILITY_CHOICES = [
@@ -143,19 +204,20 @@ class CollectionItem(models.Model):
         indexes = [
             models.Index(fields=['collection', '-added_at']),
             models.Index(fields=['book', '-added_at']),
+            models.Index(fields=['collection', 'order', '-added_at', 'id']),  # Keyset pages of a collection
         ]
 
     def __str__(self):
         return f"{self.book.title} in {self.collection.name}"
 
     def save(self, *args, **kwargs):
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        # Update collection book count
-        self.collection.book_count = self.collection.items.count()
-        self.collection.save(update_fields=['book_count'])
+        if adding:
+            # Update collection book count (F() shift, see shelves.items)
+            shift_item_counts(Collection, {self.collection_id: 1})
 
     def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        # Update collection book count
-        self.collection.book_count = self.collection.items.count()
-        self.collection.save(update_fields=['book_count'])
+        result = super().delete(*args, **kwargs)
+        shift_item_counts(Collection, {self.collection_id: -1})
+        return result
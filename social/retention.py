@@ -0,0 +1,83 @@
+"""
+Notification retention.
+
+`purge_notifications` ages out read notifications after
+NOTIFICATION_READ_RETENTION_DAYS and unread ones after
+NOTIFICATION_UNREAD_RETENTION_DAYS. Rows go NOTIFICATION_PURGE_BATCH_SIZE at
+a time, oldest first, each batch in its own short transaction with
+FOR UPDATE SKIP LOCKED (a user marking a notification read never waits on
+it), and with a pause between batches so WAL shipping and autovacuum keep
+up. A run stops after NOTIFICATION_PURGE_MAX_SECONDS; the next one carries
+on where it left off.
+
+Purged rows are folded into NotificationArchive, one counter per
+(user, type, month), in the same transaction as the delete. Likes need no
+pass of their own: they are folded into one notification when written
+(social.coalesce).
+"""
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Notification, NotificationArchive
+from .unread import shift_unread
+
+ARCHIVE_SQL = """
+    INSERT INTO {archive} (user_id, notification_type, month, count)
+    SELECT user_id, notification_type, date_trunc('month', created_at)::date, COUNT(*)
+    FROM {table} WHERE id = ANY(%s)
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, notification_type, month)
+    DO UPDATE SET count = {archive}.count + EXCLUDED.count
+"""
+
+
+def expired_notifications(now=None):
+    now = now or timezone.now()
+    read_cutoff = now - timedelta(days=settings.NOTIFICATION_READ_RETENTION_DAYS)
+    unread_cutoff = now - timedelta(days=settings.NOTIFICATION_UNREAD_RETENTION_DAYS)
+    return Notification.objects.filter(
+        Q(is_read=True, created_at__lt=read_cutoff) | Q(created_at__lt=unread_cutoff)
+    )
+
+
+@transaction.atomic
+def _purge_batch(expired, batch_size):
+    rows = list(expired.order_by('created_at').select_for_update(skip_locked=True).values_list(
+        'pk', 'user_id', 'is_read'
+    )[:batch_size])
+    if not rows:
+        return 0
+    ids = [pk for pk, _, _ in rows]
+    with connection.cursor() as cursor:
+        cursor.execute(ARCHIVE_SQL.format(
+            archive=NotificationArchive._meta.db_table, table=Notification._meta.db_table
+        ), [ids])
+    Notification.objects.filter(pk__in=ids).delete()
+
+    unread = Counter(user_id for _, user_id, is_read in rows if not is_read)
+    shift_unread({user_id: -count for user_id, count in unread.items()})
+    return len(rows)
+
+
+def purge_notifications(now=None, batch_size=None, pause=None, max_seconds=None):
+    """Delete and archive expired notifications in bounded batches; returns rows deleted"""
+    batch_size = batch_size or settings.NOTIFICATION_PURGE_BATCH_SIZE
+    pause = settings.NOTIFICATION_PURGE_PAUSE if pause is None else pause
+    max_seconds = max_seconds or settings.NOTIFICATION_PURGE_MAX_SECONDS
+
+    expired = expired_notifications(now)
+    deadline = time.monotonic() + max_seconds
+    deleted = 0
+    while True:
+        purged = _purge_batch(expired, batch_size)
+        deleted += purged
+        if purged < batch_size or time.monotonic() >= deadline:
+            return deleted
+        time.sleep(pause)
+
@@ -1,11 +1,29 @@
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
 from .models import Follow, Notification, Collection, CollectionItem
-from books.serializers import BookListSerializer
-from users.serializers import UserSerializer
+from bookreview import content_types
+from bookreview.gfk import prefetch_generic, targets_of
+from books.models import Book
+from books.serializers import BookCoverSerializer, BookListSerializer
+from shelves.previews import previews_of
+from users.models import User
+from users.serializers import UserCardSerializer
+
+
+class FollowListSerializer(serializers.ListSerializer):
+    """many=True mode: load every follow target of the page by content type up front"""
+
+    def to_representation(self, data):
+        follows = data.all() if isinstance(data, BaseManager) else data
+        follows = prefetch_generic(follows, 'target', {
+            User: User.objects.select_related('profile'),
+            Book: Book.objects.prefetch_related('authors', 'genres'),
+        })
+        return super().to_representation(follows)
 
 
 class FollowSerializer(serializers.ModelSerializer):
-    follower = UserSerializer(read_only=True)
+    follower = UserCardSerializer(read_only=True)
     target = serializers.SerializerMethodField()
     target_type = serializers.CharField(write_only=True, required=False)
     target_id = serializers.IntegerField(write_only=True, required=False, source='object_id')
@@ -14,6 +32,7 @@ class FollowSerializer(serializers.ModelSerializer):
         model = Follow
         fields = ['id', 'follower', 'target_type', 'target_id', 'target', 'created_at']
         read_only_fields = ['id', 'follower', 'target', 'created_at']
+        list_serializer_class = FollowListSerializer
 
     def get_target(self, obj):
         """Serialize the target object based on content type"""
@@ -22,42 +41,70 @@ class FollowSerializer(serializers.ModelSerializer):
             return None
         
         # Serialize based on content type model
-        if obj.content_type.model == 'user':
-            return UserSerializer(target).data
-        elif obj.content_type.model == 'author':
+        target_type = content_types.name_of(obj.content_type_id)
+        if target_type == 'user':
+            return UserCardSerializer(target).data
+        elif target_type == 'author':
             from books.serializers import AuthorSerializer
             return AuthorSerializer(target).data
-        elif obj.content_type.model == 'book':
+        elif target_type == 'book':
             return BookListSerializer(target).data
         return None
 
     def create(self, validated_data):
         """Create a Follow instance from target_type and target_id"""
-        from django.contrib.contenttypes.models import ContentType
-        
         target_type = validated_data.pop('target_type', None)
         object_id = validated_data.pop('object_id', None)
         
         if target_type and object_id:
             # Get ContentType from model name
-            try:
-                content_type = ContentType.objects.get(model=target_type)
-                validated_data['content_type'] = content_type
-                validated_data['object_id'] = object_id
-            except ContentType.DoesNotExist:
+            if target_type not in content_types.FOLLOW_TARGETS:
                 raise serializers.ValidationError(
                     {'target_type': f'Invalid target type: {target_type}'}
                 )
+            validated_data['content_type_id'] = content_types.content_type_id(target_type)
+            validated_data['object_id'] = object_id
         
         return super().create(validated_data)
     
     def to_representation(self, instance):
         """Add target_type to representation"""
         ret = super().to_representation(instance)
-        ret['target_type'] = instance.content_type.model if instance.content_type else None
+        ret['target_type'] = content_types.name_of(instance.content_type_id)
         return ret
 
 
+class NotificationListSerializer(serializers.ListSerializer):
+    """many=True mode: resolve is_liked of every review/comment on the page up front"""
+
+    def to_representation(self, data):
+        from reviews.likes import like_resolver
+        from reviews.models import Review, Comment
+        from reviews.threads import attach_replies, visible_comments, walk
+
+        notifications = data.all() if isinstance(data, BaseManager) else data
+        notifications = prefetch_generic(notifications, 'content_object', {
+            Review: Review.objects.select_related('book', 'user__profile').prefetch_related(
+                'book__authors', 'book__genres'
+            ),
+            User: User.objects.all(),
+            Comment: visible_comments(),
+        })
+
+        # Reply đầu tiên của comment (như CommentSerializer.get_replies), cả trang 1 query
+        comments = targets_of(notifications, 'content_object', Comment)
+        attach_replies([comment for comment in comments if not comment.is_reply()], 1)
+        for comment in comments:
+            if comment.is_reply():
+                comment.thread_replies = []
+
+        resolver = like_resolver(self.context)
+        resolver.prime(Review, [target.pk for target in targets_of(notifications, 'content_object', Review)])
+        # Replies vừa gắn cũng cần is_liked
+        resolver.prime(Comment, [comment.pk for comment in walk(comments)])
+        return super().to_representation(notifications)
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     content_object = serializers.SerializerMethodField()
     message = serializers.SerializerMethodField()
@@ -68,6 +115,7 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = ['id', 'notification_type', 'message', 'content_object',
                   'payload', 'url', 'is_read', 'created_at']
         read_only_fields = ['id', 'created_at']
+        list_serializer_class = NotificationListSerializer
 
     def get_message(self, obj):
         if isinstance(obj.payload, dict):
@@ -77,10 +125,11 @@ class NotificationSerializer(serializers.ModelSerializer):
     def get_content_object(self, obj):
         if obj.content_object:
             # Serialize based on content type
-            if obj.content_type.model == 'review':
+            model_name = content_types.name_of(obj.content_type_id)
+            if model_name == 'review':
                 from reviews.serializers import ReviewListSerializer
                 return ReviewListSerializer(obj.content_object, context=self.context).data
-            elif obj.content_type.model == 'comment':
+            elif model_name == 'comment':
                 from reviews.serializers import CommentSerializer
                 return CommentSerializer(obj.content_object, context=self.context).data
         return None
@@ -97,11 +146,10 @@ class NotificationSerializer(serializers.ModelSerializer):
         if isinstance(obj.payload, dict) and obj.payload.get('url'):
             return obj.payload['url']
 
-        if not obj.content_type:
+        model_name = content_types.name_of(obj.content_type_id)
+        if not model_name:
             return None
 
-        model_name = obj.content_type.model
-
         try:
             # 1) Thông báo liên quan tới REVIEW (new_review, review_like, v.v.)
             if model_name == 'review':
@@ -140,12 +188,25 @@ class CollectionItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'added_at']
 
 
+class CollectionItemPreviewSerializer(serializers.ModelSerializer):
+    book = BookCoverSerializer(read_only=True)
+
+    class Meta:
+        model = CollectionItem
+        fields = ['id', 'book', 'order', 'added_at']
+        read_only_fields = fields
+
+
 class CollectionSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    items = CollectionItemSerializer(many=True, read_only=True)
+    """Collection with book_count and a cover preview; the items are at social:collection_items"""
+    user = UserCardSerializer(read_only=True)
+    preview = serializers.SerializerMethodField()
 
     class Meta:
         model = Collection
         fields = ['id', 'user', 'name', 'slug', 'description', 'cover_image',
-                 'visibility', 'book_count', 'items', 'created_at', 'updated_at']
+                 'visibility', 'book_count', 'preview', 'created_at', 'updated_at']
         read_only_fields = ['id', 'user', 'slug', 'book_count', 'created_at', 'updated_at']
+
+    def get_preview(self, obj):
+        return CollectionItemPreviewSerializer(previews_of(obj), many=True, context=self.context).data
@@ -0,0 +1,55 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from bookreview import content_types
+from users.models import Profile
+from . import timeline
+from .counters import shift_follow_counts
+from .models import Follow, Notification
+from .unread import shift_unread
+
+
+# =========================
+# FOLLOW: follower_count / following_count của Profile
+# =========================
+
+def _shift(follow: Follow, delta):
+    shift_follow_counts(Profile, follow.follower_id, 'following_count', delta)
+    if follow.content_type_id == content_types.content_type_id('user'):
+        shift_follow_counts(Profile, follow.object_id, 'follower_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance: Follow, created, raw=False, **kwargs):
+    if created and not raw:
+        _shift(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(sender, instance: Follow, **kwargs):
+    _shift(instance, -1)
+
+
+# =========================
+# FOLLOW: home timeline
+# =========================
+
+@receiver(post_save, sender=Follow)
+def follow_timeline(sender, instance: Follow, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.add_followed_target(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_timeline(sender, instance: Follow, **kwargs):
+    timeline.remove_followed_target(instance)
+
+
+# =========================
+# NOTIFICATION: unread counter
+# =========================
+
+@receiver(post_save, sender=Notification)
+def count_unread(sender, instance: Notification, created, raw=False, **kwargs):
+    if created and not raw and not instance.is_read:
+        shift_unread({instance.user_id: 1})
@@ -0,0 +1,87 @@
+"""
+Server-Sent Events push of the unread notification count.
+
+GET /api/social/notifications/stream/ sends `event: unread` with
+{"count": n} on connect and again whenever social.unread publishes a
+change, instead of the page polling unread-count/. The view is async: under
+ASGI (bookreview/asgi.py) a waiting connection holds no worker thread, only
+a Redis pub/sub subscription. Streams end after STREAM_SECONDS and the
+browser's EventSource reconnects by itself.
+
+Under WSGI, or without Redis, the count is sent once with a long `retry:`
+so EventSource falls back to polling at that interval.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from redis.exceptions import RedisError
+
+from bookreview.redis_utils import get_async_redis
+from . import unread
+
+logger = logging.getLogger('bookreview')
+
+STREAM_SECONDS = 5 * 60
+HEARTBEAT_SECONDS = 25  # Comment line keeping proxies from closing an idle stream
+RECONNECT_MS = 3 * 1000
+POLL_MS = 30 * 1000
+
+
+def _event(count, retry=None):
+    retry = f'retry: {retry}\n' if retry else ''
+    return f'{retry}event: unread\ndata: {json.dumps({"count": count})}\n\n'
+
+
+def _authenticated_user_id(request):
+    return request.user.pk if request.user.is_authenticated else None
+
+
+async def _push_events(client, user_id):
+    pubsub = client.pubsub()
+    try:
+        # Subscribe before reading the count so no change falls in between
+        await pubsub.subscribe(unread.channel(user_id))
+        yield _event(await sync_to_async(unread.unread_count)(user_id), retry=RECONNECT_MS)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_SECONDS
+        last_sent = loop.time()
+        while loop.time() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_SECONDS)
+            if message is None:  # Timeout, or a (un)subscribe confirmation
+                if loop.time() - last_sent >= HEARTBEAT_SECONDS:
+                    last_sent = loop.time()
+                    yield ': keepalive\n\n'
+                continue
+            last_sent = loop.time()
+            data = message['data']
+            count = int(data) if data else await sync_to_async(unread.unread_count)(user_id)
+            yield _event(count)
+    except RedisError as exc:
+        logger.warning('Notification stream of user %s stopped: %s', user_id, exc)
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+def _stream(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: flush every event
+    return response
+
+
+async def notification_stream(request):
+    user_id = await sync_to_async(_authenticated_user_id)(request)
+    if user_id is None:
+        return HttpResponse(status=401)
+
+    client = get_async_redis() if isinstance(request, ASGIRequest) else None
+    if client is None:
+        count = await sync_to_async(unread.unread_count)(user_id)
+        return _stream([_event(count, retry=POLL_MS)])
+    return _stream(_push_events(client, user_id))
@@ -0,0 +1,125 @@
+import logging
+
+from celery import shared_task
+from django.db import DatabaseError
+
+from bookreview import content_types
+from .models import Follow, Notification
+from .unread import shift_unread
+
+logger = logging.getLogger('bookreview')
+
+FAN_OUT_BATCH_SIZE = 1000
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=30)
+def fan_out_new_review_notifications(self, review_id, batch_size=FAN_OUT_BATCH_SIZE):
+    """
+    Send new_review notifications to everyone following the review author.
+
+    Follower ids are streamed from the DB in batches and each batch is
+    written with one bulk_create. Followers that already got the
+    notification are skipped, so a retried task never duplicates rows.
+    """
+    from reviews.models import Review
+
+    review = Review.objects.select_related('user', 'book').filter(
+        pk=review_id, status='public', is_active=True
+    ).first()
+    if review is None:
+        return 'Review not found or not public'
+
+    user_ct = content_types.content_type_id('user')
+    review_ct = content_types.content_type_id('review')
+    preference = Notification.PREFERENCE_FIELDS['new_review']
+
+    follower_ids = Follow.objects.filter(
+        content_type_id=user_ct,
+        object_id=review.user_id,
+    ).exclude(
+        follower_id=review.user_id
+    ).exclude(
+        # Users without a profile keep the default (notify)
+        **{f'follower__profile__{preference}': False}
+    ).order_by('follower_id').values_list('follower_id', flat=True)
+
+    message = f'{review.user.username} đã viết review mới về "{review.book.title}".'
+    created = 0
+    try:
+        for batch in _chunked(follower_ids.iterator(chunk_size=batch_size), batch_size):
+            already_notified = set(Notification.objects.filter(
+                notification_type='new_review',
+                content_type_id=review_ct,
+                object_id=review.pk,
+                user_id__in=batch,
+            ).values_list('user_id', flat=True))
+
+            notifications = [
+                Notification(
+                    user_id=follower_id,
+                    notification_type='new_review',
+                    content_type_id=review_ct,
+                    object_id=review.pk,
+                    payload={'message': message},
+                )
+                for follower_id in batch
+                if follower_id not in already_notified
+            ]
+            Notification.objects.bulk_create(notifications, batch_size=batch_size)
+            # bulk_create sends no post_save: shift the unread counters here
+            shift_unread({notification.user_id: 1 for notification in notifications})
+            created += len(notifications)
+    except DatabaseError as exc:
+        logger.warning('new_review fan-out for review %s failed: %s', review_id, exc)
+        raise self.retry(exc=exc)
+
+    return f'Created {created} new_review notifications for review {review_id}'
+
+
+@shared_task
+def reconcile_follow_counts():
+    """Fix Profile follower/following counters that drifted from Follow - Run daily"""
+    from users.models import Profile
+    from .counters import recompute_follow_counts
+
+    fixed = recompute_follow_counts(Profile, Follow)
+    if fixed:
+        logger.info('Reconciled follow counters of %s profiles', fixed)
+    return f'Reconciled follow counters of {fixed} profiles'
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=30)
+def fan_out_review_to_feeds(self, review_id):
+    """Push a new review into the home timelines of its followers (social.timeline)"""
+    from .timeline import fan_out_review
+
+    try:
+        reached = fan_out_review(review_id)
+    except DatabaseError as exc:
+        logger.warning('Feed fan-out for review %s failed: %s', review_id, exc)
+        raise self.retry(exc=exc)
+    return f'Pushed review {review_id} into {reached} feeds'
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=30)
+def refresh_like_notification(self, content_type_id, object_id):
+    """Fold the likes of a review/comment into its owner's notification (social.coalesce)"""
+    from .coalesce import fold_likes
+
+    try:
+        fold_likes(content_type_id, object_id)
+    except DatabaseError as exc:
+        logger.warning('Like notification of %s:%s failed: %s', content_type_id, object_id, exc)
+        raise self.retry(exc=exc)
+    return f'Refreshed like notification of {content_type_id}:{object_id}'
@@ -0,0 +1,386 @@
+"""
+Tests for social app
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.contrib.contenttypes.models import ContentType
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from books.models import Book, Author
+from reviews.models import Review, Comment
+from users.models import Profile
+from .models import Follow, FeedEntry, Notification, NotificationArchive
+from .tasks import fan_out_new_review_notifications, fan_out_review_to_feeds
+
+User = get_user_model()
+
+
+class FeedTimelineTest(APITestCase):
+    """Test the fan-out-on-write home feed"""
+    
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='TestPass123!')
+        self.writer = User.objects.create_user(username='writer', email='writer@example.com', password='TestPass123!')
+        self.stranger = User.objects.create_user(username='stranger', email='stranger@example.com', password='TestPass123!')
+        for user in (self.reader, self.writer, self.stranger):
+            Profile.objects.create(user=user)
+        self.author = Author.objects.create(name='Feed Author')
+        self.books = []
+        for i in range(6):
+            book = Book.objects.create(title=f'Feed Book {i}')
+            book.authors.add(self.author)
+            self.books.append(book)
+        self.user_ct = ContentType.objects.get_for_model(User)
+        self.client.force_authenticate(self.reader)
+    
+    def follow(self, user, target):
+        return Follow.objects.create(
+            follower=user, content_type=ContentType.objects.get_for_model(target), object_id=target.pk
+        )
+    
+    def review(self, book, user=None):
+        review = Review.objects.create(
+            book=book, user=user or self.writer, title=f'On {book.title}', body_md='Body ' * 30, status='public'
+        )
+        fan_out_review_to_feeds(review.pk)
+        return review
+    
+    def feed_ids(self, params=None):
+        response = self.client.get(reverse('social:feed'), params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['id'] for row in response.data['results']]
+    
+    def test_fan_out_reaches_followers_once(self):
+        """Test a review reaches followers of its author, book and authors once"""
+        self.follow(self.reader, self.writer)
+        self.follow(self.reader, self.books[0])
+        self.follow(self.reader, self.author)
+        book_fan = User.objects.create_user(username='bookfan', email='bookfan@example.com', password='TestPass123!')
+        self.follow(book_fan, self.books[0])
+        
+        review = self.review(self.books[0])
+        fan_out_review_to_feeds(review.pk)  # retried task: no duplicates
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 1)
+        self.assertTrue(FeedEntry.objects.filter(user=book_fan, review=review).exists())
+        self.assertFalse(FeedEntry.objects.filter(user=self.stranger).exists())
+        self.assertEqual(self.feed_ids(), [review.pk])
+        
+        Review.objects.filter(pk=review.pk).update(status='hidden')
+        self.assertEqual(self.feed_ids(), [])
+    
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Test follow copies recent reviews and unfollow keeps what other follows cover"""
+        reviews = [self.review(book) for book in self.books[:3]]
+        other = self.review(self.books[3], user=self.stranger)
+        self.follow(self.reader, self.writer)
+        self.follow(self.reader, self.books[0])
+        self.assertEqual(set(self.feed_ids()), {r.pk for r in reviews})
+        
+        Follow.objects.get(follower=self.reader, content_type=self.user_ct).delete()
+        self.assertEqual(self.feed_ids(), [reviews[0].pk])
+        
+        self.follow(self.reader, self.author)
+        self.assertEqual(set(self.feed_ids()), {r.pk for r in reviews} | {other.pk})
+    
+    @override_settings(FEED_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_reviews_are_pulled(self):
+        """Test reviews of big accounts are merged at read time, not fanned out"""
+        self.follow(self.reader, self.writer)
+        self.follow(self.reader, self.books[1])
+        celebrity_review = self.review(self.books[0])
+        book_review = self.review(self.books[1], user=self.stranger)
+        self.assertFalse(FeedEntry.objects.filter(review=celebrity_review).exists())
+        self.assertEqual(self.feed_ids(), [book_review.pk, celebrity_review.pk])
+    
+    @override_settings(FEED_PAGE_SIZE=2, FEED_CELEBRITY_FOLLOWERS=1)
+    def test_cursor_pagination(self):
+        """Test pages follow each other through pushed and pulled reviews"""
+        self.follow(self.reader, self.writer)
+        self.follow(self.reader, self.author)
+        reviews = [self.review(book, user=self.writer if i % 2 else self.stranger)
+                   for i, book in enumerate(self.books[:5])]
+        seen = []
+        url = reverse('social:feed')
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, [r.pk for r in reversed(reviews)])
+        
+        response = self.client.get(reverse('social:feed'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_rebuild_command(self):
+        """Test rebuild_feed recomputes a user's timeline"""
+        self.follow(self.reader, self.writer)
+        reviews = [self.review(book) for book in self.books[:3]]
+        FeedEntry.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('rebuild_feed', 'reader', stdout=out)
+        self.assertIn('reader: 3 feed entries', out.getvalue())
+        self.assertEqual(self.feed_ids(), [r.pk for r in reversed(reviews)])
+        
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feed', '--all', stdout=StringIO())
+        self.assertEqual(self.feed_ids(), [r.pk for r in reversed(reviews)])
+    
+    def test_fan_out_when_published(self):
+        """Test a draft published later or a review shown again is fanned out, edits are not"""
+        with mock.patch('reviews.signals.enqueue_new_review_notifications'), \
+                mock.patch('reviews.signals.enqueue_feed_fan_out') as fan_out:
+            with self.captureOnCommitCallbacks(execute=True):
+                review = Review.objects.create(book=self.books[0], user=self.writer, title='Draft',
+                                               body_md='Body ' * 30, status='draft')
+            fan_out.assert_not_called()
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                review.status = 'public'
+                review.save()
+            fan_out.assert_called_once_with(review.pk)
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                review.title = 'Edited'
+                review.save()
+            self.assertEqual(fan_out.call_count, 1)
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                review.is_active = False
+                review.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                review.is_active = True
+                review.save()
+            self.assertEqual(fan_out.call_count, 2)
+
+
+class UnreadNotificationTest(APITestCase):
+    """Test the unread notification counter and its SSE stream"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='unread', email='unread@example.com', password='TestPass123!')
+        self.client.force_authenticate(self.user)
+    
+    def tearDown(self):
+        from bookreview.redis_utils import get_redis
+        from social.unread import _counter_key
+        redis = get_redis()
+        if redis is not None:
+            try:
+                redis.delete(_counter_key(self.user.pk))
+            except Exception:
+                pass
+    
+    def notify(self, count=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [Notification.objects.create(user=self.user, notification_type='system') for _ in range(count)]
+    
+    def unread_count(self):
+        response = self.client.get(reverse('social:notification_unread_count'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['count']
+    
+    def test_counter_follows_notifications(self):
+        """Test new notifications, read and read-all keep the count right"""
+        self.assertEqual(self.unread_count(), 0)
+        notifications = self.notify(3)
+        self.assertEqual(self.unread_count(), 3)
+        
+        for _ in range(2):  # Reading twice counts once
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('social:notification_read', kwargs={'pk': notifications[0].pk}))
+        self.assertEqual(self.unread_count(), 2)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('social:notification_read_all'))
+        self.assertEqual(self.unread_count(), 0)
+    
+    def test_fan_out_counts_bulk_created(self):
+        """Test bulk-created new_review notifications are counted"""
+        writer = User.objects.create_user(username='unreadwriter', email='uw@example.com', password='TestPass123!')
+        Follow.objects.create(follower=self.user, content_type=ContentType.objects.get_for_model(User), object_id=writer.pk)
+        self.assertEqual(self.unread_count(), 0)
+        review = Review.objects.create(book=Book.objects.create(title='Unread Book'), user=writer,
+                                       title='New', body_md='Body ' * 30, status='public')
+        with self.captureOnCommitCallbacks(execute=True):
+            fan_out_new_review_notifications(review.pk)
+        self.assertEqual(self.unread_count(), 1)
+    
+    def test_stream_without_push_channel(self):
+        """Test the stream sends the count once with a polling retry under WSGI"""
+        self.notify(2)
+        self.client.force_login(self.user)  # EventSource only carries the session cookie
+        response = self.client.get(reverse('social:notification_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body, 'retry: 30000\nevent: unread\ndata: {"count": 2}\n\n')
+        
+        self.client.logout()
+        response = self.client.get(reverse('social:notification_stream'))
+        self.assertEqual(response.status_code, 401)
+
+
+class UnreadPushTest(SimpleTestCase):
+    """Test the SSE stream pushes counter changes (needs Redis)"""
+    
+    def setUp(self):
+        from bookreview.redis_utils import get_async_redis, get_redis
+        self.redis = get_redis()
+        try:
+            if self.redis is None or get_async_redis() is None or not self.redis.ping():
+                self.skipTest('Redis is not the cache backend')
+        except Exception:
+            self.skipTest('Redis is not reachable')
+    
+    async def test_push(self):
+        from asgiref.sync import sync_to_async
+        from bookreview.redis_utils import get_async_redis
+        from social import streams, unread
+        user_id = 987654
+        await sync_to_async(self.redis.set)(unread._counter_key(user_id), 5)
+        events = streams._push_events(get_async_redis(), user_id)
+        try:
+            self.assertIn('data: {"count": 5}', await events.__anext__())
+            await sync_to_async(unread._shift)({user_id: 2})
+            self.assertIn('data: {"count": 7}', await events.__anext__())
+        finally:
+            await events.aclose()
+            await sync_to_async(self.redis.delete)(unread._counter_key(user_id))
+
+
+class NotificationRetentionTest(TestCase):
+    """Test batched notification purging and archiving"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='retention', email='retention@example.com', password='TestPass123!')
+        self.now = timezone.now()
+    
+    def notify(self, days_old, is_read, notification_type='system', **kwargs):
+        notification = Notification.objects.create(
+            user=self.user, notification_type=notification_type, is_read=is_read, **kwargs
+        )
+        Notification.objects.filter(pk=notification.pk).update(created_at=self.now - timedelta(days=days_old))
+        return notification
+    
+    def test_purge_in_batches_and_archive(self):
+        """Test expired rows go in bounded batches and are counted in the archive"""
+        from social.retention import purge_notifications
+        from social.unread import unread_count
+        expired = [self.notify(40, True), self.notify(45, True), self.notify(200, False)]
+        kept = [self.notify(5, True), self.notify(60, False)]
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('social.retention.time.sleep') as sleep:
+                deleted = purge_notifications(now=self.now, batch_size=2, pause=0.5)
+        self.assertEqual(deleted, len(expired))
+        sleep.assert_called_once_with(0.5)  # Between the two batches only
+        self.assertEqual(set(Notification.objects.values_list('pk', flat=True)), {n.pk for n in kept})
+        self.assertEqual(sum(NotificationArchive.objects.filter(user=self.user).values_list('count', flat=True)), 3)
+        self.assertEqual(unread_count(self.user.pk), 1)
+        
+        # A second run finds nothing and adds to the same archive rows
+        self.assertEqual(purge_notifications(now=self.now), 0)
+        self.notify(40, True)
+        archived = NotificationArchive.objects.filter(user=self.user).count()
+        purge_notifications(now=self.now)
+        self.assertEqual(NotificationArchive.objects.filter(user=self.user).count(), archived)
+        self.assertEqual(sum(NotificationArchive.objects.filter(user=self.user).values_list('count', flat=True)), 4)
+
+
+class ContentTypeRegistryTest(APITestCase):
+    """Test follow targets resolve through bookreview.content_types"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='ctuser', email='ct@example.com',
+                                             password='TestPass123!')
+        self.writer = User.objects.create_user(username='ctwriter', email='ctw@example.com',
+                                               password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('social:follow-toggle')
+    
+    def test_warm_then_follow_without_content_type_queries(self):
+        """Test follow/unfollow after warm() never query django_content_type"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from bookreview import content_types
+        
+        ContentType.objects.clear_cache()
+        content_types.warm()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'target_type': 'user', 'target_id': self.writer.pk})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            response = self.client.delete(self.url, {'target_type': 'user', 'target_id': self.writer.pk})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries.captured_queries if 'django_content_type' in q['sql']])
+    
+    def test_unknown_target_type(self):
+        """Test models outside FOLLOW_TARGETS are rejected"""
+        response = self.client.post(self.url, {'target_type': 'review', 'target_id': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.delete(self.url, {'target_type': 'permission', 'target_id': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class GenericTargetLoadingTest(APITestCase):
+    """Test follow and notification pages load their generic targets in bulk"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='gfkuser', email='gfk@example.com', password='TestPass123!')
+        self.book = Book.objects.create(title='GFK Book')
+        self.book.authors.add(Author.objects.create(name='GFK Author'))
+        self.user_ct = ContentType.objects.get_for_model(User)
+        self.client.force_authenticate(self.user)
+        self.count = 0
+    
+    def add_rows(self, count):
+        """`count` followers of self.user, each also notifying it with a review, a comment and a follow"""
+        for _ in range(count):
+            self.count += 1
+            other = User.objects.create_user(username=f'gfk{self.count}', email=f'gfk{self.count}@example.com',
+                                             password='TestPass123!')
+            Follow.objects.create(follower=other, content_type=self.user_ct, object_id=self.user.pk)
+            Follow.objects.create(follower=self.user, content_type=self.user_ct, object_id=other.pk)
+            review = Review.objects.create(book=Book.objects.create(title=f'GFK Book {self.count}'), user=other,
+                                           title='GFK', body_md='Body ' * 30, status='public')
+            comment = Comment.objects.create(review=review, user=other, body='GFK comment')
+            Comment.objects.create(review=review, user=self.user, parent=comment, body='GFK reply')
+            for target in (review, comment, other):
+                Notification.objects.create(user=self.user, notification_type='system', content_object=target)
+    
+    def queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response.data
+    
+    def test_query_count_independent_of_page_size(self):
+        """Test followers, following and notifications cost the same for 2 or 6 rows per type"""
+        urls = [
+            reverse('social:user_followers', kwargs={'username': self.user.username}),
+            reverse('social:user_following', kwargs={'username': self.user.username}),
+            reverse('social:notification_list'),
+        ]
+        self.add_rows(2)
+        small = [self.queries(url)[0] for url in urls]
+        self.add_rows(4)
+        results = [self.queries(url) for url in urls]
+        self.assertEqual([count for count, _ in results], small)
+        
+        following, notifications = results[1][1]['results'], results[2][1]['results']
+        self.assertEqual({row['target']['username'] for row in following}, {f'gfk{i}' for i in range(1, 7)})
+        by_type = {}
+        for row in notifications:
+            by_type.setdefault(row['url'].split('/')[1], []).append(row)
+        self.assertEqual(len(by_type['reviews']), 12)  # review and comment (review page + #comments)
+        self.assertEqual(len(by_type['users']), 6)
+        comments = [row['content_object'] for row in notifications if row['url'].endswith('#comments')]
+        self.assertEqual({len(comment['replies']) for comment in comments}, {1})
@@ -0,0 +1,202 @@
+"""
+Home timelines (fan-out on write, pull for celebrities).
+
+A new public review is pushed as a FeedEntry into the timeline of everyone
+following its author, its book or one of its authors
+(`fan_out_review`, run by a Celery task after commit). Reading a page of
+the feed is then a keyset scan of the reader's own entries.
+
+Accounts with FEED_CELEBRITY_FOLLOWERS followers or more are not fanned out
+(one review would write that many rows); their reviews are pulled at read
+time and merged into the page. Books and authors always fan out: their
+followers are reached by the same batched background task.
+
+Following a target copies its recent reviews into the timeline, unfollowing
+removes the entries no remaining follow accounts for, and
+`rebuild_timeline` recomputes a timeline from scratch (rebuild_feed command).
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from bookreview import content_types
+from bookreview.pagination import InvalidCursor, decode_cursor, encode_cursor
+from books.models import Book
+from reviews.models import Review
+from users.models import Profile
+from .models import Follow, FeedEntry
+
+FAN_OUT_BATCH_SIZE = 1000
+
+
+def _decode_position(cursor):
+    """(created_at, review_id) of the last item of the previous page"""
+    position, _ = decode_cursor(cursor)
+    try:
+        created_at, review_id = position
+        return datetime.fromisoformat(created_at), int(review_id)
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def _content_types():
+    """Content type ids of the followable models (user, book, author)"""
+    return (content_types.content_type_id('user'),
+            content_types.content_type_id('book'),
+            content_types.content_type_id('author'))
+
+
+def _celebrities():
+    return Profile.objects.filter(
+        follower_count__gte=settings.FEED_CELEBRITY_FOLLOWERS
+    ).values('user_id')
+
+
+def is_celebrity(user_id):
+    return _celebrities().filter(user_id=user_id).exists()
+
+
+def _reviews_of_target(content_type_id, object_id, prefix=''):
+    """Q matching the reviews one followed target contributes to a feed"""
+    user_ct, book_ct, author_ct = _content_types()
+    field = {
+        user_ct: 'user_id',
+        book_ct: 'book_id',
+        author_ct: 'book__authors',
+    }.get(content_type_id)
+    if field is None:
+        return Q(pk__in=[])
+    return Q(**{f'{prefix}{field}': object_id})
+
+
+def _followed_reviews(user_id, include_celebrities=True):
+    """Q matching every review `user_id`'s follows put in the feed"""
+    user_ct, book_ct, author_ct = _content_types()
+    follows = Follow.objects.filter(follower_id=user_id)
+    users = follows.filter(content_type_id=user_ct)
+    if not include_celebrities:
+        users = users.exclude(object_id__in=_celebrities())
+    return (
+        Q(user_id__in=users.values('object_id'))
+        | Q(book_id__in=follows.filter(content_type_id=book_ct).values('object_id'))
+        | Q(book__authors__in=follows.filter(content_type_id=author_ct).values('object_id'))
+    )
+
+
+def _visible(reviews):
+    return reviews.filter(status='public', is_active=True)
+
+
+def _write(user_ids, reviews):
+    """Insert (user, review) entries, skipping the ones already there"""
+    FeedEntry.objects.bulk_create([
+        FeedEntry(user_id=user_id, review_id=review_id, created_at=created_at)
+        for user_id in user_ids
+        for review_id, created_at in reviews
+    ], batch_size=FAN_OUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+# =========================
+# WRITE: new review, follow, unfollow
+# =========================
+
+def fan_out_review(review_id, batch_size=FAN_OUT_BATCH_SIZE):
+    """Push a public review into its followers' timelines; returns followers reached"""
+    review = _visible(Review.objects.filter(pk=review_id)).values('pk', 'created_at', 'user_id', 'book_id').first()
+    if review is None:
+        return 0
+
+    user_ct, book_ct, author_ct = _content_types()
+    author_ids = Book.authors.through.objects.filter(book_id=review['book_id']).values('author_id')
+    targets = (Q(content_type_id=book_ct, object_id=review['book_id'])
+               | Q(content_type_id=author_ct, object_id__in=author_ids))
+    if not is_celebrity(review['user_id']):
+        targets |= Q(content_type_id=user_ct, object_id=review['user_id'])
+
+    follower_ids = Follow.objects.filter(targets).order_by('follower_id').values_list(
+        'follower_id', flat=True
+    ).distinct()
+    entry = [(review['pk'], review['created_at'])]
+    reached = 0
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=batch_size):
+        batch.append(follower_id)
+        if len(batch) >= batch_size:
+            _write(batch, entry)
+            reached += len(batch)
+            batch = []
+    _write(batch, entry)
+    return reached + len(batch)
+
+
+def add_followed_target(follow: Follow):
+    """New follow: copy the target's recent reviews into the follower's timeline"""
+    if follow.content_type_id == content_types.content_type_id('user') and is_celebrity(follow.object_id):
+        return
+    reviews = _visible(Review.objects.filter(
+        _reviews_of_target(follow.content_type_id, follow.object_id)
+    )).order_by('-created_at').values_list('pk', 'created_at')[:settings.FEED_FOLLOW_BACKFILL]
+    _write([follow.follower_id], reviews)
+
+
+def remove_followed_target(follow: Follow):
+    """Unfollow: drop the target's entries that no other follow accounts for"""
+    FeedEntry.objects.filter(
+        _reviews_of_target(follow.content_type_id, follow.object_id, prefix='review__'),
+        user_id=follow.follower_id,
+    ).exclude(
+        review__in=Review.objects.filter(_followed_reviews(follow.follower_id))
+    ).delete()
+
+
+@transaction.atomic
+def rebuild_timeline(user_id, size=None):
+    """Recompute a timeline from the user's follows (newest `size` reviews)"""
+    size = size or settings.FEED_TIMELINE_SIZE
+    reviews = _visible(Review.objects.filter(
+        _followed_reviews(user_id, include_celebrities=False)
+    )).values_list('pk', 'created_at').distinct().order_by('-created_at', '-pk')[:size]
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    _write([user_id], list(reviews))
+    return FeedEntry.objects.filter(user_id=user_id).count()
+
+
+# =========================
+# READ
+# =========================
+
+def read_timeline(user, cursor=None, limit=None):
+    """
+    One page of the home feed, newest first: ([Review], next cursor or None).
+    Raises InvalidCursor for a cursor this module did not produce.
+    """
+    limit = limit or settings.FEED_PAGE_SIZE
+    entry_after = review_after = Q()
+    if cursor:
+        created_at, review_id = _decode_position(cursor)
+        entry_after = Q(created_at__lt=created_at) | Q(created_at=created_at, review_id__lt=review_id)
+        review_after = Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=review_id)
+
+    # Own entries (hidden/deleted reviews are filtered here rather than retracted)
+    pushed = FeedEntry.objects.filter(
+        entry_after, user=user, review__status='public', review__is_active=True
+    ).order_by('-created_at', '-review_id').values_list('created_at', 'review_id')[:limit + 1]
+
+    # Celebrities followed by the user: pulled, not pushed
+    celebrity_ids = Follow.objects.filter(
+        follower=user, content_type_id=content_types.content_type_id('user'), object_id__in=_celebrities()
+    ).values('object_id')
+    pulled = _visible(Review.objects.filter(review_after, user_id__in=celebrity_ids)).order_by(
+        '-created_at', '-pk'
+    ).values_list('created_at', 'pk')[:limit + 1]
+
+    keys = sorted(set(pushed) | set(pulled), reverse=True)
+    next_cursor = encode_cursor(list(keys[limit - 1])) if len(keys) > limit else None
+    keys = keys[:limit]
+
+    reviews = Review.objects.filter(pk__in=[pk for _, pk in keys]).select_related(
+        'book', 'user__profile'
+    ).prefetch_related('book__authors', 'book__genres').in_bulk()
+    return [reviews[pk] for _, pk in keys if pk in reviews], next_cursor
@@ -0,0 +1,91 @@
+"""
+Unread notification counter, kept in Redis per user.
+
+The count is cache-aside: read from `notifications:unread:<user>` and
+computed with one COUNT(*) when the key is missing (first read, expiry,
+Redis restart). New notifications and marking as read shift the key only
+if it exists, so a count is never built from deltas alone. Every change is
+published on `notifications:channel:<user>` for the SSE stream
+(social.streams). Without Redis every read is a COUNT(*).
+"""
+import logging
+
+from django.db import transaction
+from redis.exceptions import RedisError
+
+from bookreview.redis_utils import get_redis, redis_key
+from .models import Notification
+
+logger = logging.getLogger('bookreview')
+
+UNREAD_TTL = 60 * 60  # Also bounds drift from a shift racing the COUNT(*) below
+
+# Shift an existing counter (never below 0); nil if the key is missing
+_SHIFT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return false end
+local count = redis.call('INCRBY', KEYS[1], ARGV[1])
+if count < 0 then
+    redis.call('SET', KEYS[1], 0, 'KEEPTTL')
+    count = 0
+end
+return count
+"""
+
+
+def _counter_key(user_id):
+    return redis_key(f'notifications:unread:{user_id}')
+
+
+def channel(user_id):
+    return redis_key(f'notifications:channel:{user_id}')
+
+
+def _count_from_db(user_id):
+    return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+
+def unread_count(user_id):
+    redis = get_redis()
+    if redis is None:
+        return _count_from_db(user_id)
+    try:
+        cached = redis.get(_counter_key(user_id))
+        if cached is not None:
+            return int(cached)
+        count = _count_from_db(user_id)
+        redis.set(_counter_key(user_id), count, ex=UNREAD_TTL, nx=True)
+        return count
+    except RedisError as exc:
+        logger.warning('Unread counter of user %s unavailable: %s', user_id, exc)
+        return _count_from_db(user_id)
+
+
+def shift_unread(deltas):
+    """Apply {user_id: delta} to the cached counters after commit and notify listeners"""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if deltas:
+        transaction.on_commit(lambda: _shift(deltas))
+
+
+def _shift(deltas):
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        script = redis.register_script(_SHIFT_SCRIPT)
+        pipe = redis.pipeline(transaction=False)
+        for user_id, delta in deltas.items():
+            script(keys=[_counter_key(user_id)], args=[delta], client=pipe)
+        counts = pipe.execute()
+        pipe = redis.pipeline(transaction=False)
+        for user_id, count in zip(deltas, counts):
+            # Empty message: count unknown, the listener reads it
+            pipe.publish(channel(user_id), '' if count is None else count)
+        pipe.execute()
+    except RedisError as exc:
+        logger.warning('Shifting unread counters failed: %s', exc)
+        # A missed shift would leave the counters wrong until they expire
+        try:
+            redis.delete(*[_counter_key(user_id) for user_id in deltas])
+        except RedisError:
+            pass
@@ -2,10 +2,12 @@ from django.urls import path
 from .views import (
     FollowToggleView,
     NotificationListView, mark_notification_read, mark_all_notifications_read,
-    CollectionListView, CollectionDetailView, collection_item_view,
+    CollectionListView, CollectionDetailView, CollectionItemListView, collection_item_view,
+    collection_books_view,
     feed_view, unread_notification_count,
     UserFollowersListView, UserFollowingListView,
 )
+from .streams import notification_stream
 
 app_name = 'social'
 
@@ -20,10 +22,13 @@ urlpatterns = [
     # alias cho template cũ
     path('notifications/mark-all-read/', mark_all_notifications_read, name='notification_mark_all'),
     path('notifications/unread-count/', unread_notification_count, name='notification_unread_count'),
+    path('notifications/stream/', notification_stream, name='notification_stream'),
     
     # Collections
     path('collections/', CollectionListView.as_view(), name='collection_list'),
     path('collections/<int:pk>/', CollectionDetailView.as_view(), name='collection_detail'),
+    path('collections/<int:pk>/items/', CollectionItemListView.as_view(), name='collection_items'),
+    path('collections/<int:collection_id>/books/', collection_books_view, name='collection_books'),
     path('collections/<int:collection_id>/books/<int:book_id>/', collection_item_view, name='collection_item'),
     
     # Feed
@@ -3,13 +3,19 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.utils.urls import replace_query_param
 
 from .models import Follow, Notification, Collection, CollectionItem
 from .serializers import FollowSerializer, NotificationSerializer, CollectionSerializer, CollectionItemSerializer
+from . import timeline, unread
+from bookreview import content_types
+from bookreview.pagination import KeysetDefaultPagination, KeysetOnlyPagination
+from shelves.items import add_books, remove_books
+from shelves.previews import with_previews
+from shelves.serializers import BookIdsSerializer
 from books.models import Book, Author
 from .models import Follow, Notification, Collection, CollectionItem
 
@@ -22,6 +28,7 @@ class NotificationListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['is_read', 'notification_type']
+    pagination_class = KeysetDefaultPagination
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user).order_by('-created_at')
@@ -32,7 +39,9 @@ class NotificationListView(generics.ListAPIView):
 def mark_notification_read(request, pk):
     """Mark notification as read"""
     notification = get_object_or_404(Notification, pk=pk, user=request.user)
-    notification.mark_as_read()
+    if not notification.is_read:
+        notification.mark_as_read()
+        unread.shift_unread({request.user.pk: -1})
     return Response({'message': 'Notification marked as read'})
 
 
@@ -40,15 +49,15 @@ def mark_notification_read(request, pk):
 @permission_classes([permissions.IsAuthenticated])
 def mark_all_notifications_read(request):
     """Mark all notifications as read"""
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    marked = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    unread.shift_unread({request.user.pk: -marked})
     return Response({'message': 'All notifications marked as read'})
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def unread_notification_count(request):
-    """Get count of unread notifications"""
-    count = Notification.objects.filter(user=request.user, is_read=False).count()
-    return Response({'count': count})
+    """Get count of unread notifications (Redis counter, see social.unread)"""
+    return Response({'count': unread.unread_count(request.user.pk)})
 
 
 class CollectionListView(generics.ListCreateAPIView):
@@ -59,12 +68,12 @@ class CollectionListView(generics.ListCreateAPIView):
     def get_queryset(self):
         if self.request.user.is_authenticated:
             # Show own collections and public collections
-            return Collection.objects.filter(
+            return with_previews(Collection.objects.filter(
                 Q(user=self.request.user) | Q(visibility='public', is_active=True)
-            ).prefetch_related('items__book').order_by('-created_at')
-        return Collection.objects.filter(
+            )).order_by('-created_at')
+        return with_previews(Collection.objects.filter(
             visibility='public', is_active=True
-        ).prefetch_related('items__book').order_by('-created_at')
+        )).order_by('-created_at')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -77,10 +86,10 @@ class CollectionDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            return Collection.objects.filter(
+            return with_previews(Collection.objects.filter(
                 Q(user=self.request.user) | Q(visibility='public', is_active=True)
-            ).prefetch_related('items__book')
-        return Collection.objects.filter(visibility='public', is_active=True).prefetch_related('items__book')
+            ))
+        return with_previews(Collection.objects.filter(visibility='public', is_active=True))
 
     def perform_update(self, serializer):
         if serializer.instance.user != self.request.user:
@@ -95,6 +104,22 @@ class CollectionDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 
+class CollectionItemListView(generics.ListAPIView):
+    """Books of one collection (own or public), in collection order, keyset-paginated"""
+    serializer_class = CollectionItemSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetOnlyPagination
+
+    def get_queryset(self):
+        visible = Q(visibility='public', is_active=True)
+        if self.request.user.is_authenticated:
+            visible |= Q(user=self.request.user)
+        collection = get_object_or_404(Collection.objects.filter(visible), pk=self.kwargs['pk'])
+        return CollectionItem.objects.filter(collection=collection).select_related('book').prefetch_related(
+            'book__authors', 'book__genres'
+        ).order_by('order', '-added_at', 'pk')
+
+
 @api_view(['POST', 'DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def collection_item_view(request, collection_id, book_id):
@@ -103,57 +128,53 @@ def collection_item_view(request, collection_id, book_id):
     book = get_object_or_404(Book, id=book_id, is_active=True)
     
     if request.method == 'POST':
-        item, created = CollectionItem.objects.get_or_create(
-            collection=collection,
-            book=book,
-            defaults={'order': collection.items.count()}
-        )
-        if not created:
+        if not add_books(collection, [book.id]):
             return Response({'message': 'Book already in collection'}, status=status.HTTP_200_OK)
         return Response({'message': 'Book added to collection'}, status=status.HTTP_201_CREATED)
     
     # DELETE
-    item = get_object_or_404(CollectionItem, collection=collection, book=book)
-    item.delete()
+    if not remove_books(collection, [book.id]):
+        return Response({'error': 'Book not in collection'}, status=status.HTTP_404_NOT_FOUND)
     return Response({'message': 'Book removed from collection'}, status=status.HTTP_200_OK)
 
 
+@api_view(['POST', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def collection_books_view(request, collection_id):
+    """Add/Remove many books at once: {"book_ids": [...]}, book_count shifted once per batch"""
+    collection = get_object_or_404(Collection, id=collection_id, user=request.user)
+    serializer = BookIdsSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    book_ids = serializer.validated_data['book_ids']
+
+    if request.method == 'POST':
+        result = {'added': add_books(collection, book_ids)}
+    else:
+        result = {'removed': remove_books(collection, book_ids)}
+    collection.refresh_from_db(fields=['book_count'])
+    return Response({**result, 'book_count': collection.book_count}, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def feed_view(request):
-    """User Feed - Reviews from followed users/authors/books"""
-    from reviews.models import Review
-    from django.db.models import Q
-    
-    # Get ContentTypes for user, author, and book models
-    user_content_type = ContentType.objects.get(model='user')
-    author_content_type = ContentType.objects.get(model='author')
-    book_content_type = ContentType.objects.get(model='book')
-    
-    # Get followed users, authors, books
-    followed_users = Follow.objects.filter(
-        follower=request.user, content_type=user_content_type
-    ).values_list('object_id', flat=True)
-    
-    followed_authors = Follow.objects.filter(
-        follower=request.user, content_type=author_content_type
-    ).values_list('object_id', flat=True)
-    
-    followed_books = Follow.objects.filter(
-        follower=request.user, content_type=book_content_type
-    ).values_list('object_id', flat=True)
-    
-    # Get reviews from followed users or books
-    reviews = Review.objects.filter(
-        Q(user_id__in=followed_users) | Q(book_id__in=followed_books) |
-        Q(book__authors__id__in=followed_authors),
-        status='public',
-        is_active=True
-    ).select_related('book', 'user').prefetch_related('images').order_by('-created_at')[:20]
-    
+    """
+    User Feed - Reviews from followed users/authors/books
+    Đọc từ timeline đã fan-out sẵn (social.timeline), phân trang bằng ?cursor=
+    """
     from reviews.serializers import ReviewListSerializer
+
+    try:
+        reviews, next_cursor = timeline.read_timeline(request.user, cursor=request.query_params.get('cursor'))
+    except timeline.InvalidCursor:
+        return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
     serializer = ReviewListSerializer(reviews, many=True, context={'request': request})
-    return Response(serializer.data)
+    next_url = None
+    if next_cursor:
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+    return Response({'next': next_url, 'results': serializer.data})
 
 
 class FollowToggleView(APIView):
@@ -165,25 +186,23 @@ class FollowToggleView(APIView):
         if serializer.is_valid():
             target_type = serializer.validated_data.get('target_type')
             object_id = serializer.validated_data.get('object_id')
-            try:
-                content_type = ContentType.objects.get(model=target_type)
-            except ContentType.DoesNotExist:
+            if target_type not in content_types.FOLLOW_TARGETS:
                 return Response({'error': 'Invalid target type'}, status=status.HTTP_400_BAD_REQUEST)
 
             follow, created = Follow.objects.get_or_create(
                 follower=request.user,
-                content_type=content_type,
+                content_type_id=content_types.content_type_id(target_type),
                 object_id=object_id
             )
 
             # 🔔 Tạo thông báo khi follow user
-            if created and content_type.model == 'user' and object_id != request.user.id:
+            if created and target_type == 'user' and object_id != request.user.id:
                 try:
                     target_user = User.objects.get(pk=object_id)
                     Notification.objects.create(
                         user=target_user,
                         notification_type='follow',
-                        content_type=ContentType.objects.get_for_model(request.user),
+                        content_type_id=content_types.content_type_id('user'),
                         object_id=request.user.id,
                         payload={
                             'message': f'{request.user.username} đã bắt đầu theo dõi bạn.'
@@ -203,20 +222,19 @@ class FollowToggleView(APIView):
         if not target_type or not target_id:
             return Response({'error': 'Missing target_type or target_id'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if target_type not in content_types.FOLLOW_TARGETS:
+            return Response({'error': 'Invalid target type'}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            content_type = ContentType.objects.get(model=target_type)
-            
             follow = Follow.objects.get(
                 follower=request.user,
-                content_type=content_type,
+                content_type_id=content_types.content_type_id(target_type),
                 object_id=target_id
             )
             follow.delete()
             
             return Response({'message': 'Unfollowed successfully'}, status=status.HTTP_200_OK)
             
-        except ContentType.DoesNotExist:
-            return Response({'error': 'Invalid target type'}, status=status.HTTP_400_BAD_REQUEST)
         except Follow.DoesNotExist:
             return Response({'error': 'Not following'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -232,12 +250,10 @@ class UserFollowersListView(generics.ListAPIView):
         username = self.kwargs['username']
         user = get_object_or_404(User, username=username)
 
-        user_ct = ContentType.objects.get_for_model(User)
-
         return Follow.objects.filter(
-            content_type=user_ct,
+            content_type_id=content_types.content_type_id('user'),
             object_id=user.id
-        ).select_related('follower').order_by('-created_at')
+        ).select_related('follower__profile').order_by('-created_at')
 
 
 class UserFollowingListView(generics.ListAPIView):
@@ -252,9 +268,7 @@ class UserFollowingListView(generics.ListAPIView):
         username = self.kwargs['username']
         user = get_object_or_404(User, username=username)
 
-        user_ct = ContentType.objects.get_for_model(User)
-
         return Follow.objects.filter(
             follower=user,
-            content_type=user_ct
-        ).select_related('follower').order_by('-created_at')
+            content_type_id=content_types.content_type_id('user')
+        ).select_related('follower__profile').order_by('-created_at')
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:41
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counts(apps, schema_editor):
+    """follower_count/following_count of every profile from the follows table"""
+    Profile = apps.get_model('users', 'Profile')
+    Follow = apps.get_model('social', 'Follow')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+
+    def count(follows, group_by):
+        counts = follows.order_by().values(group_by).annotate(count=Count('*')).values('count')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    user_ct = ContentType.objects.filter(app_label='users', model='user').values('pk')[:1]
+    Profile.objects.update(
+        follower_count=count(Follow.objects.filter(
+            content_type_id=Subquery(user_ct), object_id=OuterRef('user_id')
+        ), 'object_id'),
+        following_count=count(Follow.objects.filter(follower=OuterRef('user_id')), 'follower'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('users', '0003_user_role'),
+        ('social', '0002_alter_notification_notification_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
@@ -53,6 +53,10 @@ class Profile(models.Model):
     notify_comment = models.BooleanField(default=True)
     notify_mention = models.BooleanField(default=True)
     
+    # Kept by social.signals, reconciled by social.tasks.reconcile_follow_counts
+    follower_count = models.PositiveIntegerField(default=0)  # Users following this user
+    following_count = models.PositiveIntegerField(default=0)  # Users/authors/books this user follows
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -76,22 +80,6 @@ class Profile(models.Model):
         
         return profile_ok and user_email_ok
     
-    @property
-    def follower_count(self):
-        """Count of followers"""
-        from social.models import Follow
-        from django.contrib.contenttypes.models import ContentType
-        user_ct = ContentType.objects.get_for_model(self.user) 
-
-        return Follow.objects.filter(
-            content_type=user_ct, 
-            object_id=self.user.id
-        ).count()
-
-    @property
-    def following_count(self):
-        return self.user.following.count()
-        
     @property
     def review_count(self):
         return self.user.reviews.filter(status='public').count()
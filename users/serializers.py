@@ -1,10 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from django.contrib.contenttypes.models import ContentType
 from .models import User, Profile
 from shelves.models import Shelf
-from social.models import Follow
 from .validators import validate_password_strength
 
 
@@ -31,19 +29,12 @@ class ProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['username', 'email', 'role']
 
     def get_following_count(self, obj):
-        return obj.user.following.count()
+        return obj.following_count
 
     def get_follower_count(self, obj):
         # Chỉ Reviewer mới hiện số Fan
         if obj.user.role == User.Role.REVIEWER:
-            user = obj.user
-            user_content_type = ContentType.objects.get_for_model(User)
-            
-            return Follow.objects.filter(
-                content_type=user_content_type, 
-                object_id=user.id
-            ).count()
-        
+            return obj.follower_count
         return 0
 
     def get_is_fully_completed(self, obj):
@@ -73,6 +64,29 @@ class UserSerializer(serializers.ModelSerializer):
         return None
 
 
+class UserCardSerializer(serializers.ModelSerializer):
+    """
+    Compact user embedded in list payloads (reviews, comments, follows, shelves...).
+    Reads `profile` only for the avatar: load users with select_related('profile')
+    (or 'user__profile'). The full profile stays on the profile endpoints (UserSerializer).
+    """
+    avatar = serializers.SerializerMethodField()
+    display_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'display_name', 'avatar', 'role']
+        read_only_fields = fields
+
+    def get_display_name(self, obj):
+        return obj.get_full_name() or obj.username
+
+    def get_avatar(self, obj):
+        profile = getattr(obj, 'profile', None)
+        if profile is None or not profile.avatar:
+            return None
+        return profile.avatar.url
+
 
 class RegisterSerializer(serializers.ModelSerializer):
     """Registration Serializer"""
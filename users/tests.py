@@ -269,3 +269,100 @@ class PasswordResetTest(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+
+
+class FollowCountTest(APITestCase):
+    """Test denormalized follower/following counters on Profile"""
+    
+    def setUp(self):
+        self.fan = User.objects.create_user(username='fan', email='fan@example.com', password='TestPass123!')
+        self.reviewer = User.objects.create_user(
+            username='star', email='star@example.com', password='TestPass123!', role=User.Role.REVIEWER
+        )
+        for user in (self.fan, self.reviewer):
+            Profile.objects.create(user=user)
+        self.url = reverse('social:follow-toggle')
+        self.client.force_authenticate(self.fan)
+    
+    def counts(self, user):
+        profile = Profile.objects.get(user=user)
+        return profile.follower_count, profile.following_count
+    
+    def test_follow_and_unfollow(self):
+        """Test follow/unfollow update both profiles"""
+        response = self.client.post(self.url, {'target_type': 'user', 'target_id': self.reviewer.pk})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Following twice is a no-op
+        self.client.post(self.url, {'target_type': 'user', 'target_id': self.reviewer.pk})
+        self.assertEqual(self.counts(self.fan), (0, 1))
+        self.assertEqual(self.counts(self.reviewer), (1, 0))
+        
+        response = self.client.delete(self.url, {'target_type': 'user', 'target_id': self.reviewer.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.counts(self.fan), (0, 0))
+        self.assertEqual(self.counts(self.reviewer), (0, 0))
+    
+    def test_follow_author_counts_following_only(self):
+        """Test following a non-user target only counts on the follower"""
+        from books.models import Author
+        author = Author.objects.create(name='Followed Author', pk=self.reviewer.pk)
+        self.client.post(self.url, {'target_type': 'author', 'target_id': author.pk})
+        self.assertEqual(self.counts(self.fan), (0, 1))
+        self.assertEqual(self.counts(self.reviewer), (0, 0))
+    
+    def test_reconcile(self):
+        """Test the reconcile task fixes drifted counters only"""
+        from social.tasks import reconcile_follow_counts
+        self.client.post(self.url, {'target_type': 'user', 'target_id': self.reviewer.pk})
+        Profile.objects.update(follower_count=7, following_count=0)
+        reconcile_follow_counts()
+        self.assertEqual(self.counts(self.fan), (0, 1))
+        self.assertEqual(self.counts(self.reviewer), (1, 0))
+        self.assertEqual(reconcile_follow_counts(), 'Reconciled follow counters of 0 profiles')
+    
+    def test_serializer_reads_columns(self):
+        """Test serializing a user with profile costs no extra query"""
+        from .serializers import UserSerializer
+        self.client.post(self.url, {'target_type': 'user', 'target_id': self.reviewer.pk})
+        user = User.objects.select_related('profile').get(pk=self.reviewer.pk)
+        with self.assertNumQueries(0):
+            data = UserSerializer(user).data
+        self.assertEqual(data['profile']['follower_count'], 1)
+        self.assertEqual(data['profile']['following_count'], 0)
+
+
+class UserCardTest(APITestCase):
+    """Test list endpoints embed the compact user card"""
+    
+    def setUp(self):
+        from books.models import Book
+        from reviews.models import Review
+        self.book = Book.objects.create(title='Card Book')
+        self.users = []
+        for i in range(4):
+            user = User.objects.create_user(username=f'card{i}', email=f'card{i}@example.com',
+                                            password='TestPass123!')
+            Profile.objects.create(user=user, bio='Bio')
+            Review.objects.create(book=self.book, user=user, title=f'Card {i}',
+                                  body_md='Body ' * 30, status='public')
+            self.users.append(user)
+    
+    def test_review_list_embeds_card(self):
+        """Test reviews carry id/username/avatar/role and no per-row profile query"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('reviews:review_list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "users_profile"' in q['sql']])
+        user = response.data['results'][0]['user']
+        self.assertEqual(set(user), {'id', 'username', 'display_name', 'avatar', 'role'})
+        self.assertEqual(user['display_name'], user['username'])  # No first/last name
+        self.assertIsNone(user['avatar'])
+    
+    def test_profile_endpoint_keeps_full_profile(self):
+        """Test the public profile endpoint still returns the full profile"""
+        response = self.client.get(reverse('users:user_detail', kwargs={'username': 'card0'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['profile']['bio'], 'Bio')